@@ -2,16 +2,27 @@ from utils.cleanup import cleanup_reports, cleanup_all_reports
 import argparse
 
 def main():
-    parser = argparse.ArgumentParser(description='Cleanup old test reports and logs')
+    parser = argparse.ArgumentParser(description='Cleanup old test reports, screenshots and logs ([RETENTION] in config.ini)')
     parser.add_argument('--all', action='store_true', help='Remove all reports and logs')
-    parser.add_argument('--days', type=int, default=7, help='Number of days to keep reports (default: 7)')
-    
+    parser.add_argument('--days', type=float, help='Number of days to keep reports (default: max_age_days)')
+    parser.add_argument('--keep-runs', type=int, help='Always keep this many latest runs (default: keep_runs)')
+    parser.add_argument('--max-size', type=int, metavar='MB', dest='max_size_mb',
+                        help='Size quota for reports, screenshots and logs; 0 for none (default: max_size_mb)')
+    parser.add_argument('--keep-failures', action=argparse.BooleanOptionalAction,
+                        help='Keep the failures of expired runs (default: keep_failures)')
+    parser.add_argument('--archive', action=argparse.BooleanOptionalAction,
+                        help='Pack expired runs into archive_dir before removing them (default: archive)')
+    parser.add_argument('--workers', type=int, help='Threads deleting files (default: workers)')
+    parser.add_argument('--dry-run', action='store_true', help='Only show what would be removed')
+
     args = parser.parse_args()
-    
+
     if args.all:
-        cleanup_all_reports()
+        cleanup_all_reports(args.dry_run)
     else:
-        cleanup_reports(args.days)
+        policy = {name: value for name, value in vars(args).items()
+                  if name in ('keep_runs', 'max_size_mb', 'keep_failures', 'archive', 'workers') and value is not None}
+        cleanup_reports(args.days, args.dry_run, **policy)
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
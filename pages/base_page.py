@@ -1,56 +1,384 @@
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import TimeoutException
-import os
-from configparser import ConfigParser
-from datetime import datetime
+from selenium.common.exceptions import TimeoutException, StaleElementReferenceException, NoSuchElementException, WebDriverException
+from utils.locator_compiler import compile_locator
+from utils.perf_metrics import PERF_COLLECT_JS, PERF_MARK_JS, check_budgets, parse_budgets, perf_recorder, sample_metrics
+from utils.screenshot_writer import get_screenshot_writer
+from utils.settings import get_settings
+from utils.test_context import current_test
+from utils.wait_engine import AdaptiveWait, wait_recorder
+from collections import namedtuple
+from urllib.parse import urlparse
+
+# State of one element as returned by BasePage.query_elements
+ElementState = namedtuple('ElementState', ['present', 'visible', 'clickable', 'text'])
+
+# Installs (once per document) an observer that tracks the time of the last DOM
+# mutation and the number of in-flight fetch/XHR requests.
+SETTLE_OBSERVER_JS = """
+if (!window.__settle) {
+    const state = window.__settle = {pending: 0, last: performance.now()};
+    const touch = () => { state.last = performance.now(); };
+    new MutationObserver(touch).observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    if (window.fetch) {
+        const originalFetch = window.fetch;
+        window.fetch = function () {
+            state.pending++; touch();
+            return originalFetch.apply(this, arguments).finally(() => { state.pending--; touch(); });
+        };
+    }
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        state.pending++; touch();
+        this.addEventListener('loadend', () => { state.pending--; touch(); });
+        return originalSend.apply(this, arguments);
+    };
+}
+"""
+
+# Resolves once the page has had no mutations and no pending requests for the
+# quiet window, or when the timeout runs out.
+SETTLE_WAIT_JS = SETTLE_OBSERVER_JS + """
+const quietMs = arguments[0], timeoutMs = arguments[1], done = arguments[arguments.length - 1];
+const state = window.__settle, start = performance.now();
+(function check() {
+    const now = performance.now();
+    if (state.pending <= 0 && now - state.last >= quietMs) {
+        return done({settled: true, elapsed: now - start});
+    }
+    if (now - start >= timeoutMs) {
+        return done({settled: false, elapsed: now - start, pending: state.pending});
+    }
+    setTimeout(check, Math.max(10, Math.min(50, quietMs / 4)));
+})();
+"""
+
+# find(by, value) mirroring Selenium's By strategies, shared by the scripts below
+FIND_ELEMENT_JS = """
+function byXPath(xpath) {
+    return document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+}
+function literal(text) {
+    return text.indexOf("'") < 0 ? "'" + text + "'" : 'concat(\\'' + text.split("'").join("', \\"'\\", '") + '\\')';
+}
+function find(by, value) {
+    switch (by) {
+        case 'xpath': return byXPath(value);
+        case 'css selector': return document.querySelector(value);
+        case 'id': return document.getElementById(value);
+        case 'name': return document.getElementsByName(value)[0] || null;
+        case 'tag name': return document.getElementsByTagName(value)[0] || null;
+        case 'class name': return document.getElementsByClassName(value)[0] || null;
+        case 'link text': return byXPath('//a[normalize-space(.)=' + literal(value) + ']');
+        case 'partial link text': return byXPath('//a[contains(., ' + literal(value) + ')]');
+    }
+    return null;
+}
+"""
+
+# Resolves a list of [name, by, value] locators in one round trip and returns
+# {name: {present, visible, clickable, text}}.
+QUERY_ELEMENTS_JS = FIND_ELEMENT_JS + """
+const result = {};
+for (const [name, by, value] of arguments[0]) {
+    let element = null;
+    try { element = find(by, value); } catch (e) { element = null; }
+    if (!element) {
+        result[name] = {present: false, visible: false, clickable: false, text: ''};
+        continue;
+    }
+    const style = window.getComputedStyle(element);
+    const visible = style.visibility !== 'hidden' && style.display !== 'none'
+        && !!(element.offsetWidth || element.offsetHeight || element.getClientRects().length);
+    result[name] = {
+        present: true,
+        visible: visible,
+        clickable: visible && !element.disabled,
+        text: visible ? (element.innerText || '').trim() : ''
+    };
+}
+return result;
+"""
+
+# Stamps the performance.now() at which the first of a list of [name, by, value]
+# locators appears in the document, for PERF_COLLECT_JS. Runs before PERF_MARK_JS,
+# in the same call, so the stamp only counts what the measured action renders.
+PERF_WATCH_JS = FIND_ELEMENT_JS + """
+const specs = arguments[0];
+const present = () => specs.some(([name, by, value]) => { try { return !!find(by, value); } catch (e) { return false; } });
+if (window.__perfWatch) { window.__perfWatch.observer.disconnect(); }
+const watch = window.__perfWatch = {appeared: null, observer: null};
+let wasPresent = present();
+watch.observer = new MutationObserver(() => {
+    const isPresent = present();
+    if (isPresent && !wasPresent) {
+        watch.appeared = performance.now();
+        watch.observer.disconnect();
+    }
+    wasPresent = isPresent;
+});
+watch.observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+"""
 
 class BasePage:
     def __init__(self, driver):
         self.driver = driver
-        self.config = ConfigParser()
-        self.config.read(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'config.ini'))
-        self.wait = WebDriverWait(self.driver, int(self.config.get('TIMEOUTS', 'explicit_wait')))
+        # Parsed once per process; building a page object reads no files
+        self.settings = get_settings()
+        timeouts = self.settings.timeouts
+        # explicit_wait is the single timeout source for every wait in the page objects
+        self.timeout = timeouts.explicit_wait
+        self.slow_wait_threshold = timeouts.slow_wait_threshold
+        self.settle_quiet_ms = timeouts.settle_quiet_ms
+        self.performance = self.settings.performance
+        self.wait = AdaptiveWait(
+            self.driver,
+            self.timeout,
+            initial_poll=timeouts.poll_initial,
+            max_poll=timeouts.poll_max,
+            on_record=self._on_wait_recorded
+        )
         self.logger = None  # Will be set by the test class
+        # Resolved WebElements keyed by compiled locator; stale entries are re-resolved on use
+        self._element_cache = {}
+
+    def _on_wait_recorded(self, description, elapsed, matched):
+        if elapsed >= self.slow_wait_threshold and self.logger is not None:
+            self.logger.warning(f"Slow wait ({elapsed:.2f}s, {'matched' if matched else 'timed out'}): {description}")
+
+    def wait_for(self, condition, timeout=None, description=None):
+        """
+        Wait until condition(driver) is truthy and return its value
+        :param timeout: seconds to wait, defaults to explicit_wait
+        """
+        return self.wait.until(condition, timeout=timeout, description=description)
+
+    def wait_for_not(self, condition, timeout=None, description=None):
+        """
+        Wait until condition(driver) is falsy
+        """
+        return self.wait.until_not(condition, timeout=timeout, description=description)
+
+    def wait_for_any(self, conditions, timeout=None):
+        """
+        Wait for the first of several outcomes, e.g. a success or an error banner
+        :param conditions: dict of name -> locator (waits for presence) or callable(driver)
+        :return: (name, value) of the first condition that matched
+        """
+        methods = {
+            name: EC.presence_of_element_located(compile_locator(condition)) if isinstance(condition, tuple) else condition
+            for name, condition in conditions.items()
+        }
+        return self.wait.until_any(methods, timeout=timeout)
+
+    def watch_for_settle(self):
+        """
+        Start tracking DOM mutations and requests on the current document.
+        Call before an action so wait_until_settled also sees what the action
+        triggers immediately.
+        """
+        self.driver.execute_script(SETTLE_OBSERVER_JS)
+
+    def wait_until_settled(self, quiet_ms=None, timeout=None):
+        """
+        Wait until the page has had no DOM mutations and no pending fetch/XHR
+        requests for quiet_ms milliseconds.
+        :return: seconds it took the page to settle
+        """
+        quiet_ms = self.settle_quiet_ms if quiet_ms is None else quiet_ms
+        timeout = self.timeout if timeout is None else timeout
+        result = self.driver.execute_async_script(SETTLE_WAIT_JS, quiet_ms, timeout * 1000)
+        elapsed = result['elapsed'] / 1000
+        wait_recorder.record(f"page settle ({quiet_ms}ms quiet)", elapsed, result['settled'])
+        self._on_wait_recorded(f"page settle ({quiet_ms}ms quiet)", elapsed, result['settled'])
+        if not result['settled'] and self.logger is not None:
+            self.logger.warning(f"Page did not settle within {timeout}s ({result['pending']} requests pending)")
+        return elapsed
+
+    def perf_mark(self, until=None):
+        """
+        Mark the start of an action to measure with record_performance
+        :param until: dict of name -> locator; the page stamps when the first
+            of them appears, so elapsed_ms ends there instead of when a wait
+            noticed it. Only works while the action stays on the same document.
+        :return: the mark, or None when performance metrics are off
+        """
+        if not self.performance.enabled:
+            return None
+        try:
+            if until:
+                specs = [[name, *compile_locator(locator)] for name, locator in until.items()]
+                return dict(self.driver.execute_script(PERF_WATCH_JS + PERF_MARK_JS, specs), watched=True)
+            return self.driver.execute_script(PERF_MARK_JS)
+        except WebDriverException:
+            return None
+
+    def record_performance(self, name, mark=None):
+        """
+        Read Navigation, Paint and Resource Timing in a single script call,
+        check them against the [PERFORMANCE] budgets and record them for the
+        current test's report
+        :param name: sample name budgets are matched against, e.g. 'login'
+        :param mark: perf_mark() taken before the action; without one the
+            sample describes the load of the current document
+        :return: dict of metric -> value, or None if metrics are off or unreadable
+        """
+        if not self.performance.enabled:
+            return None
+        try:
+            result = self.driver.execute_script(PERF_COLLECT_JS, mark, self.performance.slowest_resources)
+        except WebDriverException as e:
+            if self.logger is not None:
+                self.logger.warning(f"Could not read performance timings for {name}: {str(e)}")
+            return None
+        metrics = sample_metrics(result)
+        violations = check_budgets(name, metrics, parse_budgets(self.performance.budgets))
+        perf_recorder.add(current_test() or 'session', {
+            'name': name,
+            'url': result['url'],
+            'metrics': metrics,
+            'slowest': result['resources']['slowest'],
+            'violations': violations,
+        })
+        if self.logger is not None:
+            self.logger.info(f"Performance of {name}: " + ', '.join(f"{metric}={value:g}" for metric, value in metrics.items()))
+            for violation in violations:
+                self.logger.warning(f"Performance budget exceeded: {violation}")
+        return metrics
+
+    @staticmethod
+    def collect_locators(source):
+        """
+        Build a {name: locator} dict from a locator class or instance,
+        e.g. collect_locators(LoginPageLocators)
+        """
+        return {
+            name: value for name, value in vars(source if isinstance(source, type) else type(source)).items()
+            if not name.startswith('_') and isinstance(value, tuple) and len(value) == 2
+        }
+
+    def query_elements(self, locators):
+        """
+        Resolve presence, visibility, clickability and text of several
+        locators in a single script call
+        :param locators: dict of name -> (By, value)
+        :return: dict of name -> ElementState
+        """
+        specs = [[name, *compile_locator(locator)] for name, locator in locators.items()]
+        result = self.driver.execute_script(QUERY_ELEMENTS_JS, specs)
+        return {name: ElementState(**result[name]) for name in locators}
+
+    def wait_for_elements(self, locators, state='visible', timeout=None):
+        """
+        Wait until every locator reaches state ('present', 'visible' or
+        'clickable'), polling with one batched query per pass
+        :return: dict of name -> ElementState from the final query
+        """
+        def all_ready(driver):
+            states = self.query_elements(locators)
+            return states if all(getattr(element, state) for element in states.values()) else None
 
-    def find_element(self, locator):
+        return self.wait_for(all_ready, timeout, f"{state} of {', '.join(locators)}")
+
+    def _wait_for_element(self, condition, locator, timeout, description):
+        compiled = compile_locator(locator)
+        element = self.wait_for(condition(compiled), timeout, f"{description} of {locator}")
+        self._element_cache[compiled] = element
+        return element
+
+    def wait_for_visible(self, locator, timeout=None):
         try:
-            return self.wait.until(EC.presence_of_element_located(locator))
+            return self._wait_for_element(EC.visibility_of_element_located, locator, timeout, "visibility")
+        except TimeoutException:
+            raise TimeoutException(f"Element not visible: {locator}")
+
+    def wait_for_clickable(self, locator, timeout=None):
+        try:
+            return self._wait_for_element(EC.element_to_be_clickable, locator, timeout, "clickability")
+        except TimeoutException:
+            raise TimeoutException(f"Element not clickable: {locator}")
+
+    def find_element(self, locator, timeout=None):
+        try:
+            return self._wait_for_element(EC.presence_of_element_located, locator, timeout, "presence")
         except TimeoutException:
             raise TimeoutException(f"Element not found: {locator}")
 
-    def find_elements(self, locator):
+    def find_elements(self, locator, timeout=None):
         try:
-            return self.wait.until(EC.presence_of_all_elements_located(locator))
+            return self.wait_for(EC.presence_of_all_elements_located(compile_locator(locator)), timeout, f"presence of all {locator}")
         except TimeoutException:
             raise TimeoutException(f"Elements not found: {locator}")
 
+    def get_element(self, locator):
+        """
+        Return the cached element for a locator, looking it up only on first use
+        """
+        element = self._element_cache.get(compile_locator(locator))
+        if element is None:
+            element = self.find_element(locator)
+        return element
+
+    def _interact(self, locator, action):
+        """
+        Run action(element) on the cached element, re-resolving it once if it
+        went stale (re-render or navigation)
+        """
+        try:
+            return action(self.get_element(locator))
+        except (StaleElementReferenceException, NoSuchElementException):
+            self._element_cache.pop(compile_locator(locator), None)
+            return action(self.get_element(locator))
+
+    def clear_element_cache(self):
+        self._element_cache.clear()
+
+    def open(self, url):
+        """
+        Navigate to url, dropping element handles from the previous page
+        """
+        self.clear_element_cache()
+        self.driver.get(url)
+        self.record_performance(f"navigation:{urlparse(url).path or '/'}")
+
     def click(self, locator):
         """
         Click on an element
         """
-        element = self.find_element(locator)
-        element.click()
+        self._interact(locator, lambda element: element.click())
 
     def send_keys(self, locator, text):
         """
         Send keys to an element
         """
-        element = self.find_element(locator)
-        element.clear()
-        element.send_keys(text)
+        def clear_and_type(element):
+            element.clear()
+            element.send_keys(text)
+
+        self._interact(locator, clear_and_type)
 
     def get_text(self, locator):
-        element = self.find_element(locator)
-        return element.text
+        return self._interact(locator, lambda element: element.text)
 
-    def is_element_present(self, locator):
+    def is_element_present(self, locator, timeout=None):
         """
-        Check if element is present
+        Check if element is present, waiting up to timeout seconds for it
         """
         try:
-            self.find_element(locator)
+            self.find_element(locator, timeout)
+            return True
+        except TimeoutException:
+            return False
+
+    def is_element_absent(self, locator, timeout=0):
+        """
+        Check that an element is not in the page. With the default timeout of 0
+        this is a single lookup that returns immediately instead of waiting
+        for the element to show up.
+        """
+        try:
+            compiled = compile_locator(locator)
+            self.wait_for_not(lambda driver: driver.find_elements(*compiled), timeout, f"absence of {locator}")
             return True
         except TimeoutException:
             return False
@@ -59,38 +387,26 @@ class BasePage:
         """
         Clear input field
         """
-        element = self.find_element(locator)
-        element.clear()
+        self._interact(locator, lambda element: element.clear())
 
     def get_element_text(self, locator):
         """
         Get text from an element
         """
         try:
-            element = self.find_element(locator)
-            return element.text
+            return self.get_text(locator)
         except TimeoutException:
             self.logger.error(f"Element not found: {locator}")
             return ""
 
     def take_screenshot(self, name):
         """
-        Take screenshot and save it
+        Take screenshot; it is encoded and stored by the background writer
+        under the current test
         """
         try:
-            # Create screenshots directory if it doesn't exist
-            screenshots_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'reports', 'screenshots')
-            if not os.path.exists(screenshots_dir):
-                os.makedirs(screenshots_dir)
-            
-            # Generate filename with timestamp
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{name}_{timestamp}.png"
-            filepath = os.path.join(screenshots_dir, filename)
-            
-            # Take screenshot
-            self.driver.save_screenshot(filepath)
-            self.logger.info(f"Screenshot saved: {filename}")
+            get_screenshot_writer().capture(self.driver, name)
+            self.logger.info(f"Screenshot queued: {name}")
         except Exception as e:
             self.logger.error(f"Failed to take screenshot: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
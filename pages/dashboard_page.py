@@ -1,15 +1,21 @@
 from pages.base_page import BasePage
 from pages.locators.login_locators import LoginPageLocators
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from utils.logger import Logger
+from selenium.common.exceptions import TimeoutException
 import time
 
 class DashboardPage(BasePage):
     def __init__(self, driver):
         super().__init__(driver)
         self.locators = LoginPageLocators()
-        self.logger = Logger()
+        self.logger = Logger('DashboardPage')
+        self.menus = {
+            "Schedule Master": self.locators.SCHEDULE_MASTER,
+            "Member Communication": self.locators.MEMBER_COMMUNICATION,
+            "Member Summary": self.locators.MEMBER_SUMMARY,
+            "Member Call": self.locators.MEMBER_CALL,
+            "Guide Sound": self.locators.GUIDE_SOUND,
+        }
         
     def check_and_click_menu(self, locator, menu_name):
         """
@@ -17,12 +23,15 @@ class DashboardPage(BasePage):
         """
         try:
             self.logger.info(f"Checking and clicking {menu_name} menu")
-            element = WebDriverWait(self.driver, 10).until(
-                EC.element_to_be_clickable(locator)
-            )
+            element = self.wait_for_clickable(locator)
             self.logger.info(f"{menu_name} menu is available")
+            self.watch_for_settle()
+            mark = self.perf_mark()
             element.click()
             self.logger.info(f"Successfully clicked {menu_name} menu")
+            settle_time = self.wait_until_settled()
+            self.logger.info(f"Page settled {settle_time:.3f}s after clicking {menu_name} menu")
+            self.record_performance(f"menu:{menu_name}", mark)
             # Take screenshot after click
             self.take_screenshot(f"{menu_name.lower().replace(' ', '_')}_clicked")
             return True
@@ -31,72 +40,60 @@ class DashboardPage(BasePage):
             self.take_screenshot(f"{menu_name.lower().replace(' ', '_')}_click_failed")
             return False
             
-    def is_schdule_master_menu_present(self):
+    def get_menu_states(self):
         """
-        Check if Schedule master menu is present
+        Presence, visibility, clickability and text of every dashboard menu in one round trip
+        """
+        return self.query_elements(self.menus)
+
+    def are_all_menus_present(self, timeout=None):
+        """
+        Check that every dashboard menu is visible
         """
         try:
-            WebDriverWait(self.driver, 10).until(
-                EC.visibility_of_element_located(self.locators.SCHEDULE_MASTER)
-            )
-            self.logger.info("Schedule master menu is present")
+            self.wait_for_elements(self.menus, 'visible', timeout)
+            self.logger.info("All dashboard menus are present")
+            return True
+        except TimeoutException:
+            missing = [name for name, state in self.get_menu_states().items() if not state.visible]
+            self.logger.error(f"Dashboard menus not found: {', '.join(missing)}")
+            return False
+
+    def _is_menu_present(self, menu_name):
+        try:
+            self.wait_for_elements({menu_name: self.menus[menu_name]}, 'visible')
+            self.logger.info(f"{menu_name} menu is present")
             return True
         except Exception as e:
-            self.logger.error(f"Schedule master menu not found: {str(e)}")
+            self.logger.error(f"{menu_name} menu not found: {str(e)}")
             return False
-            
+
+    def is_schdule_master_menu_present(self):
+        """
+        Check if Schedule master menu is present
+        """
+        return self._is_menu_present("Schedule Master")
+
     def is_member_communication_menu_present(self):
         """
         Check if Member Communication menu is present
         """
-        try:
-            WebDriverWait(self.driver, 10).until(
-                EC.visibility_of_element_located(self.locators.MEMBER_COMMUNICATION)
-            )
-            self.logger.info("Member Communication menu is present")
-            return True
-        except Exception as e:
-            self.logger.error(f"Member Communication menu not found: {str(e)}")
-            return False
-            
+        return self._is_menu_present("Member Communication")
+
     def is_member_summary_menu_present(self):
         """
         Check if Member Summary menu is present
         """
-        try:
-            WebDriverWait(self.driver, 10).until(
-                EC.visibility_of_element_located(self.locators.MEMBER_SUMMARY)
-            )
-            self.logger.info("Member Summary menu is present")
-            return True
-        except Exception as e:
-            self.logger.error(f"Member Summary menu not found: {str(e)}")
-            return False
-            
+        return self._is_menu_present("Member Summary")
+
     def is_member_call_menu_present(self):
         """
         Check if Member Call menu is present
         """
-        try:
-            WebDriverWait(self.driver, 10).until(
-                EC.visibility_of_element_located(self.locators.MEMBER_CALL)
-            )
-            self.logger.info("Member Call menu is present")
-            return True
-        except Exception as e:
-            self.logger.error(f"Member Call menu not found: {str(e)}")
-            return False
-            
+        return self._is_menu_present("Member Call")
+
     def is_guide_sound_menu_present(self):
         """
         Check if Guide Sound menu is present
         """
-        try:
-            WebDriverWait(self.driver, 10).until(
-                EC.visibility_of_element_located(self.locators.GUIDE_SOUND)
-            )
-            self.logger.info("Guide Sound menu is present")
-            return True
-        except Exception as e:
-            self.logger.error(f"Guide Sound menu not found: {str(e)}")
-            return False
\ No newline at end of file
+        return self._is_menu_present("Guide Sound")
@@ -8,6 +8,9 @@ class LoginPageLocators:
     # Buttons
     LOGIN_BUTTON = (By.XPATH, "//button[normalize-space()='Login']")
     
+    # Error messages
+    ERROR_MESSAGE = (By.XPATH, "//*[contains(text(), 'Given email or password does not match')]")
+
     # Staff details
     STAFF_DETAILS = (By.XPATH, "//h6[normalize-space()='Jordan - Wellness Advocate']")
 
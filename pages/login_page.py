@@ -1,19 +1,19 @@
 from pages.base_page import BasePage
 from pages.locators.login_locators import LoginPageLocators
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from utils.logger import Logger
+from utils.auth_state import AuthState
+from selenium.common.exceptions import TimeoutException
 import time
 
 class LoginPage(BasePage):
     def __init__(self, driver):
         super().__init__(driver)
         self.locators = LoginPageLocators()
-        self.logger = Logger()  # Initialize logger
+        self.logger = Logger('LoginPage')
 
     def enter_username(self, username):
         self.logger.info(f"Waiting for username field to be visible")
-        WebDriverWait(self.driver, 10).until(EC.visibility_of_element_located(self.locators.USERNAME_FIELD))
+        self.wait_for_visible(self.locators.USERNAME_FIELD)
         self.logger.info(f"Entering username: {username}")
         self.send_keys(self.locators.USERNAME_FIELD, username)
 
@@ -24,41 +24,102 @@ class LoginPage(BasePage):
     def click_login_button(self):
         self.logger.info("Clicking login button")
         self.click(self.locators.LOGIN_BUTTON)
+
+    def clear_username(self):
+        self.logger.info("Clearing username")
+        self.clear_field(self.locators.USERNAME_FIELD)
+
+    def clear_password(self):
+        self.logger.info("Clearing password")
+        self.clear_field(self.locators.PASSWORD_FIELD)
         
-    def is_staff_details_present(self):
+    def is_staff_details_present(self, timeout=None):
         try:
-            wait = WebDriverWait(self.driver, 3000)
-            staff_details = wait.until(EC.presence_of_element_located(self.locators.STAFF_DETAILS))
+            staff_details = self.find_element(self.locators.STAFF_DETAILS, timeout)
             self.logger.info(f"Staff details found: {staff_details.text}")
             return True
         except Exception as e:
             self.logger.error(f"Staff details not found: {str(e)}")
             return False
 
-    def is_error_message_present(self):
+    def is_error_message_present(self, timeout=None):
         try:
-            wait = WebDriverWait(self.driver, 5)
-            error_message = wait.until(EC.presence_of_element_located(self.locators.ERROR_MESSAGE))
+            error_message = self.find_element(self.locators.ERROR_MESSAGE, timeout)
             self.logger.info(f"Error message found: {error_message.text}")
             return True
         except Exception as e:
             self.logger.error(f"Error message not found: {str(e)}")
             return False
 
+    def is_error_message_visible(self, timeout=None):
+        try:
+            self.wait_for_visible(self.locators.ERROR_MESSAGE, timeout)
+            return True
+        except TimeoutException:
+            self.logger.error("Error message not visible")
+            return False
+
+    def get_error_message_text(self):
+        return self.get_element_text(self.locators.ERROR_MESSAGE)
+
     def login(self, username, password):
         self.logger.info("Starting login process")
         self.enter_username(username)
         self.enter_password(password)
+        outcomes = {
+            'success': self.locators.STAFF_DETAILS,
+            'error': self.locators.ERROR_MESSAGE,
+        }
+        # The page stamps when either outcome renders, so polling does not count
+        mark = self.perf_mark(until=outcomes)
         self.click_login_button()
+
+        # Wait for whichever of success or error message shows up first
+        try:
+            outcome, element = self.wait_for_any(outcomes)
+        except TimeoutException:
+            self.logger.error("Neither success nor error message found")
+            self.take_screenshot("login_attempt")
+            return False
+        # Login to STAFF_DETAILS (or the error banner)
+        self.record_performance('login' if outcome == 'success' else 'login:error', mark)
         self.take_screenshot("login_attempt")
-        
-        # Wait for either success or error message
-        if self.is_staff_details_present():
-            self.logger.info("Login successful - Staff details found")
+
+        if outcome == 'success':
+            self.logger.info(f"Login successful - Staff details found: {element.text}")
             return True
-        elif self.is_error_message_present():
-            self.logger.info("Login failed - Error message found")
+        self.logger.info(f"Login failed - Error message found: {element.text}")
+        return False
+
+    def ensure_logged_in(self, username, password):
+        """
+        Start from a saved authenticated state when a fresh one exists,
+        otherwise log in through the UI and save the resulting state
+        """
+        auth_state = AuthState(
+            self.driver,
+            self.settings.environment.base_url,
+            self.settings.path(self.settings.auth.state_dir),
+            self.settings.auth.storage_state_ttl
+        )
+        if auth_state.restore():
+            # A rejected state lands back on the login form, so stop as soon as either shows
+            try:
+                outcome, _ = self.wait_for_any({
+                    'restored': self.locators.STAFF_DETAILS,
+                    'rejected': self.locators.USERNAME_FIELD,
+                })
+            except TimeoutException:
+                outcome = 'rejected'
+            if outcome == 'restored':
+                self.logger.info("Restored saved login state")
+                return True
+            self.logger.warning("Saved login state was rejected, falling back to UI login")
+            auth_state.clear()
+
+        self.open(self.settings.login_url)
+        if not self.login(username, password):
             return False
-        else:
-            self.logger.error("Neither success nor error message found")
-            return False
\ No newline at end of file
+        auth_state.capture()
+        self.logger.info("Saved login state for reuse")
+        return True
@@ -1,70 +1,98 @@
 import pytest
+import argparse
 import os
 import sys
-from datetime import datetime
+from utils.settings import get_settings
+from utils.test_context import run_id
 
-def run_smoke_tests():
-    """Run all smoke tests"""
-    print("\nRunning Smoke Tests...")
-    pytest.main([
-        "-m", "smoke",
-        "-v",
-        "--html=reports/smoke_report.html",
-        "--self-contained-html"
-    ])
+SUITES = ('smoke', 'regression', 'login', 'all')
 
-def run_regression_tests():
-    """Run all regression tests"""
-    print("\nRunning Regression Tests...")
-    pytest.main([
-        "-m", "regression",
-        "-v",
-        "--html=reports/regression_report.html",
-        "--self-contained-html"
-    ])
+# pytest-xdist distribution mode for each --dist choice. Both keep every test
+# of a class on one worker, so the class-scoped driver fixtures stay intact.
+DIST_MODES = {
+    'class': 'loadscope',
+    'file': 'loadfile',
+}
 
-def run_login_tests():
-    """Run all login-related tests"""
-    print("\nRunning Login Tests...")
-    pytest.main([
-        "-m", "login",
-        "-v",
-        "--html=reports/login_report.html",
-        "--self-contained-html"
-    ])
+def available_memory_mb():
+    """
+    Memory available for new processes in MB, or None if it cannot be determined
+    """
+    try:
+        import psutil
+        return psutil.virtual_memory().available // (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
 
-def run_all_tests():
-    """Run all tests"""
-    print("\nRunning All Tests...")
-    pytest.main([
-        "-v",
-        "--html=reports/full_report.html",
-        "--self-contained-html"
-    ])
+def auto_workers(memory_per_worker_mb):
+    """
+    One worker per CPU, but no more than there is free memory for a browser each
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    memory = available_memory_mb()
+    if memory is None:
+        return cpus
+    return max(1, min(cpus, memory // memory_per_worker_mb))
+
+def parse_workers(value):
+    if value == 'auto':
+        return value
+    try:
+        workers = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a number or 'auto', got {value!r}")
+    if workers < 1:
+        raise argparse.ArgumentTypeError("worker count must be at least 1")
+    return workers
+
+def build_pytest_args(suites, workers, dist, extra_args=()):
+    """
+    pytest arguments for one run of the selected suites
+    :param suites: suite names; 'all' runs every test
+    :param workers: number of xdist workers (1 runs in-process)
+    :param dist: key of DIST_MODES
+    """
+    args = ["-v"]
+    if 'all' not in suites:
+        args += ["-m", " or ".join(suites)]
+    if workers > 1:
+        args += ["-n", str(workers), "--dist", DIST_MODES[dist]]
+    return args + list(extra_args)
+
+def main(argv=None):
+    settings = get_settings()
+    parser = argparse.ArgumentParser(
+        description='Run test suites in parallel; unrecognised arguments are passed on to pytest')
+    parser.add_argument('--suite', '-s', dest='suites', action='append', choices=SUITES,
+                        help='suite to run, may be repeated (default: all)')
+    parser.add_argument('--workers', '-n', type=parse_workers, default=parse_workers(settings.parallel.workers),
+                        help=f"worker processes, each with its own browser: a number or 'auto' "
+                             f"for one per CPU within free memory (default: {settings.parallel.workers})")
+    parser.add_argument('--dist', choices=sorted(DIST_MODES), default=settings.parallel.dist,
+                        help=f"keep each test class or each file on one worker (default: {settings.parallel.dist})")
+    args, extra_args = parser.parse_known_args(argv)
+
+    suites = args.suites or ['all']
+    workers = auto_workers(settings.parallel.memory_per_worker_mb) if args.workers == 'auto' else args.workers
+
+    # Workers inherit the run id, so their logs, screenshots and result fragments land in one run;
+    # the report is rendered from the fragments to reports/runs/<run id>/report/index.html
+    print(f"\nRunning {', '.join(suites)} tests on {workers} worker(s), distributed by {args.dist} (run {run_id()})...")
+    return pytest.main(build_pytest_args(suites, workers, args.dist, extra_args))
 
 if __name__ == "__main__":
-    # Create reports directory if it doesn't exist
-    if not os.path.exists("reports"):
-        os.makedirs("reports")
-    
-    # Get current timestamp for report naming
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    print("Select test suite to run:")
-    print("1. Smoke Tests")
-    print("2. Regression Tests")
-    print("3. Login Tests")
-    print("4. All Tests")
-    
-    choice = input("Enter your choice (1-4): ")
-    
-    if choice == "1":
-        run_smoke_tests()
-    elif choice == "2":
-        run_regression_tests()
-    elif choice == "3":
-        run_login_tests()
-    elif choice == "4":
-        run_all_tests()
-    else:
-        print("Invalid choice. Please select a number between 1 and 4.") 
\ No newline at end of file
+    sys.exit(main())
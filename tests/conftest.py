@@ -1,15 +1,245 @@
 import pytest
-from datetime import datetime
 import os
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
 from utils.driver_factory import DriverFactory
-from utils.logger import Logger
+from utils.logger import Logger, LOG_MODES, begin_test, end_test
 from pages.base_page import BasePage
-from configparser import ConfigParser
-import json
+from utils.wait_engine import wait_recorder
+from utils.perf_metrics import perf_recorder
+from utils.network_capture import NetworkRecorder, close_network_writer, get_network_writer, network_recorder
+from utils.resource_blocking import (active_profile, apply_resource_profile, blocking_stats, profile_patterns,
+                                     resolve_profile, save_resource_sizes, set_resource_profile, summarize_requests)
+from utils.profile_template import profile_template_stats, remove_profiles
+from utils.replay_proxy import MODES as REPLAY_MODES, close_replay_proxy, replay_proxy
+from utils.standin_server import standin_server, start_standin_server, stop_standin_server
+from utils.screenshot_writer import get_screenshot_writer, close_screenshot_writer
+from utils.test_context import run_id, set_current_test
+from utils.settings import configure_settings, get_settings, reset_settings
+from utils.duration_store import DurationStore
+from utils.duration_plugin import DurationPlugin
+from utils.impact_plugin import ImpactPlugin
+from utils.report_fragments import ReportFragmentPlugin
+from utils.report_merge import merge_run
+from utils.results_history import add_run_to_history
+import time
+
+def pytest_addoption(parser):
+    parser.addoption("--log-mode", choices=LOG_MODES, default=None,
+                     help="verbose: log every step; failure_only: keep step logs in memory "
+                          "and write them only for failing tests (default: [LOGGING] mode)")
+    parser.addoption("--browser", choices=('chrome', 'firefox', 'edge'), default=None,
+                     help="browser to run the tests in (default: [ENVIRONMENT] browser)")
+    parser.addoption("--headless", action="store_const", const=True, dest="headless", default=None,
+                     help="run the browser headless")
+    parser.addoption("--headed", action="store_const", const=False, dest="headless",
+                     help="run the browser with a visible window")
+    parser.addoption("--base-url", default=None, help="application URL (default: [ENVIRONMENT] base_url)")
+    parser.addoption("--standin", action="store_const", const=True, default=None,
+                     help="run against the local stand-in app on a random port instead of base_url "
+                          "(default: [STANDIN] enabled)")
+    parser.addoption("--replay", choices=REPLAY_MODES, default=None,
+                     help="record responses through the local proxy, or replay them without the network "
+                          "(default: [REPLAY] mode)")
+    parser.addoption("--replay-strict", action="store_const", const=True, default=None,
+                     help="in replay mode, fail tests that make requests that were never recorded")
+    parser.addoption("--profile-template", action="store_const", const=True, default=None,
+                     help="start browsers from copies of a profile warmed up once per run "
+                          "(default: [PROFILES] template)")
+    parser.addoption("--explicit-wait", type=float, default=None,
+                     help="seconds every page-object wait may take (default: [TIMEOUTS] explicit_wait)")
+    parser.addoption("--network-capture", action="store_const", const=True, default=None,
+                     help="record each test's requests (Chrome and Edge) and link them from the report "
+                          "(default: [NETWORK] enabled)")
+    parser.addoption("--resource-profile", default=None,
+                     help="[RESOURCES] profile of requests the browser blocks, e.g. lean or full "
+                          "(default: resource_profile marker, suite profile, then [RESOURCES] profile)")
+    parser.addoption("--impact-record", action="store_true", default=False,
+                     help="trace the page-object code and locators each test touches into the impact map")
+    parser.addoption("--impact-select", action="store_true", default=False,
+                     help="run only the tests affected by the changed files (see --impact-base, --changed-files)")
+    parser.addoption("--impact-base", default="HEAD",
+                     help="git ref the changes are diffed against, e.g. origin/main (default: HEAD)")
+    parser.addoption("--changed-files", default=None,
+                     help="comma-separated changed files to select tests for instead of the git diff")
+
+def pytest_configure(config):
+    # Create the run id and resolve the settings before xdist starts its
+    # workers, so they all share both
+    run_id()
+    is_worker = hasattr(config, 'workerinput')
+    if not is_worker:
+        overrides = dict(
+            browser=config.getoption('--browser'),
+            headless=config.getoption('headless'),
+            base_url=config.getoption('--base-url'),
+            explicit_wait=config.getoption('--explicit-wait'),
+            network_capture=config.getoption('--network-capture'),
+            # Also the launch profile of Firefox, which cannot switch profiles per test
+            resource_profile=config.getoption('--resource-profile'),
+            standin=config.getoption('--standin'),
+            replay=config.getoption('--replay'),
+            replay_strict=config.getoption('--replay-strict'),
+            profile_template=config.getoption('--profile-template'),
+        )
+        configure_settings(**overrides)
+        if get_settings().standin.enabled:
+            # One server for the whole run; xdist workers reach it through the exported base_url
+            server = start_standin_server(get_settings())
+            configure_settings(**dict(overrides, base_url=server.url))
+        try:
+            profile_patterns(get_settings().resources.profile)
+        except ValueError as e:
+            raise pytest.UsageError(str(e))
+        # Durations are recorded, and xdist scheduled, by the controlling process only
+        durations = get_settings().durations
+        if durations.enabled:
+            store = DurationStore(get_settings().path(durations.db_path), durations.history)
+            config.pluginmanager.register(DurationPlugin(store, durations.keep_runs), 'durations')
+    if config.getoption('--impact-record') or config.getoption('--impact-select'):
+        impact = get_settings().impact
+        changed_files = config.getoption('--changed-files')
+        config.pluginmanager.register(ImpactPlugin(
+            get_settings().path(impact.map_path),
+            impact.full_suite_patterns,
+            record=config.getoption('--impact-record'),
+            select=config.getoption('--impact-select'),
+            base=config.getoption('--impact-base'),
+            changed_files=changed_files.split(',') if changed_files else None,
+            is_worker=is_worker,
+        ), 'impact')
+    # Every process streams its results; the controller renders the report and
+    # adds the run to the results history at the end
+    config.pluginmanager.register(ReportFragmentPlugin(
+        get_settings().path(get_settings().reports.report_path),
+        run_id(),
+        merge=None if is_worker else merge_run,
+        ingest=None if is_worker or not get_settings().history.auto_ingest else add_run_to_history,
+    ), 'report_fragments')
+    for suite in ('smoke', 'regression', 'login'):
+        config.addinivalue_line("markers", f"{suite}: part of the {suite} suite (see run_suites.py)")
+    config.addinivalue_line("markers", "log_mode(mode): log mode for a test, class or module (verbose or failure_only)")
+    config.addinivalue_line("markers", "resource_profile(name): [RESOURCES] profile for a test, class or module")
+
+def pytest_unconfigure(config):
+    if not hasattr(config, 'workerinput'):
+        server = stop_standin_server()
+        if server is not None:
+            Logger().info(f"Stand-in server answered {server.requests} requests ({server.failures} simulated failures)")
+        # Every worker has quit its browsers by now
+        if get_settings().profiles.template:
+            remove_profiles(get_settings().profiles.temp_dir)
+        reset_settings()
+
+def get_log_mode(item):
+    """
+    Log mode for a test: log_mode marker, then --log-mode, then config.ini
+    """
+    marker = item.get_closest_marker('log_mode')
+    if marker is not None:
+        return marker.args[0]
+    return item.config.getoption('--log-mode') or get_settings().logging.mode
+
+def get_resource_profile(item):
+    """
+    Resource profile for a test: resource_profile marker, then --resource-profile,
+    then the profile of its suite, then config.ini
+    """
+    marker = item.get_closest_marker('resource_profile')
+    return resolve_profile(
+        marker.args[0] if marker is not None else None,
+        item.config.getoption('--resource-profile'),
+        [marker.name for marker in item.iter_markers()],
+    )
+
+def pytest_collection_modifyitems(config, items):
+    """
+    Reject log_mode and resource_profile markers with unknown values before
+    any test runs, naming the tests that use them, instead of failing inside
+    the run protocol
+    """
+    errors = []
+    for item in items:
+        try:
+            mode = get_log_mode(item)
+        except IndexError:
+            errors.append(f"{item.nodeid}: log_mode needs a mode")
+        else:
+            if mode not in LOG_MODES:
+                errors.append(f"{item.nodeid}: Unsupported log mode: {mode} (expected one of {', '.join(LOG_MODES)})")
+        try:
+            profile_patterns(get_resource_profile(item))
+        except IndexError:
+            errors.append(f"{item.nodeid}: resource_profile needs a profile name")
+        except ValueError as e:
+            errors.append(f"{item.nodeid}: {e}")
+    if errors:
+        raise pytest.UsageError("Invalid test markers:\n" + "\n".join(errors))
+
+def drain_network(item, report):
+    """
+    Read the requests of a test from its browser's performance log, write the
+    network capture and count the requests its resource profile blocked
+    """
+    # Read before teardown, which may hand the browser back to the pool or quit it
+    driver = getattr(item.cls, 'driver', None)
+    recorder = network_recorder(driver) if driver is not None else None
+    if recorder is None:
+        return
+    settings = get_settings()
+    capture = settings.network.enabled and (report.failed or not settings.network.failures_only)
+    try:
+        drain_time = NetworkRecorder.total_drain_time
+        entries = recorder.drain(keep=capture or settings.resources.report_blocked)
+        overhead = NetworkRecorder.total_drain_time - drain_time
+    except WebDriverException as e:
+        Logger().warning(f"Could not read the network requests of {item.nodeid}: {str(e)}")
+        return
+    if capture:
+        summary = get_network_writer().record(item.nodeid, entries, overhead)
+        if summary is not None:
+            report.user_properties.append(('network', summary))
+    if settings.resources.report_blocked:
+        report.user_properties.append(('resources', summarize_requests(active_profile(), entries)))
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    """
+    Track the running test so screenshots are indexed under it, including
+    those taken by class-scoped fixtures
+    """
+    set_current_test(item.nodeid)
+    set_resource_profile(get_resource_profile(item))
+    proxy = replay_proxy()
+    item.replay_misses = proxy.miss_count() if proxy is not None else 0
+    item.log_failed = False
+    begin_test(get_log_mode(item), get_settings().logging.buffer_size)
+    start = time.perf_counter()
+    yield
+    end_test(item.log_failed, f"PASSED {item.nodeid} in {time.perf_counter() - start:.2f}s")
+    set_current_test(None)
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    """
+    Fail a test that passed but exceeded a [PERFORMANCE] budget, or made
+    requests a strict replay has no recording of, including those of its
+    class's setup
+    """
+    outcome = yield
+    if outcome.excinfo is None and get_settings().performance.fail_on_budget:
+        violations = perf_recorder.violations(item.nodeid)
+        if violations:
+            outcome.force_exception(pytest.fail.Exception(
+                "Performance budget exceeded: " + '; '.join(violations), pytrace=False))
+    proxy = replay_proxy()
+    if outcome.excinfo is None and proxy is not None and proxy.strict:
+        misses = proxy.misses_since(item.replay_misses)
+        if misses:
+            outcome.force_exception(pytest.fail.Exception(
+                f"{len(misses)} requests not recorded for replay: " + '; '.join(misses[:10]), pytrace=False))
 
 @pytest.hookimpl(hookwrapper=True)
 def pytest_runtest_makereport(item, call):
@@ -20,6 +250,16 @@ def pytest_runtest_makereport(item, call):
     outcome = yield
     report = outcome.get_result()
     extra = getattr(report, 'extra', [])
+    if report.failed:
+        # Keeps the buffered step logs of failure_only mode
+        item.log_failed = True
+    if report.when == 'call' or (report.when == 'setup' and not report.passed):
+        drain_network(item, report)
+    if report.when == 'teardown':
+        samples = perf_recorder.pop(item.nodeid)
+        if samples:
+            # Travels with the report into the run's result fragments
+            report.user_properties.append(('perf', samples))
 
     if report.when == 'call' or report.when == "setup":
         xfail = hasattr(report, 'wasxfail')
@@ -27,56 +267,121 @@ def pytest_runtest_makereport(item, call):
             # Get the driver from the test instance
             driver = getattr(item.cls, 'driver', None)
             if driver is not None:
-                # Create screenshots directory if it doesn't exist
-                screenshots_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'reports', 'screenshots')
-                if not os.path.exists(screenshots_dir):
-                    os.makedirs(screenshots_dir)
-                
-                # Take screenshot
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                screenshot_path = os.path.join(screenshots_dir, f'screenshot_{timestamp}.png')
-                driver.save_screenshot(screenshot_path)
+                # Take screenshot and wait for the writer so the index can resolve it
+                writer = get_screenshot_writer()
+                writer.capture(driver, f'{report.when}_failure', item.nodeid)
+                writer.flush()
+                screenshot_path = writer.store.lookup(item.nodeid, f'{report.when}_failure')
                 
                 # Add screenshot to report
-                extra.append(pytest_html.extras.image(screenshot_path))
+                if screenshot_path is not None:
+                    extra.append(pytest_html.extras.image(screenshot_path))
         
         report.extra = extra
 
+@pytest.fixture(scope="session", autouse=True)
+def driver_pool():
+    """
+    Pre-launch the pooled browsers for this process and quit them at session end
+    """
+    factory = DriverFactory()
+    if factory.settings.pool.enabled:
+        factory.get_pool().warm()
+    yield
+    stats = DriverFactory.shutdown_pool()
+    if stats is not None:
+        Logger().info(f"Driver pool stats: {stats}")
+    for browser, clone_stats in profile_template_stats().items():
+        Logger().info(f"Profile template ({browser}): {clone_stats}")
+
+@pytest.fixture(scope="session", autouse=True)
+def replay_session():
+    """
+    Stop the record/replay proxy at session end and log what it served
+    """
+    yield
+    proxy = close_replay_proxy()
+    if proxy is not None:
+        Logger().info(f"Replay proxy {proxy.stats()}")
+
+@pytest.fixture(scope="session", autouse=True)
+def wait_timings():
+    """
+    Log the slowest waits of the session
+    """
+    yield
+    logger = Logger()
+    logger.info(f"Total time spent waiting: {wait_recorder.total_time():.2f}s")
+    for description, elapsed, matched in wait_recorder.slowest(5):
+        logger.info(f"Slow wait {elapsed:.2f}s ({'matched' if matched else 'timed out'}): {description}")
+
+@pytest.fixture(scope="session", autouse=True)
+def screenshot_writer():
+    """
+    Flush queued screenshots to disk at session end
+    """
+    yield
+    for error in close_screenshot_writer():
+        Logger().error(f"Failed to write screenshot: {error}")
+
+@pytest.fixture(scope="session", autouse=True)
+def network_writer():
+    """
+    Flush network captures at session end and report what capturing cost
+    """
+    yield
+    writer = close_network_writer()
+    if writer is not None:
+        Logger().info(f"Network capture: {writer.stats()}, "
+                      f"{NetworkRecorder.total_drain_time:.2f}s on the test threads reading the log")
+        for error in writer.errors:
+            Logger().error(f"Failed to capture network requests: {error}")
+
+@pytest.fixture(scope="session", autouse=True)
+def resource_blocking():
+    """
+    Keep the resource sizes learned this session and log what blocking saved
+    """
+    yield
+    save_resource_sizes()
+    if blocking_stats.tests:
+        Logger().info(f"Resource blocking: {blocking_stats}")
+
+@pytest.fixture(scope="session")
+def standin():
+    """
+    The local stand-in server of a --standin run, e.g. to change its latency
+    or failure rate from a test. Skips the test in other runs and in xdist
+    workers, which only share the controller's server through base_url.
+    """
+    server = standin_server()
+    if server is None:
+        pytest.skip("needs the stand-in server in this process (--standin, without xdist)")
+    return server
+
 @pytest.fixture(scope="function", autouse=True)
 def setup_teardown(request):
     """
     Setup and teardown for each test
     """
+    driver = getattr(request.cls, 'driver', None)
+    if driver is not None:
+        # A test of the class may use another resource profile than the one
+        # its browser was acquired with
+        apply_resource_profile(driver, active_profile())
     yield
     # Take screenshot after each test
     driver = getattr(request.cls, 'driver', None)
     if driver is not None:
-        # Create screenshots directory if it doesn't exist
-        screenshots_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'reports', 'screenshots')
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-        
-        # Take screenshot
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        screenshot_path = os.path.join(screenshots_dir, f'test_{request.node.name}_{timestamp}.png')
-        driver.save_screenshot(screenshot_path)
-
-def load_config():
-    config = ConfigParser()
-    config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'config.ini')
-    config.read(config_path)
-    return config
-
-def load_test_data():
-    with open(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'test_data.json'), 'r') as f:
-        return json.load(f)
+        # Take screenshot; the writer thread stores it in the background
+        get_screenshot_writer().capture(driver, 'after_test', request.node.nodeid)
 
 @pytest.fixture(scope="class")
 def setup(request):
     """
     Setup fixture that initializes the driver and other components
     """
-    driver = DriverFactory().get_driver()
+    driver = DriverFactory().acquire_driver()
     logger = Logger()
     base_page = BasePage(driver)
     
@@ -84,10 +389,10 @@ def setup(request):
     request.cls.driver = driver
     request.cls.logger = logger
     request.cls.base_page = base_page
-    request.cls.config = load_config()
-    request.cls.test_data = load_test_data()
+    request.cls.settings = get_settings()
+    request.cls.test_data = request.cls.settings.test_data
     
     yield
     
-    # Teardown
-    driver.quit() 
\ No newline at end of file
+    # Teardown: hand the browser back to the pool
+    DriverFactory().release_driver(driver) 
\ No newline at end of file
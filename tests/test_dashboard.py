@@ -4,17 +4,14 @@ from utils.driver_factory import DriverFactory
 from utils.logger import Logger
 from pages.login_page import LoginPage
 from pages.dashboard_page import DashboardPage
-from configparser import ConfigParser
-import json
-import os
-import time
+from utils.settings import get_settings
 
 @pytest.fixture(scope="class")
 def setup(request):
     """
     Setup fixture for dashboard tests
     """
-    driver = DriverFactory().get_driver()
+    driver = DriverFactory().acquire_driver()
     logger = Logger()
     login_page = LoginPage(driver)
     dashboard_page = DashboardPage(driver)
@@ -24,29 +21,18 @@ def setup(request):
     request.cls.logger = logger
     request.cls.login_page = login_page
     request.cls.dashboard_page = dashboard_page
-    request.cls.config = load_config()
-    request.cls.test_data = load_test_data()
+    request.cls.settings = get_settings()
+    request.cls.test_data = request.cls.settings.test_data
     
-    # Perform login first
+    # Start authenticated, reusing a saved login state when one is fresh
     try:
         request.cls.logger.info("Starting dashboard test setup")
-        # Navigate to login page
-        driver.get(request.cls.config.get('ENVIRONMENT', 'base_url') + '/login')
-        request.cls.logger.info("Navigated to login page")
-        
-        # Perform login
-        request.cls.logger.info("Attempting to login with valid credentials")
-        login_page.login(
+        logged_in = login_page.ensure_logged_in(
             request.cls.test_data['login']['valid_username'],
             request.cls.test_data['login']['valid_password']
         )
         
-        # Verify login was successful by checking for staff details
-        request.cls.logger.info("Checking for staff details after login")
-        staff_details_present = login_page.is_staff_details_present()
-        request.cls.logger.info(f"Staff details check result: {staff_details_present}")
-        
-        if not staff_details_present:
+        if not logged_in:
             raise Exception("Login failed - staff details not found")
             
         request.cls.logger.info("Login successful, proceeding with dashboard tests")
@@ -58,24 +44,8 @@ def setup(request):
     
     yield
     
-    # Teardown
-    driver.quit()
-
-def load_config():
-    """
-    Load configuration from config.ini
-    """
-    config = ConfigParser()
-    config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'config.ini')
-    config.read(config_path)
-    return config
-
-def load_test_data():
-    """
-    Load test data from test_data.json
-    """
-    with open(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'test_data.json'), 'r') as f:
-        return json.load(f)
+    # Teardown: hand the browser back to the pool
+    DriverFactory().release_driver(driver)
 
 @pytest.mark.usefixtures("setup")
 @pytest.mark.smoke
@@ -96,9 +66,6 @@ class TestDashboard:
             )
             assert result, "Failed to check and click Schedule Master menu"
             
-            # Add a small delay to see the result
-            time.sleep(2)
-            
             self.logger.info("Schedule Master menu check and click test completed successfully")
             
         except Exception as e:
@@ -119,9 +86,6 @@ class TestDashboard:
             )
             assert result, "Failed to check and click Member Communication menu"
             
-            # Add a small delay to see the result
-            time.sleep(2)
-            
             self.logger.info("Member Communication menu check and click test completed successfully")
             
         except Exception as e:
@@ -142,9 +106,6 @@ class TestDashboard:
             )
             assert result, "Failed to check and click Member Summary menu"
             
-            # Add a small delay to see the result
-            time.sleep(2)
-            
             self.logger.info("Member Summary menu check and click test completed successfully")
             
         except Exception as e:
@@ -165,9 +126,6 @@ class TestDashboard:
             )
             assert result, "Failed to check and click Member Call menu"
             
-            # Add a small delay to see the result
-            time.sleep(2)
-            
             self.logger.info("Member Call menu check and click test completed successfully")
             
         except Exception as e:
@@ -188,9 +146,6 @@ class TestDashboard:
             )
             assert result, "Failed to check and click Guide Sound menu"
             
-            # Add a small delay to see the result
-            time.sleep(2)
-            
             self.logger.info("Guide Sound menu check and click test completed successfully")
             
         except Exception as e:
@@ -1,36 +1,24 @@
 import pytest
-import json
-import os
 from selenium.webdriver.common.by import By
 from utils.driver_factory import DriverFactory
 from utils.logger import Logger
 from pages.login_page import LoginPage
-from configparser import ConfigParser
+from utils.settings import get_settings
 import time
 import logging
 
 @pytest.fixture(scope="class")
 def setup(request):
-    driver = DriverFactory().get_driver()
+    driver = DriverFactory().acquire_driver()
     logger = Logger()
     login_page = LoginPage(driver)
     request.cls.driver = driver
     request.cls.logger = logger
     request.cls.login_page = login_page
-    request.cls.config = load_config()
-    request.cls.test_data = load_test_data()
+    request.cls.settings = get_settings()
+    request.cls.test_data = request.cls.settings.test_data
     yield
-    driver.quit()
-
-def load_config():
-    config = ConfigParser()
-    config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'config.ini')
-    config.read(config_path)
-    return config
-
-def load_test_data():
-    with open(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'test_data.json'), 'r') as f:
-        return json.load(f)
+    DriverFactory().release_driver(driver)
 
 @pytest.mark.usefixtures("setup")
 @pytest.mark.smoke
@@ -39,7 +27,7 @@ class TestLogin:
         self.logger.info("Starting valid login test")
         try:
             # Navigate to login page
-            self.driver.get(self.config.get('ENVIRONMENT', 'base_url') + '/login')
+            self.login_page.open(self.settings.login_url)
             self.logger.info("Navigated to login page")
             # Use LoginPage methods for login
             self.logger.info("Attempting to login with valid credentials")
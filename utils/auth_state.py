@@ -0,0 +1,93 @@
+import json
+import os
+import time
+
+
+class AuthState:
+    """
+    Capture and restore an authenticated browser session (cookies plus
+    local/session storage) so suites that only need a logged-in user can skip
+    the UI login flow.
+
+    Each pytest-xdist worker keeps its own state file.
+    """
+    def __init__(self, driver, base_url, state_dir, max_age):
+        """
+        :param driver: WebDriver instance
+        :param base_url: application base URL the state belongs to
+        :param state_dir: directory holding the state files
+        :param max_age: seconds a captured state is considered fresh
+        """
+        self.driver = driver
+        self.base_url = base_url.rstrip('/')
+        self.max_age = max_age
+        worker = os.environ.get('PYTEST_XDIST_WORKER', 'main')
+        self.state_file = os.path.join(state_dir, f'storage_state_{worker}.json')
+
+    def capture(self):
+        """
+        Save the current session to the state file
+        """
+        state = {
+            'captured_at': time.time(),
+            'base_url': self.base_url,
+            'url': self.driver.current_url,
+            'cookies': self.driver.get_cookies(),
+            'local_storage': self.driver.execute_script("return Object.assign({}, window.localStorage);"),
+            'session_storage': self.driver.execute_script("return Object.assign({}, window.sessionStorage);"),
+        }
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        tmp_file = f'{self.state_file}.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self.state_file)
+
+    def load(self):
+        """
+        Return the saved state, or None if it is missing or no longer fresh
+        """
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return state if self.is_fresh(state) else None
+
+    def is_fresh(self, state):
+        """
+        A state is fresh when it belongs to this base_url, is younger than
+        max_age and none of its cookies have expired
+        """
+        now = time.time()
+        if state.get('base_url') != self.base_url:
+            return False
+        if now - state.get('captured_at', 0) > self.max_age:
+            return False
+        return all(cookie.get('expiry', now + 1) > now for cookie in state.get('cookies', []))
+
+    def restore(self):
+        """
+        Inject the saved state into the browser and open the page that was
+        showing when it was captured.
+        :return: True if a fresh state was injected, False otherwise
+        """
+        state = self.load()
+        if state is None:
+            return False
+        # Cookies and storage can only be set while on the application's origin
+        self.driver.get(self.base_url + '/login')
+        for cookie in state['cookies']:
+            self.driver.add_cookie(cookie)
+        self.driver.execute_script(
+            "for (const [k, v] of Object.entries(arguments[0])) window.localStorage.setItem(k, v);"
+            "for (const [k, v] of Object.entries(arguments[1])) window.sessionStorage.setItem(k, v);",
+            state['local_storage'], state['session_storage'])
+        self.driver.get(state['url'])
+        return True
+
+    def clear(self):
+        """
+        Remove the saved state, e.g. after it failed to authenticate
+        """
+        if os.path.exists(self.state_file):
+            os.remove(self.state_file)
@@ -1,129 +1,415 @@
+import json
 import os
-import shutil
+import tarfile
 import time
-from datetime import datetime, timedelta
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from functools import cached_property
+from utils.report_merge import read_fragment
+from utils.settings import BASE_DIR, get_settings
+from utils.test_context import safe_name
 
-def cleanup_reports(days_to_keep=7):
+FAILED_OUTCOMES = ('failed', 'error', 'xpassed')
+# Parts of an expired run with failures that are kept, besides the failed tests' screenshots and network captures
+FAILURE_ARTIFACTS = ('fragments', 'report')
+# Screenshot blobs younger than this are never removed: a run in progress
+# writes the blob before the index entry that refers to it
+BLOB_GRACE_SECONDS = 3600
+
+DAY = 86400
+MB = 1024 * 1024
+
+
+def scan(path):
     """
-    Remove reports and logs older than specified days
-    :param days_to_keep: Number of days to keep reports (default: 7)
+    (path, size, mtime) of every file below path. Built on os.scandir, so each
+    directory is listed once and file types come from the listing itself.
     """
-    base_dir = os.path.dirname(os.path.dirname(__file__))
-    reports_dir = os.path.join(base_dir, 'reports')
-    logs_dir = os.path.join(base_dir, 'logs')
-    
-    cutoff_date = datetime.now() - timedelta(days=days_to_keep)
-    
-    # Cleanup reports directory
-    if os.path.exists(reports_dir):
-        for item in os.listdir(reports_dir):
-            item_path = os.path.join(reports_dir, item)
-            try:
-                if os.path.isfile(item_path):
-                    # Check file modification time
-                    file_time = datetime.fromtimestamp(os.path.getmtime(item_path))
-                    if file_time < cutoff_date:
-                        os.remove(item_path)
-                        print(f"Removed old report: {item}")
-                elif os.path.isdir(item_path) and item == 'screenshots':
-                    # Cleanup screenshots directory
-                    for screenshot in os.listdir(item_path):
-                        screenshot_path = os.path.join(item_path, screenshot)
-                        if os.path.isfile(screenshot_path):
-                            file_time = datetime.fromtimestamp(os.path.getmtime(screenshot_path))
-                            if file_time < cutoff_date:
-                                os.remove(screenshot_path)
-                                print(f"Removed old screenshot: {screenshot}")
-            except PermissionError:
-                print(f"Permission denied for {item_path}. Skipping...")
-            except Exception as e:
-                print(f"Error processing {item_path}: {str(e)}")
-    
-    # Cleanup logs directory
-    if os.path.exists(logs_dir):
-        for log_file in os.listdir(logs_dir):
-            log_path = os.path.join(logs_dir, log_file)
-            try:
-                if os.path.isfile(log_path):
-                    file_time = datetime.fromtimestamp(os.path.getmtime(log_path))
-                    if file_time < cutoff_date:
-                        os.remove(log_path)
-                        print(f"Removed old log: {log_file}")
-            except PermissionError:
-                print(f"Permission denied for {log_path}. Skipping...")
-            except Exception as e:
-                print(f"Error processing {log_path}: {str(e)}")
-
-def cleanup_all_reports():
+    files = []
+    stack = [path]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        stat = entry.stat(follow_symlinks=False)
+                        files.append((entry.path, stat.st_size, stat.st_mtime))
+                except OSError:
+                    continue
+    return files
+
+
+def _size(files):
+    return sum(size for _, size, _ in files)
+
+
+def _read_index(path):
+    try:
+        with open(path, 'r') as f:
+            return {(entry['blob'], entry['extension']) for entry in map(json.loads, filter(str.strip, f))}
+    except (OSError, ValueError, KeyError):
+        return set()
+
+
+class RunArtifacts:
     """
-    Remove all reports and logs (use with caution)
+    What one run left behind: its directory under reports/runs, its log files
+    and the screenshot blobs its per-test indexes refer to
     """
-    base_dir = os.path.dirname(os.path.dirname(__file__))
-    reports_dir = os.path.join(base_dir, 'reports')
-    logs_dir = os.path.join(base_dir, 'logs')
-    
-    try:
-        # Cleanup reports directory
-        if os.path.exists(reports_dir):
-            # First, try to remove individual files
-            for root, dirs, files in os.walk(reports_dir):
-                for file in files:
-                    try:
-                        file_path = os.path.join(root, file)
-                        os.remove(file_path)
-                        print(f"Removed file: {file_path}")
-                    except PermissionError:
-                        print(f"Permission denied for {file_path}. Skipping...")
-                    except Exception as e:
-                        print(f"Error removing {file_path}: {str(e)}")
-            
-            # Then try to remove empty directories
-            for root, dirs, files in os.walk(reports_dir, topdown=False):
-                for dir in dirs:
-                    try:
-                        dir_path = os.path.join(root, dir)
-                        os.rmdir(dir_path)
-                        print(f"Removed directory: {dir_path}")
-                    except PermissionError:
-                        print(f"Permission denied for {dir_path}. Skipping...")
-                    except Exception as e:
-                        print(f"Error removing {dir_path}: {str(e)}")
-            
-            # Finally, try to remove the reports directory itself
+    def __init__(self, run, path):
+        self.run = run
+        self.path = path
+        self.files = scan(path)
+        self.logs = []
+        self.mtime = max((mtime for _, _, mtime in self.files), default=os.path.getmtime(path))
+        self.index_dir = os.path.join(path, 'screenshots')
+        self.indexes = {file: _read_index(file) for file, _, _ in self.files
+                        if os.path.dirname(file) == self.index_dir and file.endswith('.jsonl')}
+        self.blobs = set().union(*self.indexes.values())
+
+    @cached_property
+    def failure_paths(self):
+        """
+        Screenshot indexes and network captures of the tests that failed in
+        this run; only read from the fragments when the run has expired
+        """
+        fragments = os.path.join(self.path, 'fragments')
+        failed = set()
+        for file, _, _ in self.files:
+            if os.path.dirname(file) == fragments and file.endswith('.jsonl'):
+                failed.update(record['nodeid'] for record in read_fragment(file)
+                              if record.get('outcome') in FAILED_OUTCOMES)
+        return {os.path.join(self.path, directory, f'{safe_name(nodeid)}.jsonl')
+                for nodeid in failed for directory in ('screenshots', 'network')}
+
+    @property
+    def failed(self):
+        return bool(self.failure_paths)
+
+    def kept_files(self, state):
+        if state == 'keep':
+            return self.files + self.logs
+        if state == 'prune':
+            return [file for file in self.files if file[0] in self.failure_paths
+                    or os.path.relpath(file[0], self.path).split(os.sep)[0] in FAILURE_ARTIFACTS] + self.logs
+        return []
+
+    def kept_blobs(self, state):
+        if state == 'keep':
+            return self.blobs
+        if state == 'prune':
+            return set().union(*(self.indexes.get(path, set()) for path in self.failure_paths))
+        return set()
+
+
+class RetentionPlan:
+    """
+    Everything a cleanup removes or archives, grouped by category for the summary
+    """
+    def __init__(self):
+        self.delete = {}
+        self.archive = []
+        self.runs = {}
+        self.remaining = 0
+        self.quota = 0
+
+    def add(self, category, files):
+        self.delete.setdefault(category, []).extend(files)
+
+    def summary(self, dry_run):
+        states = Counter(self.runs.values())
+        lines = [f"{'Would remove' if dry_run else 'Removed'}:"]
+        for category, files in self.delete.items():
+            if files:
+                lines.append(f"  {category:<24} {len(files):>8} files {_size(files) / MB:>10.1f} MB")
+        total = [file for files in self.delete.values() for file in files]
+        lines.append(f"  {'total':<24} {len(total):>8} files {_size(total) / MB:>10.1f} MB")
+        lines.append(f"Runs: {states['keep']} kept, {states['prune']} pruned to their failures, "
+                     f"{states['remove']} removed, {len(self.archive)} {'to archive' if dry_run else 'archived'}")
+        usage = f"Reports, screenshots and logs: {self.remaining / MB:.1f} MB"
+        if self.quota:
+            usage += f" of {self.quota / MB:.0f} MB"
+            if self.remaining > self.quota:
+                usage += " (still over quota: only failures and the latest runs are left)"
+        lines.append(usage)
+        return '\n'.join(lines)
+
+
+class ReportRetention:
+    """
+    Retention engine for reports, screenshots and logs.
+
+    Runs expire by age, except for the keep_runs latest ones; with a size
+    quota the oldest runs go first until the rest fits. Expired runs with
+    failures are pruned to their report, fragments, logs and the failed
+    tests' screenshots and network captures instead of being removed. Screenshot blobs no kept
+    run refers to are removed with them. Deletion is done in batches by a
+    thread pool, since most of the time goes into waiting for the file system.
+    """
+    def __init__(self, policy, report_dir, screenshot_dir, logs_dir, archive_dir, now=None, blob_grace=BLOB_GRACE_SECONDS):
+        """
+        :param policy: RetentionSettings
+        """
+        self.policy = policy
+        self.report_dir = report_dir
+        self.screenshot_dir = screenshot_dir
+        self.blob_dir = os.path.join(screenshot_dir, 'blobs')
+        self.logs_dir = logs_dir
+        self.archive_dir = archive_dir
+        self.now = now or time.time()
+        self.blob_grace = blob_grace
+
+    def _expired(self, mtime, days):
+        return self.now - mtime > days * DAY
+
+    def _load_runs(self, executor):
+        runs_dir = os.path.join(self.report_dir, 'runs')
+        try:
+            with os.scandir(runs_dir) as entries:
+                paths = [(entry.name, entry.path) for entry in entries if entry.is_dir(follow_symlinks=False)]
+        except OSError:
+            paths = []
+        runs = sorted(executor.map(lambda item: RunArtifacts(*item), paths), key=lambda run: run.mtime, reverse=True)
+        return runs
+
+    def _top_level(self):
+        """
+        Files directly in reports/ and reports/screenshots/ (single pytest-html reports, legacy screenshots)
+        """
+        files = []
+        for directory in (self.report_dir, self.screenshot_dir):
             try:
-                os.rmdir(reports_dir)
-                print("Reports directory removed")
-            except PermissionError:
-                print("Permission denied for reports directory. Skipping...")
-            except Exception as e:
-                print(f"Error removing reports directory: {str(e)}")
-        
-        # Cleanup logs directory
-        if os.path.exists(logs_dir):
-            for root, dirs, files in os.walk(logs_dir):
-                for file in files:
-                    try:
-                        file_path = os.path.join(root, file)
-                        os.remove(file_path)
-                        print(f"Removed log file: {file_path}")
-                    except PermissionError:
-                        print(f"Permission denied for {file_path}. Skipping...")
-                    except Exception as e:
-                        print(f"Error removing {file_path}: {str(e)}")
-            
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_file(follow_symlinks=False):
+                            stat = entry.stat(follow_symlinks=False)
+                            files.append((entry.path, stat.st_size, stat.st_mtime))
+            except OSError:
+                continue
+        return files
+
+    def plan(self, executor):
+        policy = self.policy
+        plan = RetentionPlan()
+        plan.quota = policy.max_size_mb * MB
+        runs = self._load_runs(executor)
+        by_name = {run.run: run for run in runs}
+
+        orphan_logs = []
+        for file in scan(self.logs_dir):
+            # test_<run id>_<worker>.jsonl
+            name = os.path.basename(file[0])
+            run = by_name.get(name[len('test_'):].rsplit('_', 1)[0]) if name.startswith('test_') else None
+            if run is not None:
+                run.logs.append(file)
+            else:
+                orphan_logs.append(file)
+
+        # Age
+        for number, run in enumerate(runs):
+            if number < policy.keep_runs or not self._expired(run.mtime, policy.max_age_days):
+                plan.runs[run] = 'keep'
+            elif policy.keep_failures and run.failed and (
+                    policy.failure_max_age_days <= 0 or not self._expired(run.mtime, policy.failure_max_age_days)):
+                plan.runs[run] = 'prune'
+            else:
+                plan.runs[run] = 'remove'
+        plan.add('logs', [file for file in orphan_logs if self._expired(file[2], policy.max_age_days)])
+        plan.add('reports', [file for file in self._top_level() if self._expired(file[2], policy.max_age_days)])
+
+        references = Counter()
+        for run, state in plan.runs.items():
+            references.update(run.kept_blobs(state))
+        blobs = {}
+        for file in scan(self.blob_dir):
+            digest, _, extension = os.path.basename(file[0]).partition('.')
+            blobs[(digest, extension)] = file
+        removable_blob = lambda blob: blob in blobs and self.now - blobs[blob][2] > self.blob_grace
+
+        # Quota: oldest evictable runs first
+        if plan.quota:
+            removed = {path for files in plan.delete.values() for path, _, _ in files}
+            remaining = sum(_size(run.kept_files(state)) for run, state in plan.runs.items())
+            remaining += _size(file for file in orphan_logs + self._top_level() if file[0] not in removed)
+            remaining += sum(file[1] for blob, file in blobs.items() if references[blob] or not removable_blob(blob))
+            for run in reversed(runs[policy.keep_runs:]):
+                if remaining <= plan.quota:
+                    break
+                if plan.runs[run] != 'keep':
+                    continue
+                state = 'prune' if policy.keep_failures and run.failed else 'remove'
+                remaining -= _size(run.kept_files('keep')) - _size(run.kept_files(state))
+                for blob in run.blobs - run.kept_blobs(state):
+                    references[blob] -= 1
+                    if not references[blob] and removable_blob(blob):
+                        remaining -= blobs[blob][1]
+                plan.runs[run] = state
+
+        for run, state in plan.runs.items():
+            if state == 'keep':
+                continue
+            kept = {path for path, _, _ in run.kept_files(state)}
+            category = 'runs pruned to failures' if state == 'prune' else 'runs'
+            plan.add(category, [file for file in run.files if file[0] not in kept])
+            if state == 'remove':
+                plan.add('logs', run.logs)
+                if policy.archive:
+                    plan.archive.append(run)
+        plan.add('screenshots', [file for blob, file in blobs.items() if not references[blob] and removable_blob(blob)])
+        plan.add('archives', [file for file in scan(self.archive_dir)
+                              if self._expired(file[2], policy.archive_max_age_days)])
+
+        removed = {path for files in plan.delete.values() for path, _, _ in files}
+        plan.remaining = sum(size for path, size, _ in
+                             [file for run in runs for file in run.files + run.logs] + orphan_logs
+                             + self._top_level() + list(blobs.values()) if path not in removed)
+        return plan
+
+    def _archive(self, run):
+        """
+        Pack a run with its logs and screenshots into <archive_dir>/<run id>.tar.gz
+        """
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f'{run.run}.tar.gz')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with tarfile.open(tmp_path, 'w:gz') as archive:
+            for file, _, _ in run.files:
+                archive.add(file, os.path.relpath(file, self.report_dir), recursive=False)
+            for file, _, _ in run.logs:
+                archive.add(file, os.path.join('logs', os.path.basename(file)), recursive=False)
+            for digest, extension in run.blobs:
+                blob = os.path.join(self.blob_dir, digest[:2], f'{digest}.{extension}')
+                if os.path.exists(blob):
+                    archive.add(blob, os.path.relpath(blob, os.path.dirname(self.screenshot_dir)), recursive=False)
+        os.replace(tmp_path, path)
+        return path
+
+    @staticmethod
+    def _remove_batch(paths):
+        errors = []
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                errors.append(f"{path}: {str(e)}")
+        return errors
+
+    def _remove_empty_dirs(self, paths):
+        """
+        Remove the directories left empty below the run, blob and log directories
+        """
+        roots = {os.path.abspath(path) for path in (self.report_dir, os.path.join(self.report_dir, 'runs'), self.screenshot_dir,
+                                                   self.blob_dir, self.logs_dir, self.archive_dir)}
+        directories = set()
+        for path in paths:
+            directory = os.path.dirname(os.path.abspath(path))
+            while directory not in roots and directory not in directories and directory != os.path.dirname(directory):
+                directories.add(directory)
+                directory = os.path.dirname(directory)
+        for directory in sorted(directories, key=len, reverse=True):
             try:
-                os.rmdir(logs_dir)
-                print("Logs directory removed")
-            except PermissionError:
-                print("Permission denied for logs directory. Skipping...")
-            except Exception as e:
-                print(f"Error removing logs directory: {str(e)}")
-        
-        # Create fresh directories
-        os.makedirs(reports_dir, exist_ok=True)
-        os.makedirs(os.path.join(reports_dir, 'screenshots'), exist_ok=True)
-        os.makedirs(logs_dir, exist_ok=True)
-        print("Fresh directories created")
-        
-    except Exception as e:
-        print(f"Error during cleanup: {str(e)}") 
\ No newline at end of file
+                os.rmdir(directory)
+            except OSError:
+                continue
+
+    def apply(self, plan, executor):
+        """
+        :return: list of errors
+        """
+        errors = []
+        for run, result in zip(plan.archive, executor.map(self._safe_archive, plan.archive)):
+            if result is not None:
+                errors.append(result)
+                # Keep what could not be archived
+                plan.runs[run] = 'keep'
+                kept = {path for path, _, _ in run.files + run.logs}
+                kept |= {os.path.join(self.blob_dir, digest[:2], f'{digest}.{extension}') for digest, extension in run.blobs}
+                for category, files in plan.delete.items():
+                    plan.delete[category] = [file for file in files if file[0] not in kept]
+        paths = [path for files in plan.delete.values() for path, _, _ in files]
+        batches = [paths[start:start + self.policy.batch_size] for start in range(0, len(paths), self.policy.batch_size)]
+        for batch_errors in executor.map(self._remove_batch, batches):
+            errors.extend(batch_errors)
+        self._remove_empty_dirs(paths)
+        return errors
+
+    def _safe_archive(self, run):
+        try:
+            self._archive(run)
+            return None
+        except Exception as e:
+            return f"Could not archive run {run.run}: {str(e)}"
+
+    def run(self, dry_run=False):
+        """
+        Apply the policy, or with dry_run only work out what it would do
+        :return: (plan, errors)
+        """
+        with ThreadPoolExecutor(max_workers=max(1, self.policy.workers)) as executor:
+            plan = self.plan(executor)
+            errors = [] if dry_run else self.apply(plan, executor)
+        return plan, errors
+
+
+def retention_engine(policy=None, blob_grace=BLOB_GRACE_SECONDS):
+    """
+    ReportRetention for the configured directories
+    :param policy: RetentionSettings (default: [RETENTION] in config.ini)
+    """
+    settings = get_settings()
+    return ReportRetention(
+        policy or settings.retention,
+        settings.path(settings.reports.report_path),
+        settings.path(settings.reports.screenshot_path),
+        os.path.join(BASE_DIR, 'logs'),
+        settings.path(settings.retention.archive_dir),
+        blob_grace=blob_grace,
+    )
+
+
+def _report(plan, errors, dry_run, started):
+    print(plan.summary(dry_run))
+    if errors:
+        print(f"{len(errors)} error(s):")
+        for error in errors[:10]:
+            print(f"  {error}")
+        if len(errors) > 10:
+            print(f"  ... and {len(errors) - 10} more")
+    print(f"Finished in {time.perf_counter() - started:.1f}s")
+
+
+def cleanup_reports(days_to_keep=None, dry_run=False, **policy):
+    """
+    Remove expired reports, screenshots and logs according to the [RETENTION] policy
+    :param days_to_keep: Number of days to keep reports (default: max_age_days)
+    :param policy: RetentionSettings fields to override (keep_runs, max_size_mb, archive, ...)
+    """
+    started = time.perf_counter()
+    settings = get_settings().retention
+    if days_to_keep is not None:
+        policy['max_age_days'] = days_to_keep
+    plan, errors = retention_engine(replace(settings, **policy)).run(dry_run)
+    _report(plan, errors, dry_run, started)
+    return plan, errors
+
+
+def cleanup_all_reports(dry_run=False):
+    """
+    Remove all reports, screenshots and logs (use with caution). The results
+    and duration history, archives and saved logins are kept.
+    """
+    started = time.perf_counter()
+    policy = replace(get_settings().retention, max_age_days=0, keep_runs=0, max_size_mb=0,
+                     keep_failures=False, archive=False)
+    plan, errors = retention_engine(policy, blob_grace=0).run(dry_run)
+    _report(plan, errors, dry_run, started)
+    return plan, errors
@@ -2,46 +2,177 @@ from selenium import webdriver
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.firefox.service import Service as FirefoxService
 from selenium.webdriver.edge.service import Service as EdgeService
-from webdriver_manager.chrome import ChromeDriverManager
-from webdriver_manager.firefox import GeckoDriverManager
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
-from configparser import ConfigParser
-import os
+from utils.driver_pool import DriverPool
+from utils.driver_resolver import DriverResolver
+from utils.logger import Logger
+from utils.profile_template import get_profile_template, remove_with, wait_for_quiet
+from utils.replay_proxy import get_replay_proxy
+from utils.network_capture import attach_network_recorder, enable_network_logging
+from utils.resource_blocking import active_profile, apply_resource_profile, firefox_preferences, launched_with_profile
+from utils.settings import get_settings
 
 class DriverFactory:
+    # One pool per process, shared by every DriverFactory instance
+    _pool = None
+
     def __init__(self):
-        self.config = ConfigParser()
-        self.config.read(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'config.ini'))
+        self.settings = get_settings()
+
+    def _pool_enabled(self):
+        return self.settings.pool.enabled
+
+    def get_pool(self):
+        """
+        Return the process-wide driver pool, creating it on first use
+        """
+        if DriverFactory._pool is None:
+            DriverFactory._pool = DriverPool(self.get_driver, self.settings.pool.size)
+        return DriverFactory._pool
+
+    def acquire_driver(self):
+        """
+        Get a browser for a test class, reusing a pooled session when possible,
+        with the resource profile of the running test applied
+        """
+        driver = self.get_driver() if not self._pool_enabled() else self.get_pool().acquire()
+        apply_resource_profile(driver, active_profile())
+        return driver
+
+    def release_driver(self, driver):
+        """
+        Hand a browser back after a test class; it is reset and kept warm
+        instead of being quit when pooling is enabled
+        """
+        if not self._pool_enabled():
+            driver.quit()
+            return
+        self.get_pool().release(driver)
+
+    @classmethod
+    def shutdown_pool(cls):
+        """
+        Quit all pooled browsers and return the pool stats (None without a pool)
+        """
+        pool, cls._pool = cls._pool, None
+        if pool is None:
+            return None
+        pool.shutdown()
+        return pool.stats
 
-    def get_driver(self):
-        browser = self.config.get('ENVIRONMENT', 'browser').lower()
-        headless = self.config.getboolean('ENVIRONMENT', 'headless')
+    def get_resolver(self):
+        return DriverResolver(
+            self.settings.drivers.cache_dir,
+            self.settings.drivers.manifest,
+            self.settings.drivers.offline
+        )
+
+    @staticmethod
+    def _use_replay_proxy(options):
+        """
+        Route the browser through the [REPLAY] record/replay proxy of this process
+        """
+        proxy = get_replay_proxy()
+        if proxy is not None:
+            options.proxy = proxy.selenium_proxy()
+            # The proxy intercepts HTTPS with its own self-signed certificate
+            options.accept_insecure_certs = True
+
+    def _clone_profile(self, browser):
+        """
+        Copy of the warmed-up [PROFILES] template for a new session, or None
+        to start from an empty profile
+        """
+        profiles = self.settings.profiles
+        if not profiles.template:
+            return None
+        template = get_profile_template(browser, profiles.temp_dir)
+        try:
+            template.ensure(self._build_profile_template)
+        except Exception as e:
+            if not template.failed:
+                raise
+            Logger().warning(f"Starting {browser} with an empty profile: {str(e)}")
+            return None
+        return template.clone()
+
+    def _build_profile_template(self, directory):
+        """
+        Warm up a profile: load the application pages so their resources and
+        compiled scripts are cached, then quit so everything is written out
+        """
+        driver = self.get_driver(profile_dir=directory)
+        try:
+            for path in self.settings.profiles.warm_url_list:
+                driver.get(self.settings.environment.base_url + path)
+                wait_for_quiet(driver)
+        finally:
+            driver.quit()
+
+    def get_driver(self, profile_dir=None):
+        """
+        Launch a browser
+        :param profile_dir: profile directory to use (default: a copy of the
+            profile template when [PROFILES] template is on, else a new empty one)
+        """
+        browser = self.settings.environment.browser
+        headless = self.settings.environment.headless
+        if browser not in ('chrome', 'firefox', 'edge'):
+            raise ValueError(f"Unsupported browser: {browser}")
+        clone = None
+        if profile_dir is None:
+            profile_dir = clone = self._clone_profile(browser)
+        driver_path = self.get_resolver().resolve(browser)
+        # The performance log also tells which requests a resource profile blocked
+        network_capture = self.settings.network.enabled or self.settings.resources.report_blocked
 
         if browser == 'chrome':
             options = webdriver.ChromeOptions()
             if headless:
                 options.add_argument('--headless')
-            service = ChromeService(ChromeDriverManager().install())
+            if profile_dir:
+                options.add_argument(f'--user-data-dir={profile_dir}')
+            if network_capture:
+                enable_network_logging('chrome', options)
+            self._use_replay_proxy(options)
+            service = ChromeService(driver_path)
             driver = webdriver.Chrome(service=service, options=options)
             driver.maximize_window()
         elif browser == 'firefox':
             options = webdriver.FirefoxOptions()
             if headless:
                 options.add_argument('--headless')
-            service = FirefoxService(GeckoDriverManager().install())
+            if profile_dir:
+                # Used in place, unlike options.profile, which geckodriver would copy again
+                options.add_argument('-profile')
+                options.add_argument(profile_dir)
+            # Firefox cannot block URLs at runtime, so it keeps the profile of the run
+            for name, value in firefox_preferences(self.settings.resources.profile).items():
+                options.set_preference(name, value)
+            self._use_replay_proxy(options)
+            service = FirefoxService(driver_path)
             driver = webdriver.Firefox(service=service, options=options)
+            launched_with_profile(driver, self.settings.resources.profile)
         elif browser == 'edge':
             options = webdriver.EdgeOptions()
             if headless:
                 options.add_argument('--headless')
-            service = EdgeService(EdgeChromiumDriverManager().install())
+            if profile_dir:
+                options.add_argument(f'--user-data-dir={profile_dir}')
+            if network_capture:
+                enable_network_logging('edge', options)
+            self._use_replay_proxy(options)
+            service = EdgeService(driver_path)
             driver = webdriver.Edge(service=service, options=options)
             driver.maximize_window()
-        else:
-            raise ValueError(f"Unsupported browser: {browser}")
 
         # Set timeouts
-        driver.implicitly_wait(int(self.config.get('TIMEOUTS', 'implicit_wait')))
-        driver.set_page_load_timeout(int(self.config.get('TIMEOUTS', 'page_load_timeout')))
+        # Implicit waits stay off: they compound with the explicit waits in BasePage
+        driver.implicitly_wait(0)
+        driver.set_page_load_timeout(self.settings.timeouts.page_load_timeout)
+        driver.set_script_timeout(self.settings.timeouts.script_timeout)
+        if network_capture and browser in ('chrome', 'edge'):
+            attach_network_recorder(driver)
+        if clone is not None:
+            remove_with(driver, clone)
 
         return driver 
\ No newline at end of file
@@ -0,0 +1,165 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PoolStats:
+    """
+    Counters for a DriverPool (hit rate, launch and reset timings)
+    """
+    def __init__(self):
+        self.acquisitions = 0
+        self.hits = 0
+        self.misses = 0
+        self.launches = 0
+        self.launch_time = 0.0
+        self.resets = 0
+        self.reset_time = 0.0
+        self.reset_failures = 0
+        self.discarded = 0
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.acquisitions if self.acquisitions else 0.0
+
+    @property
+    def avg_launch_time(self):
+        return self.launch_time / self.launches if self.launches else 0.0
+
+    @property
+    def avg_reset_time(self):
+        return self.reset_time / self.resets if self.resets else 0.0
+
+    def as_dict(self):
+        return {
+            'acquisitions': self.acquisitions,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hit_rate, 3),
+            'launches': self.launches,
+            'avg_launch_time': round(self.avg_launch_time, 3),
+            'resets': self.resets,
+            'avg_reset_time': round(self.avg_reset_time, 3),
+            'reset_failures': self.reset_failures,
+            'discarded': self.discarded,
+        }
+
+    def __str__(self):
+        return ", ".join(f"{key}={value}" for key, value in self.as_dict().items())
+
+
+class DriverPool:
+    """
+    Keeps up to `size` idle browsers per process so test classes can reuse a
+    running session instead of launching a new one.
+
+    Every pytest-xdist worker is its own process, so each worker gets its own pool.
+    """
+    def __init__(self, launcher, size=1):
+        """
+        :param launcher: callable returning a freshly launched WebDriver
+        :param size: maximum number of idle browsers kept warm
+        """
+        self.launcher = launcher
+        self.size = size
+        self.stats = PoolStats()
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _launch(self):
+        start = time.perf_counter()
+        driver = self.launcher()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.stats.launches += 1
+            self.stats.launch_time += elapsed
+        return driver
+
+    def warm(self):
+        """
+        Pre-launch browsers in parallel until `size` are idle
+        """
+        with self._lock:
+            missing = self.size - len(self._idle)
+        if missing <= 0:
+            return
+        with ThreadPoolExecutor(max_workers=missing) as executor:
+            drivers = list(executor.map(lambda _: self._launch(), range(missing)))
+        with self._lock:
+            self._idle.extend(drivers)
+
+    def acquire(self):
+        """
+        Hand out an idle browser, launching a new one if none is available
+        """
+        with self._lock:
+            self.stats.acquisitions += 1
+            if self._idle:
+                self.stats.hits += 1
+                return self._idle.pop()
+            self.stats.misses += 1
+        return self._launch()
+
+    def release(self, driver):
+        """
+        Reset a browser and return it to the pool, or quit it if the reset
+        fails or the pool is already full
+        """
+        start = time.perf_counter()
+        try:
+            self.reset(driver)
+        except Exception:
+            with self._lock:
+                self.stats.reset_failures += 1
+                self.stats.discarded += 1
+            self._quit(driver)
+            return
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.stats.resets += 1
+            self.stats.reset_time += elapsed
+            if len(self._idle) < self.size:
+                self._idle.append(driver)
+                return
+            self.stats.discarded += 1
+        self._quit(driver)
+
+    def reset(self, driver):
+        """
+        Bring a browser back to a blank state: a single window on about:blank
+        with no cookies or web storage. Chromium browsers clear the storage of
+        every origin; Firefox only that of the origin it was left on, so
+        storage of other origins a class visited carries over there.
+        """
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        if driver.current_url.startswith('http'):
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        driver.delete_all_cookies()
+        if hasattr(driver, 'execute_cdp_cmd'):
+            # delete_all_cookies and the storage clear above only cover the current origin
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            driver.execute_cdp_cmd('Storage.clearDataForOrigin', {
+                'origin': '*',
+                'storageTypes': 'local_storage,session_storage,indexeddb,cache_storage',
+            })
+        driver.get('about:blank')
+
+    def shutdown(self):
+        """
+        Quit every idle browser
+        """
+        with self._lock:
+            drivers, self._idle = self._idle, []
+        for driver in drivers:
+            self._quit(driver)
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
@@ -0,0 +1,159 @@
+import argparse
+import json
+import os
+import time
+from webdriver_manager.chrome import ChromeDriverManager
+from webdriver_manager.firefox import GeckoDriverManager
+from webdriver_manager.microsoft import EdgeChromiumDriverManager
+from webdriver_manager.core.utils import ChromeType, get_browser_version_from_os
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+_MANAGERS = {
+    'chrome': ChromeDriverManager,
+    'firefox': GeckoDriverManager,
+    'edge': EdgeChromiumDriverManager,
+}
+
+_BROWSER_TYPES = {
+    'chrome': ChromeType.GOOGLE,
+    'firefox': 'firefox',
+    'edge': ChromeType.MSEDGE,
+}
+
+
+class DriverResolver:
+    """
+    Resolve WebDriver binaries from a local manifest that pins one driver per
+    installed browser version.
+
+    Resolution makes no network calls; the binary is validated once per process.
+    Use `prefetch` (or `python -m utils.driver_resolver prefetch`) to fill the
+    cache on a machine with network access.
+    """
+    # Per-process memo of browser -> validated driver path
+    _resolved = {}
+    _browser_versions = {}
+
+    def __init__(self, cache_dir, manifest_path, offline=False):
+        """
+        :param cache_dir: directory the driver binaries are downloaded to
+        :param manifest_path: JSON file mapping browser versions to drivers
+        :param offline: never fall back to downloading a missing driver
+        """
+        self.cache_dir = os.path.join(BASE_DIR, cache_dir)
+        self.manifest_path = os.path.join(BASE_DIR, manifest_path)
+        self.offline = offline
+
+    def browser_version(self, browser):
+        """
+        Installed browser version, detected once per process
+        """
+        if browser not in DriverResolver._browser_versions:
+            DriverResolver._browser_versions[browser] = get_browser_version_from_os(_BROWSER_TYPES[browser])
+        return DriverResolver._browser_versions[browser]
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest):
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = f'{self.manifest_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def lookup(self, browser, version):
+        """
+        Find the pinned entry for a browser version, matching the exact version
+        first and then the major version
+        """
+        entries = self.load_manifest().get(browser, {})
+        if (version or 'unknown') in entries:
+            return entries[version or 'unknown']
+        if version:
+            major = version.split('.')[0]
+            for pinned_version in sorted(entries, reverse=True):
+                if pinned_version.split('.')[0] == major:
+                    return entries[pinned_version]
+        return None
+
+    def resolve(self, browser):
+        """
+        Return the driver path for the installed browser
+        """
+        if browser in DriverResolver._resolved:
+            return DriverResolver._resolved[browser]
+
+        version = self.browser_version(browser)
+        entry = self.lookup(browser, version)
+        driver_path = None
+        if entry is not None:
+            driver_path = os.path.join(self.cache_dir, entry['driver_path'])
+            if not self.is_valid(driver_path):
+                driver_path = None
+
+        if driver_path is None:
+            if self.offline:
+                raise RuntimeError(
+                    f"No pinned {browser} driver for browser version {version} in {self.manifest_path}. "
+                    f"Run 'python -m utils.driver_resolver prefetch {browser}' on a machine with network access.")
+            driver_path = self.prefetch(browser)
+
+        DriverResolver._resolved[browser] = driver_path
+        return driver_path
+
+    @staticmethod
+    def is_valid(driver_path):
+        return os.path.isfile(driver_path) and os.access(driver_path, os.X_OK)
+
+    def prefetch(self, browser):
+        """
+        Download the driver matching the installed browser and pin it in the manifest
+        """
+        version = self.browser_version(browser)
+        driver_path = _MANAGERS[browser](path=self.cache_dir).install()
+        manifest = self.load_manifest()
+        manifest.setdefault(browser, {})[version or 'unknown'] = {
+            'driver_path': os.path.relpath(driver_path, self.cache_dir),
+            'driver_version': os.path.basename(os.path.dirname(driver_path)),
+            'pinned_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        self.save_manifest(manifest)
+        return driver_path
+
+
+def main():
+    from utils.settings import get_settings
+
+    parser = argparse.ArgumentParser(description='Manage pinned WebDriver binaries')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    prefetch_parser = subparsers.add_parser('prefetch', help='Download and pin drivers for the installed browsers')
+    prefetch_parser.add_argument('browsers', nargs='*', help=f"Browsers to prefetch: {', '.join(sorted(_MANAGERS))} (default: all)")
+    subparsers.add_parser('show', help='Print the pinned driver manifest')
+    args = parser.parse_args()
+
+    settings = get_settings()
+    resolver = DriverResolver(settings.drivers.cache_dir, settings.drivers.manifest)
+
+    unknown = set(getattr(args, 'browsers', [])) - set(_MANAGERS)
+    if unknown:
+        parser.error(f"Unsupported browser: {', '.join(sorted(unknown))}")
+
+    if args.command == 'show':
+        print(json.dumps(resolver.load_manifest(), indent=4, sort_keys=True))
+        return
+
+    for browser in args.browsers or sorted(_MANAGERS):
+        try:
+            print(f"Pinned {browser} driver: {resolver.prefetch(browser)}")
+        except Exception as e:
+            print(f"Error prefetching {browser} driver: {str(e)}")
+
+
+if __name__ == '__main__':
+    main()
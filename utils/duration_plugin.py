@@ -0,0 +1,88 @@
+import pytest
+from utils.duration_store import PHASES
+from utils.logger import Logger
+from utils.test_context import run_id, worker_id
+
+try:
+    from xdist.scheduler import LoadFileScheduling, LoadScopeScheduling
+except ImportError:  # pytest-xdist is optional; without it tests run serially anyway
+    LoadFileScheduling = LoadScopeScheduling = None
+
+
+class LongestFirstMixin:
+    """
+    Longest-processing-time-first scheduling for pytest-xdist's scope based
+    schedulers: whenever a worker needs work it gets the pending scope (class
+    or file) with the largest expected duration, so the slow scopes start
+    early and the short ones fill the gaps at the end of the run.
+    """
+    def __init__(self, config, log=None, estimates=None):
+        super().__init__(config, log)
+        self.estimates = estimates or {}
+        known = list(self.estimates.values())
+        # Tests without history are assumed to take as long as an average test
+        self.default_estimate = sum(known) / len(known) if known else 1.0
+
+    def scope_estimate(self, work_unit):
+        return sum(self.estimates.get(nodeid, self.default_estimate)
+                   for nodeid, completed in work_unit.items() if not completed)
+
+    def _assign_work_unit(self, node):
+        scope = max(self.workqueue, key=lambda scope: self.scope_estimate(self.workqueue[scope]))
+        self.workqueue.move_to_end(scope, last=False)
+        super()._assign_work_unit(node)
+
+
+if LoadScopeScheduling is not None:
+    class LongestFirstScopeScheduling(LongestFirstMixin, LoadScopeScheduling):
+        pass
+
+    class LongestFirstFileScheduling(LongestFirstMixin, LoadFileScheduling):
+        pass
+
+    SCHEDULERS = {
+        'loadscope': LongestFirstScopeScheduling,
+        'loadfile': LongestFirstFileScheduling,
+    }
+else:
+    SCHEDULERS = {}
+
+
+class DurationPlugin:
+    """
+    Records every test's setup, call and teardown time into the duration
+    store at the end of a run, and schedules --dist loadscope/loadfile runs
+    longest-first from the recorded history
+    """
+    def __init__(self, store, keep_runs=50):
+        self.store = store
+        self.keep_runs = keep_runs
+        self.timings = {}
+
+    def pytest_runtest_logreport(self, report):
+        timing = self.timings.setdefault(report.nodeid, {phase: 0.0 for phase in PHASES})
+        # Reruns add up: they are part of what the test costs
+        timing[report.when] += report.duration
+        if report.when == 'call' or report.failed or report.skipped:
+            timing['outcome'] = report.outcome
+        node = getattr(report, 'node', None)
+        timing['worker_id'] = node.gateway.id if node is not None else worker_id()
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_xdist_make_scheduler(self, config, log):
+        scheduler = SCHEDULERS.get(config.getvalue('dist'))
+        if scheduler is None:
+            return None
+        estimates = self.store.estimates()
+        if not estimates:
+            return None
+        return scheduler(config, log, estimates)
+
+    def pytest_sessionfinish(self, session):
+        if session.config.getoption('collectonly'):
+            return
+        try:
+            self.store.record(run_id(), self.timings)
+            self.store.prune(self.keep_runs)
+        except Exception as e:
+            Logger().warning(f"Could not record test durations: {str(e)}")
@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS durations (
+    run_id TEXT NOT NULL,
+    nodeid TEXT NOT NULL,
+    class_id TEXT NOT NULL,
+    worker_id TEXT,
+    outcome TEXT,
+    setup REAL NOT NULL DEFAULT 0,
+    call REAL NOT NULL DEFAULT 0,
+    teardown REAL NOT NULL DEFAULT 0,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (run_id, nodeid)
+);
+CREATE INDEX IF NOT EXISTS durations_nodeid ON durations (nodeid, recorded_at);
+CREATE INDEX IF NOT EXISTS durations_class ON durations (class_id, recorded_at);
+"""
+
+PHASES = ('setup', 'call', 'teardown')
+
+
+def class_id(nodeid):
+    """
+    Node id of the class (or, for plain functions, the module) a test belongs to
+    """
+    return nodeid.rsplit('::', 1)[0]
+
+
+class DurationStore:
+    """
+    SQLite store of setup, call and teardown times per test and run.
+    Estimates average the latest runs of each test, so one slow run does not
+    dominate and renamed or deleted tests simply age out.
+    """
+    def __init__(self, path, history=5):
+        """
+        :param path: SQLite database file, created on first use
+        :param history: number of latest runs of a test its estimate averages
+        """
+        self.path = path
+        self.history = history
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.executescript(SCHEMA)
+        return connection
+
+    def record(self, run_id, timings):
+        """
+        Store one run's timings in a single transaction
+        :param timings: dict of nodeid -> {'setup': s, 'call': s, 'teardown': s,
+            'outcome': str, 'worker_id': str}
+        """
+        if not timings:
+            return
+        now = time.time()
+        rows = [
+            (run_id, nodeid, class_id(nodeid), timing.get('worker_id'), timing.get('outcome'),
+             timing.get('setup', 0), timing.get('call', 0), timing.get('teardown', 0), now)
+            for nodeid, timing in timings.items()
+        ]
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO durations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        finally:
+            connection.close()
+
+    def _latest(self, key, columns):
+        if not os.path.exists(self.path):
+            return []
+        connection = self._connect()
+        try:
+            return connection.execute(f"""
+                SELECT {key}, {columns} FROM (
+                    SELECT *, ROW_NUMBER() OVER (PARTITION BY nodeid ORDER BY recorded_at DESC) AS age
+                    FROM durations
+                ) WHERE age <= ? GROUP BY {key}
+            """, (self.history,)).fetchall()
+        finally:
+            connection.close()
+
+    def estimates(self):
+        """
+        Expected total (setup + call + teardown) seconds per test node id
+        """
+        return dict(self._latest('nodeid', 'AVG(setup + call + teardown)'))
+
+    def class_estimates(self):
+        """
+        Expected (setup, call, teardown) seconds per class; a class's setup
+        includes its class-scoped fixtures, which run in its first test's setup
+        """
+        rows = self._latest('class_id', 'SUM(setup) / COUNT(DISTINCT run_id), '
+                                        'SUM(call) / COUNT(DISTINCT run_id), '
+                                        'SUM(teardown) / COUNT(DISTINCT run_id)')
+        return {row[0]: tuple(row[1:]) for row in rows}
+
+    def prune(self, keep_runs):
+        """
+        Drop all but the latest keep_runs runs
+        """
+        if not os.path.exists(self.path):
+            return
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute("""
+                    DELETE FROM durations WHERE run_id NOT IN (
+                        SELECT run_id FROM durations GROUP BY run_id
+                        ORDER BY MAX(recorded_at) DESC LIMIT ?
+                    )
+                """, (keep_runs,))
+        finally:
+            connection.close()
@@ -0,0 +1,272 @@
+import argparse
+import ast
+import fnmatch
+import importlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# Code traced while recording: calls into these directories are attributed to the running test
+TRACED_DIRS = ('pages',)
+LOCATORS_DIR = os.path.join('pages', 'locators')
+
+_HUNK = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+
+
+def _relpath(path):
+    return os.path.relpath(path, BASE_DIR).replace(os.sep, '/')
+
+
+def locator_index():
+    """
+    Map every locator tuple defined under pages/locators to the constants
+    that define it, as 'pages/locators/<file>.py::<Class>.<NAME>'
+    """
+    index = {}
+    locators_dir = os.path.join(BASE_DIR, LOCATORS_DIR)
+    for file in sorted(os.listdir(locators_dir)):
+        if not file.endswith('.py') or file.startswith('_'):
+            continue
+        module = importlib.import_module(f"{LOCATORS_DIR.replace(os.sep, '.')}.{file[:-3]}")
+        for source in vars(module).values():
+            if not isinstance(source, type) or source.__module__ != module.__name__:
+                continue
+            for name, value in vars(source).items():
+                if not name.startswith('_') and isinstance(value, tuple) and len(value) == 2:
+                    index.setdefault(value, []).append(f"{_relpath(module.__file__)}::{source.__name__}.{name}")
+    return index
+
+
+class ImpactRecorder:
+    """
+    Records which page-object modules, methods and locator constants a test
+    touches, using a profile hook. Calls into TRACED_DIRS are recorded by
+    qualified name, and locator arguments ('locator', 'locators', 'conditions')
+    of those calls are matched back to the constants that define them.
+    """
+    def __init__(self):
+        self.traced_dirs = tuple(os.path.join(BASE_DIR, directory) + os.sep for directory in TRACED_DIRS)
+        self.locators = locator_index()
+        self._files = {}
+        self._reset()
+
+    def _reset(self):
+        self.modules = set()
+        self.symbols = set()
+
+    def _traced_path(self, filename):
+        if filename not in self._files:
+            path = os.path.abspath(filename)
+            self._files[filename] = _relpath(path) if path.startswith(self.traced_dirs) else None
+        return self._files[filename]
+
+    def _note_locator(self, value):
+        if isinstance(value, tuple):
+            for constant in self.locators.get(value, ()):
+                self.symbols.add(constant)
+                self.modules.add(constant.split('::')[0])
+        elif isinstance(value, dict):
+            for item in value.values():
+                self._note_locator(item)
+
+    def _profile(self, frame, event, arg):
+        if event != 'call':
+            return
+        code = frame.f_code
+        path = self._traced_path(code.co_filename)
+        if path is None:
+            return
+        self.modules.add(path)
+        self.symbols.add(f"{path}::{getattr(code, 'co_qualname', code.co_name)}")
+        for name in ('locator', 'locators', 'conditions'):
+            if name in code.co_varnames[:code.co_argcount]:
+                self._note_locator(frame.f_locals.get(name))
+
+    def start(self):
+        self._reset()
+        sys.setprofile(self._profile)
+
+    def stop(self):
+        """
+        Stop recording; returns what the test touched
+        """
+        sys.setprofile(None)
+        return {'modules': sorted(self.modules), 'symbols': sorted(self.symbols)}
+
+
+def load_map(path):
+    """
+    Recorded impact map: {test id: {'modules': [...], 'symbols': [...]}}, or None if there is none
+    """
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)['tests']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_map(path, tests, run_id=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'recorded_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'run_id': run_id, 'tests': tests},
+                  f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _git(*args):
+    return subprocess.run(['git', '-C', BASE_DIR, *args], capture_output=True, text=True, check=True).stdout
+
+
+def changed_files(base='HEAD'):
+    """
+    Files changed in the working tree since the merge base with base, plus untracked files
+    """
+    merge_base = _git('merge-base', base, 'HEAD').strip()
+    files = _git('diff', '--name-only', '--relative', merge_base).split()
+    files += _git('ls-files', '--others', '--exclude-standard').split()
+    return sorted(set(files)), merge_base
+
+
+def _outer_symbols(source):
+    """
+    (first line, last line, qualname) of every top-level function, method and
+    class attribute of a module; nested functions belong to their outer function
+    """
+    symbols = []
+
+    def visit(nodes, prefix):
+        for node in nodes:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+                symbols.append((start, node.end_lineno, prefix + node.name))
+            elif isinstance(node, ast.ClassDef):
+                visit(node.body, f"{prefix}{node.name}.")
+            elif prefix and isinstance(node, (ast.Assign, ast.AnnAssign)):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        symbols.append((node.lineno, node.end_lineno, prefix + target.id))
+
+    visit(ast.parse(source).body, '')
+    return symbols
+
+
+def _symbol_at(symbols, line):
+    for start, end, name in symbols:
+        if start <= line <= end:
+            return name
+    return None
+
+
+def changed_symbols(path, merge_base):
+    """
+    Qualified names of the functions, methods and class attributes a diff
+    touches in a Python file, or None when it touches module-level code
+    (imports, new or deleted definitions, ...) and the whole module counts as changed
+    """
+    try:
+        with open(os.path.join(BASE_DIR, path), 'r') as f:
+            symbols = _outer_symbols(f.read())
+        diff = _git('diff', '-U0', '--relative', merge_base, '--', path)
+    except (OSError, SyntaxError, subprocess.CalledProcessError):
+        return None
+    if not diff.strip():
+        return None
+
+    changed = set()
+    for line in diff.splitlines():
+        match = _HUNK.match(line)
+        if not match:
+            continue
+        start, count = int(match.group(1)), int(match.group(2) or 1)
+        if count == 0:
+            # Pure deletion after line start: local only if both neighbours share a symbol
+            before, after = _symbol_at(symbols, start), _symbol_at(symbols, start + 1)
+            if before is None or before != after:
+                return None
+            changed.add(before)
+            continue
+        for number in range(start, start + count):
+            name = _symbol_at(symbols, number)
+            if name is None:
+                return None
+            changed.add(name)
+    return changed
+
+
+def select_tests(impact_map, test_ids, changes, full_suite_patterns):
+    """
+    Select the tests affected by a change
+    :param impact_map: recorded map, see load_map
+    :param test_ids: ids of all collected tests ('<file>::<name>', relative to the project root)
+    :param changes: dict of changed file -> set of changed qualnames, or None for the whole file
+    :param full_suite_patterns: glob patterns of files whose change affects every test
+    :return: (selected test ids or None for the full suite, reason)
+    """
+    for path in changes:
+        for pattern in full_suite_patterns:
+            if fnmatch.fnmatch(path, pattern):
+                return None, f"{path} matches {pattern}"
+    if impact_map is None:
+        return None, "no impact map recorded yet"
+
+    selected = set()
+    for test_id in test_ids:
+        recorded = impact_map.get(test_id)
+        if recorded is None:
+            selected.add(test_id)  # new or never recorded
+            continue
+        if test_id.split('::')[0] in changes:
+            selected.add(test_id)
+            continue
+        for path, names in changes.items():
+            if path not in recorded['modules']:
+                continue
+            if names is None or any(
+                    symbol == f"{path}::{name}" or symbol.startswith(f"{path}::{name}.")
+                    for symbol in recorded['symbols'] for name in names):
+                selected.add(test_id)
+                break
+    return selected, f"{len(selected)} of {len(test_ids)} tests affected"
+
+
+def collect_changes(files=None, base='HEAD'):
+    """
+    Changed files mapped to their changed symbols. Explicit file lists have no
+    line information, so each listed file counts as changed as a whole.
+    """
+    if files:
+        return {path.replace(os.sep, '/'): None for path in files}
+    paths, merge_base = changed_files(base)
+    return {
+        path: changed_symbols(path, merge_base) if path.endswith('.py') and os.path.exists(os.path.join(BASE_DIR, path)) else None
+        for path in paths
+    }
+
+
+def main():
+    from utils.settings import get_settings
+
+    parser = argparse.ArgumentParser(description='Select the tests affected by a change')
+    parser.add_argument('files', nargs='*', help='changed files (default: git diff against --base)')
+    parser.add_argument('--base', default='HEAD', help='git ref to diff against (default: HEAD)')
+    args = parser.parse_args()
+
+    settings = get_settings().impact
+    impact_map = load_map(get_settings().path(settings.map_path))
+    changes = collect_changes(args.files, args.base)
+    test_ids = sorted(impact_map or {})
+    selected, reason = select_tests(impact_map, test_ids, changes, settings.full_suite_patterns)
+    print(f"# {reason}" if selected is not None else f"# full suite: {reason}")
+    for test_id in sorted(selected if selected is not None else test_ids):
+        print(test_id)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import os
+import pytest
+from utils.impact import BASE_DIR, ImpactRecorder, collect_changes, load_map, save_map, select_tests
+from utils.logger import Logger
+from utils.test_context import run_id
+
+
+def impact_id(item):
+    """
+    Test id relative to the project root, independent of pytest's rootdir
+    """
+    path = os.path.relpath(str(item.path), BASE_DIR).replace(os.sep, '/')
+    return f"{path}::{item.nodeid.split('::', 1)[1]}" if '::' in item.nodeid else path
+
+
+class ImpactPlugin:
+    """
+    Test impact analysis. In record mode every test is traced and the page-object
+    code and locators it touched are stored in the impact map; in select mode
+    only the tests affected by the changed files are run.
+    """
+    def __init__(self, map_path, full_suite_patterns, record=False, select=False,
+                 base='HEAD', changed_files=None, is_worker=False):
+        self.map_path = map_path
+        self.full_suite_patterns = full_suite_patterns
+        self.record = record
+        self.select = select
+        self.base = base
+        self.changed_files = changed_files
+        self.is_worker = is_worker
+        self.recorder = ImpactRecorder() if record else None
+        self.recorded = {}
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, config, items):
+        if not self.select:
+            return
+        logger = Logger()
+        try:
+            changes = collect_changes(self.changed_files, self.base)
+        except Exception as e:
+            logger.warning(f"Could not determine changed files, running the full suite: {str(e)}")
+            return
+        ids = {item: impact_id(item) for item in items}
+        selected, reason = select_tests(load_map(self.map_path), list(ids.values()), changes, self.full_suite_patterns)
+        if selected is None:
+            logger.info(f"Impact analysis: running the full suite ({reason})")
+            return
+        logger.info(f"Impact analysis: {reason} by {len(changes)} changed file(s)")
+        deselected = [item for item in items if ids[item] not in selected]
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = [item for item in items if ids[item] in selected]
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        if self.recorder is not None:
+            self.recorder.start()
+        yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        outcome = yield
+        if self.recorder is not None and call.when == 'teardown':
+            # Travels with the report, so xdist workers hand it to the controller
+            outcome.get_result().user_properties.append(('impact', {'id': impact_id(item), **self.recorder.stop()}))
+
+    def pytest_runtest_logreport(self, report):
+        if self.record and report.when == 'teardown':
+            for name, value in report.user_properties:
+                if name == 'impact':
+                    self.recorded[value['id']] = {'modules': value['modules'], 'symbols': value['symbols']}
+
+    def pytest_sessionfinish(self, session):
+        if not self.record or self.is_worker or not self.recorded:
+            return
+        # Tests not run this time keep their previous entry
+        tests = load_map(self.map_path) or {}
+        tests.update(self.recorded)
+        save_map(self.map_path, tests, run_id())
+        Logger().info(f"Impact map updated for {len(self.recorded)} tests: {self.map_path}")
@@ -0,0 +1,108 @@
+import re
+from functools import lru_cache
+from selenium.webdriver.common.by import By
+
+_QUOTED = r"""(?:'([^']*)'|"([^"]*)")"""
+_STEP = re.compile(r"(\*|[A-Za-z][\w-]*)((?:\[[^\[\]]*\])*)")
+_PREDICATE = re.compile(r"\[([^\[\]]*)\]")
+_CONDITIONS = [
+    (re.compile(rf"@([\w-]+)\s*=\s*{_QUOTED}"), '[{0}="{1}"]'),
+    (re.compile(rf"contains\(\s*@([\w-]+)\s*,\s*{_QUOTED}\s*\)"), '[{0}*="{1}"]'),
+    (re.compile(rf"starts-with\(\s*@([\w-]+)\s*,\s*{_QUOTED}\s*\)"), '[{0}^="{1}"]'),
+    (re.compile(r"@([\w-]+)()()"), '[{0}]'),
+]
+
+
+def _split_steps(xpath):
+    """
+    Split an XPath into (axis, step) pairs, where axis is '//' or '/'.
+    Slashes inside quotes or predicates do not split.
+    """
+    steps = []
+    axis, current, quote, depth = None, '', None, 0
+    i = 0
+    while i < len(xpath):
+        char = xpath[i]
+        if quote:
+            quote = None if char == quote else quote
+        elif char in ('"', "'"):
+            quote = char
+        elif char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+        elif char == '/' and depth == 0:
+            if axis is not None:
+                steps.append((axis, current))
+            axis = '//' if xpath.startswith('//', i) else '/'
+            current = ''
+            i += len(axis)
+            continue
+        current += char
+        i += 1
+    if axis is None:
+        return None
+    steps.append((axis, current))
+    return steps
+
+
+def _css_string(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _condition_to_css(condition):
+    for pattern, template in _CONDITIONS:
+        match = pattern.fullmatch(condition.strip())
+        if match:
+            name, single, double = match.groups()
+            return template.format(name, _css_string(single if single is not None else double or ''))
+    return None
+
+
+def _step_to_css(step):
+    match = _STEP.fullmatch(step.strip())
+    if not match:
+        return None
+    tag, predicates = match.groups()
+    css = '' if tag == '*' else tag
+    for predicate in _PREDICATE.findall(predicates):
+        for condition in re.split(r"\s+and\s+", predicate):
+            condition_css = _condition_to_css(condition)
+            if condition_css is None:
+                return None
+            css += condition_css
+    return css or '*'
+
+
+def xpath_to_css(xpath):
+    """
+    Translate a simple XPath (tag names, attribute equality, contains/starts-with
+    on attributes, 'and', '/' and '//' steps) to an equivalent CSS selector.
+    Returns None for anything CSS cannot express, e.g. text(), positions or axes.
+    """
+    steps = _split_steps(xpath.strip())
+    if not steps or steps[0][0] != '//':
+        return None
+    parts = []
+    for index, (axis, step) in enumerate(steps):
+        css = _step_to_css(step)
+        if css is None:
+            return None
+        if index > 0:
+            parts.append(' ' if axis == '//' else ' > ')
+        parts.append(css)
+    return ''.join(parts)
+
+
+@lru_cache(maxsize=None)
+def compile_locator(locator):
+    """
+    Return the fastest equivalent of a locator: simple XPath locators become
+    CSS selectors, everything else is returned unchanged
+    """
+    by, value = locator
+    if by == By.XPATH:
+        css = xpath_to_css(value)
+        if css is not None:
+            return (By.CSS_SELECTOR, css)
+    return locator
@@ -1,48 +1,205 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+from collections import deque
 from datetime import datetime
+from utils.test_context import current_test, run_id, worker_id
+
+LOGGER_NAME = 'selenium_tests'
+
+# Log modes: 'verbose' writes every record, 'failure_only' keeps a test's
+# records in memory and writes them only if the test fails
+LOG_MODES = ('verbose', 'failure_only')
+
+_listener = None
+_queue_handler = None
+_setup_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line with the test, worker and page-object context
+    """
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'test_id': getattr(record, 'test_id', None),
+            'worker_id': getattr(record, 'worker_id', None),
+            'context': getattr(record, 'context', None),
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry)
+
+
+class _ContextFilter(logging.Filter):
+    """
+    Stamp records with the test and worker they were logged from; this has to
+    happen on the logging thread, before the record is queued
+    """
+    def filter(self, record):
+        record.test_id = current_test()
+        record.worker_id = worker_id()
+        if not hasattr(record, 'context'):
+            record.context = None
+        return True
+
+
+class _BufferingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that can divert records into a bounded in-memory ring
+    buffer while a test runs in failure_only mode
+    """
+    def __init__(self, log_queue, buffer_size=2000):
+        super().__init__(log_queue)
+        self.buffer = deque(maxlen=buffer_size)
+        self.buffering = False
+        self.buffered_count = 0
+
+    def enqueue(self, record):
+        if self.buffering:
+            self.buffer.append(record)
+            self.buffered_count += 1
+        else:
+            super().enqueue(record)
+
+    def start_buffering(self, buffer_size):
+        if self.buffer.maxlen != buffer_size:
+            self.buffer = deque(maxlen=buffer_size)
+        self.buffer.clear()
+        self.buffered_count = 0
+        self.buffering = True
+
+    def stop_buffering(self, keep):
+        """
+        Stop buffering; queue the buffered records if keep, else drop them
+        :return: number of records buffered since start_buffering
+        """
+        self.buffering = False
+        count = self.buffered_count
+        if keep:
+            dropped = count - len(self.buffer)
+            if dropped:
+                super().enqueue(logging.makeLogRecord({
+                    'name': LOGGER_NAME, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': f"{dropped} earlier records were dropped from the log buffer",
+                    'test_id': current_test(), 'worker_id': worker_id(), 'context': None,
+                }))
+            for record in self.buffer:
+                super().enqueue(record)
+        self.buffer.clear()
+        self.buffered_count = 0
+        return count
+
+
+def _setup():
+    """
+    Attach a queue handler to the framework logger and start the listener that
+    writes to the console and to this process's JSON-lines file. Runs once per process.
+    """
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is not None:
+            return
 
-class Logger:
-    def __init__(self):
-        # Create logs directory if it doesn't exist
         log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-
-        # Create logger
-        self.logger = logging.getLogger('selenium_tests')
-        self.logger.setLevel(logging.INFO)
-
-        # Create handlers
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        log_file = os.path.join(log_dir, f'test_{timestamp}.log')
-        
-        # File handler
-        file_handler = logging.FileHandler(log_file)
+        os.makedirs(log_dir, exist_ok=True)
+
+        # One file per process: xdist workers never share or clobber a file
+        file_handler = logging.FileHandler(os.path.join(log_dir, f'test_{run_id()}_{worker_id()}.jsonl'))
         file_handler.setLevel(logging.INFO)
-        
-        # Console handler
+        file_handler.setFormatter(JsonFormatter())
+
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+        log_queue = queue.SimpleQueue()
+        _queue_handler = _BufferingQueueHandler(log_queue)
+        _queue_handler.addFilter(_ContextFilter())
+
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.setLevel(logging.INFO)
+        logger.addHandler(_queue_handler)
+
+        _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown)
+
 
-        # Create formatters and add it to handlers
-        log_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(log_format)
-        console_handler.setFormatter(log_format)
+def shutdown():
+    """
+    Write out queued records and stop the listener
+    """
+    global _listener, _queue_handler
+    with _setup_lock:
+        listener, _listener = _listener, None
+        queue_handler, _queue_handler = _queue_handler, None
+    if queue_handler is not None and queue_handler.buffering:
+        queue_handler.stop_buffering(keep=True)
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        logger = logging.getLogger(LOGGER_NAME)
+        for handler in list(logger.handlers):
+            if isinstance(handler, logging.handlers.QueueHandler):
+                logger.removeHandler(handler)
 
-        # Add handlers to the logger
-        if not self.logger.handlers:
-            self.logger.addHandler(file_handler)
-            self.logger.addHandler(console_handler)
+
+def begin_test(mode, buffer_size=2000):
+    """
+    Start logging a test in the given mode (see LOG_MODES)
+    """
+    if mode not in LOG_MODES:
+        raise ValueError(f"Unsupported log mode: {mode}")
+    _setup()
+    if mode == 'failure_only':
+        _queue_handler.start_buffering(buffer_size)
+
+
+def end_test(failed, summary):
+    """
+    Finish a test started with begin_test. In failure_only mode a failed test's
+    buffered records are written out, a passing test only gets the summary line.
+    """
+    if _queue_handler is None or not _queue_handler.buffering:
+        return
+    count = _queue_handler.stop_buffering(keep=failed)
+    if not failed:
+        Logger().info(f"{summary} ({count} log records suppressed)")
+
+
+class Logger:
+    """
+    Thin wrapper around the process-wide framework logger. Creating one is
+    cheap; handlers are set up once per process and logging only enqueues.
+    """
+    def __init__(self, context=None):
+        """
+        :param context: page object or component name added to every record
+        """
+        _setup()
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.extra = {'context': context}
 
     def info(self, message):
-        self.logger.info(message)
+        self.logger.info(message, extra=self.extra)
 
     def error(self, message):
-        self.logger.error(message)
+        self.logger.error(message, extra=self.extra)
 
     def warning(self, message):
-        self.logger.warning(message)
+        self.logger.warning(message, extra=self.extra)
 
     def debug(self, message):
-        self.logger.debug(message) 
\ No newline at end of file
+        self.logger.debug(message, extra=self.extra)
@@ -0,0 +1,291 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from utils.settings import get_settings
+from utils.test_context import run_id, safe_name
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# Capability enabling the performance log, per Chromium-based browser
+LOGGING_PREFS = {'chrome': 'goog:loggingPrefs', 'edge': 'ms:loggingPrefs'}
+# Only the Network domain is logged; page and tracing events would just be skipped
+PERF_LOGGING_PREFS = {'enableNetwork': True, 'enablePage': False}
+# Empty the performance log at most this many times per drain
+MAX_BATCHES = 100
+
+_recorders = weakref.WeakKeyDictionary()
+
+
+def enable_network_logging(browser, options):
+    """
+    Ask a Chromium-based browser to log DevTools Network events to the
+    WebDriver performance log
+    :return: True if the browser supports it
+    """
+    if browser not in LOGGING_PREFS:
+        return False
+    options.set_capability(LOGGING_PREFS[browser], {'performance': 'ALL'})
+    options.add_experimental_option('perfLoggingPrefs', PERF_LOGGING_PREFS)
+    return True
+
+
+def attach_network_recorder(driver):
+    _recorders[driver] = NetworkRecorder(driver)
+
+
+def network_recorder(driver):
+    """
+    NetworkRecorder of a driver launched with network capture, or None
+    """
+    return _recorders.get(driver)
+
+
+def _timings(state, total):
+    """
+    HAR timings (ms, -1 when not applicable) from Chromium's ResourceTiming
+    """
+    timing = state.get('timing')
+    if not timing:
+        return {}
+
+    def span(start, end):
+        return round(timing[end] - timing[start], 1) if timing[start] >= 0 else -1
+
+    queued = (timing['requestTime'] - state['timestamp']) * 1000
+    first = min([timing[name] for name in ('dnsStart', 'connectStart', 'sendStart') if timing[name] >= 0] or [0])
+    return {
+        'blocked': round(queued + first, 1),
+        'dns': span('dnsStart', 'dnsEnd'),
+        'connect': span('connectStart', 'connectEnd'),
+        'ssl': span('sslStart', 'sslEnd'),
+        'send': span('sendStart', 'sendEnd'),
+        'wait': round(timing['receiveHeadersEnd'] - timing['sendEnd'], 1),
+        'receive': round(max(0.0, total - queued - timing['receiveHeadersEnd']), 1) if total is not None else -1,
+    }
+
+
+class NetworkRecorder:
+    """
+    Turns the DevTools Network events a Chromium browser writes to the
+    WebDriver performance log into HAR-like entries, one per request.
+    Requests still in flight when the log is drained are reported as pending,
+    which is what tells a hanging API call apart from a hanging page.
+    """
+    # Time every recorder of the process spent reading and parsing the log
+    total_drain_time = 0.0
+
+    def __init__(self, driver):
+        # Weak, since the recorder is the driver's value in _recorders: a
+        # strong reference would keep the driver (and its profile clone) alive
+        self._driver = weakref.ref(driver)
+        self._requests = {}
+        self.drain_time = 0.0
+        self.events = 0
+
+    def drain(self, keep=True):
+        """
+        Read every event logged since the last drain, on the calling thread
+        :param keep: False to empty the log without parsing it
+        :return: list of HAR-like entries, finished requests first
+        """
+        driver = self._driver()
+        if driver is None:
+            return []
+        start = time.perf_counter()
+        entries = []
+        try:
+            for _ in range(MAX_BATCHES):
+                batch = driver.get_log('performance')
+                if not batch:
+                    break
+                self.events += len(batch)
+                if keep:
+                    for record in batch:
+                        self._handle(record['message'], entries)
+        finally:
+            if keep:
+                entries += [self._entry(state, None, pending=True) for state in self._requests.values()]
+            self._requests.clear()
+            elapsed = time.perf_counter() - start
+            self.drain_time += elapsed
+            NetworkRecorder.total_drain_time += elapsed
+        return entries
+
+    def _handle(self, message, entries):
+        # Cheap pre-filter: most of the log is never decoded
+        if '"Network.' not in message:
+            return
+        event = json.loads(message)['message']
+        method, params = event['method'], event['params']
+        request_id = params.get('requestId')
+        if method == 'Network.requestWillBeSent':
+            if params['request']['url'].startswith('data:'):
+                return
+            previous = self._requests.pop(request_id, None)
+            if previous is not None and 'redirectResponse' in params:
+                self._response(previous, params['redirectResponse'])
+                entries.append(self._entry(previous, params['timestamp']))
+            self._requests[request_id] = {
+                'started': params.get('wallTime'),
+                'timestamp': params['timestamp'],
+                'method': params['request']['method'],
+                'url': params['request']['url'],
+                'type': params.get('type'),
+                'initiator': params.get('initiator', {}).get('type'),
+            }
+        elif request_id in self._requests:
+            state = self._requests[request_id]
+            if method == 'Network.responseReceived':
+                self._response(state, params['response'])
+            elif method == 'Network.loadingFinished':
+                state['size'] = params.get('encodedDataLength')
+                entries.append(self._entry(self._requests.pop(request_id), params['timestamp']))
+            elif method == 'Network.loadingFailed':
+                state['error'] = 'blocked: ' + params['blockedReason'] if params.get('blockedReason') \
+                    else 'canceled' if params.get('canceled') else params.get('errorText')
+                entries.append(self._entry(self._requests.pop(request_id), params['timestamp']))
+
+    @staticmethod
+    def _response(state, response):
+        state['status'] = response.get('status')
+        state['status_text'] = response.get('statusText')
+        state['mime_type'] = response.get('mimeType')
+        state['from_cache'] = bool(response.get('fromDiskCache') or response.get('fromServiceWorker'))
+        state['timing'] = response.get('timing')
+
+    @staticmethod
+    def _entry(state, finished, pending=False):
+        total = round((finished - state['timestamp']) * 1000, 1) if finished is not None else None
+        started = state['started']
+        return {
+            'startedDateTime': datetime.fromtimestamp(started, timezone.utc).isoformat() if started else None,
+            'time': total,
+            'request': {'method': state['method'], 'url': state['url']},
+            'response': {
+                'status': state.get('status', 0),
+                'statusText': state.get('status_text', ''),
+                'content': {'mimeType': state.get('mime_type')},
+                'bodySize': state.get('size', -1),
+            },
+            'timings': _timings(state, total),
+            '_resourceType': state['type'],
+            '_initiator': state['initiator'],
+            '_fromCache': state.get('from_cache', False),
+            '_error': state.get('error'),
+            '_pending': pending,
+        }
+
+
+class NetworkCaptureWriter:
+    """
+    Appends captured requests to reports/runs/<run id>/network/<test>.jsonl on
+    a background thread. The queue is bounded, so a writer that falls behind
+    slows the test thread down instead of piling requests up in memory.
+    """
+    def __init__(self, capture_dir, queue_size=64):
+        self.capture_dir = capture_dir
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.write_time = 0.0
+        self.requests = 0
+        self.tests = 0
+        self.errors = []
+
+    def path(self, test_id):
+        return os.path.join(self.capture_dir, f'{safe_name(test_id)}.jsonl')
+
+    def record(self, test_id, entries, overhead):
+        """
+        Queue the requests of a test for its capture file
+        :param entries: requests drained from the test's NetworkRecorder
+        :param overhead: seconds the drain took on the test thread
+        :return: summary for the test's report, or None if there was nothing to write
+        """
+        if not entries:
+            return None
+        path = self.path(test_id)
+        self._ensure_started()
+        self._queue.put((path, entries))
+        return {
+            'path': os.path.relpath(path, os.path.dirname(self.capture_dir)).replace(os.sep, '/'),
+            'requests': len(entries),
+            'pending': sum(entry['_pending'] for entry in entries),
+            'failed': sum(1 for entry in entries if entry['_error'] or (entry['response']['status'] or 0) >= 400),
+            'overhead_ms': round(overhead * 1000, 1),
+        }
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='network-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                path, entries = item
+                start = time.perf_counter()
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'a') as f:
+                    for entry in entries:
+                        f.write(json.dumps(entry) + '\n')
+                self.write_time += time.perf_counter() - start
+                self.requests += len(entries)
+                self.tests += 1
+            except Exception as e:
+                self.errors.append(f"{item[0]}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def stats(self):
+        return f"{self.requests} requests of {self.tests} tests captured, {self.write_time:.2f}s writing in the background"
+
+    def close(self):
+        """
+        Write out the queued captures and stop the writer thread
+        """
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(None)
+        thread.join()
+
+
+_writer = None
+
+
+def get_network_writer():
+    """
+    Process-wide capture writer for the current run
+    """
+    global _writer
+    if _writer is None:
+        settings = get_settings()
+        _writer = NetworkCaptureWriter(
+            os.path.join(BASE_DIR, settings.reports.report_path, 'runs', run_id(), 'network'),
+            settings.network.queue_size
+        )
+        atexit.register(_writer.close)
+    return _writer
+
+
+def close_network_writer():
+    """
+    Write out pending captures and stop the writer
+    :return: the writer (for its stats and errors), or None if nothing was captured
+    """
+    global _writer
+    writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
+    return writer
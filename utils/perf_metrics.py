@@ -0,0 +1,134 @@
+import fnmatch
+import threading
+from functools import lru_cache
+
+# Start of a measured action: absolute browser time, which stays comparable
+# when the action navigates to a new document (performance.now() restarts there)
+PERF_MARK_JS = """
+if (performance.setResourceTimingBufferSize) { performance.setResourceTimingBufferSize(1000); }
+return {origin: performance.timeOrigin, now: performance.now()};
+"""
+
+# Navigation, Paint and Resource Timing of the current document in one round
+# trip. With a mark from PERF_MARK_JS only resources fetched since the mark are
+# counted, and navigation and paint timings only when the action left the document.
+PERF_COLLECT_JS = """
+const mark = arguments[0], slowest = arguments[1];
+const origin = performance.timeOrigin, now = performance.now();
+const sameDocument = !!mark && Math.abs(mark.origin - origin) < 1;
+const since = sameDocument ? mark.now : 0;
+const result = {
+    url: location.href,
+    // Until the element BasePage.perf_mark watched for appeared, else until now
+    elapsed: !mark ? null
+        : mark.watched && sameDocument && window.__perfWatch && window.__perfWatch.appeared !== null
+            ? window.__perfWatch.appeared - mark.now
+        : (origin + now) - (mark.origin + mark.now),
+    // Last DOM change or request seen by BasePage.watch_for_settle, if it watched the action
+    rendered: sameDocument && window.__settle ? Math.max(0, window.__settle.last - mark.now) : null,
+    navigation: null,
+    paint: {},
+};
+if (!sameDocument) {
+    const nav = performance.getEntriesByType('navigation')[0];
+    if (nav) {
+        result.navigation = {
+            ttfb: nav.responseStart, dom_interactive: nav.domInteractive,
+            dom_content_loaded: nav.domContentLoadedEventEnd, load: nav.loadEventEnd,
+            transfer_size: nav.transferSize || 0, type: nav.type
+        };
+    }
+    for (const entry of performance.getEntriesByType('paint')) { result.paint[entry.name] = entry.startTime; }
+}
+const resources = performance.getEntriesByType('resource').filter(entry => entry.startTime >= since);
+result.resources = {
+    count: resources.length,
+    transfer_size: resources.reduce((total, entry) => total + (entry.transferSize || 0), 0),
+    slowest: resources.slice().sort((a, b) => b.duration - a.duration).slice(0, slowest)
+        .map(entry => [entry.name, entry.initiatorType, Math.round(entry.duration)]),
+};
+return result;
+"""
+
+
+def sample_metrics(result):
+    """
+    Flat {metric: value} of a PERF_COLLECT_JS result; times in milliseconds
+    """
+    metrics = {}
+    if result['elapsed'] is not None:
+        metrics['elapsed_ms'] = round(result['elapsed'])
+    if result['rendered'] is not None:
+        metrics['render_ms'] = round(result['rendered'])
+    navigation = result['navigation']
+    if navigation:
+        for name in ('ttfb', 'dom_interactive', 'dom_content_loaded', 'load'):
+            # Zero while the event has not happened yet
+            if navigation[name]:
+                metrics[f'{name}_ms'] = round(navigation[name])
+        metrics['document_kb'] = round(navigation['transfer_size'] / 1024, 1)
+    for name, value in result['paint'].items():
+        metrics[f"{name.replace('-', '_')}_ms"] = round(value)
+    metrics['resource_count'] = result['resources']['count']
+    metrics['resource_kb'] = round(result['resources']['transfer_size'] / 1024, 1)
+    if result['resources']['slowest']:
+        metrics['slowest_resource_ms'] = result['resources']['slowest'][0][2]
+    return metrics
+
+
+@lru_cache(maxsize=8)
+def parse_budgets(text):
+    """
+    Budgets from '<sample pattern>.<metric> = <limit>' entries separated by
+    commas or newlines, e.g. 'login.elapsed_ms = 3000, menu:*.elapsed_ms = 2000'
+    :return: tuple of (sample name pattern, metric, limit)
+    """
+    budgets = []
+    for entry in text.replace('\n', ',').split(','):
+        if not entry.strip():
+            continue
+        key, separator, limit = entry.partition('=')
+        pattern, dot, metric = key.strip().rpartition('.')
+        if not separator or not dot:
+            raise ValueError(f"Invalid performance budget (expected <page>.<metric> = <limit>): {entry.strip()}")
+        budgets.append((pattern, metric, float(limit)))
+    return tuple(budgets)
+
+
+def check_budgets(name, metrics, budgets):
+    """
+    Budgets a sample exceeds, as messages
+    """
+    return [
+        f"{name} {metric} {metrics[metric]:g} > {limit:g}"
+        for pattern, metric, limit in budgets
+        if fnmatch.fnmatchcase(name, pattern) and metric in metrics and metrics[metric] > limit
+    ]
+
+
+class PerfRecorder:
+    """
+    Performance samples taken by the page objects, per test. conftest
+    attaches them to the test's report and fails the test on exceeded budgets.
+    """
+    def __init__(self):
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, test_id, sample):
+        with self._lock:
+            self._samples.setdefault(test_id, []).append(sample)
+
+    def samples(self, test_id):
+        with self._lock:
+            return list(self._samples.get(test_id, []))
+
+    def violations(self, test_id):
+        return [violation for sample in self.samples(test_id) for violation in sample['violations']]
+
+    def pop(self, test_id):
+        with self._lock:
+            return self._samples.pop(test_id, [])
+
+
+perf_recorder = PerfRecorder()
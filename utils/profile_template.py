@@ -0,0 +1,247 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import weakref
+from utils.test_context import run_id, worker_id
+
+try:
+    import fcntl
+except ImportError:  # Windows; clones are plain copies there
+    fcntl = None
+
+# Linux ioctl asking the filesystem (btrfs, XFS, overlayfs on those...) to
+# share a file's blocks copy-on-write instead of copying them
+FICLONE = 0x40049409
+
+# Locks of the browser that built the template; a clone must start without them
+LOCK_FILES = {'SingletonLock', 'SingletonSocket', 'SingletonCookie', 'lockfile', 'lock', '.parentlock', 'parent.lock'}
+
+# Templates and clones of runs that ended without cleaning up are removed after this long
+STALE_AGE = 24 * 3600
+
+# Resources seen by the page, polled until the count stops changing
+RESOURCE_COUNT_JS = "return document.readyState === 'complete' ? performance.getEntriesByType('resource').length : -1;"
+
+
+def wait_for_quiet(driver, quiet=0.5, timeout=10):
+    """
+    Wait until a page has loaded and stopped fetching resources, so its
+    lazily loaded scripts end up in the template's caches too
+    """
+    deadline = time.monotonic() + timeout
+    last, since = None, time.monotonic()
+    while time.monotonic() < deadline:
+        count = driver.execute_script(RESOURCE_COUNT_JS)
+        if count != last or count < 0:
+            last, since = count, time.monotonic()
+        elif time.monotonic() - since >= quiet:
+            return
+        time.sleep(0.1)
+
+
+class CloneStats:
+    """
+    Counters for the profile clones of a process
+    """
+    def __init__(self):
+        self.build_time = 0.0
+        self.clones = 0
+        self.clone_time = 0.0
+        self.reflinked = 0
+        self.copied = 0
+        self.bytes = 0
+
+    @property
+    def avg_clone_time(self):
+        return self.clone_time / self.clones if self.clones else 0.0
+
+    def __str__(self):
+        text = (f"{self.clones} clones of {self.bytes / 1024 / 1024:.1f} MB, {self.avg_clone_time * 1000:.0f}ms each "
+                f"({self.reflinked} files reflinked, {self.copied} copied)")
+        # Only the process that built the template knows how long it took
+        return text + f"; template built in {self.build_time:.2f}s" if self.build_time else text
+
+
+class ProfileTemplate:
+    """
+    A browser profile warmed up once per run and cloned for every session,
+    so each browser starts with the application's scripts, styles and
+    compiled code already cached instead of from an empty profile.
+
+    The first process to need the template builds it while the others wait;
+    clones are removed when their driver is garbage collected or the process exits.
+    Every file of a clone is its own copy, never a hardlink: browsers rewrite
+    their cache entries in place, which would leak into the template and the
+    other sessions' clones.
+    """
+    def __init__(self, browser, root):
+        """
+        :param root: directory of this run's template and clones
+        """
+        self.browser = browser
+        self.root = root
+        self.path = os.path.join(root, f'{browser}-template')
+        self.stats = CloneStats()
+        self._reflink = fcntl is not None and sys.platform.startswith('linux')
+        self._lock = threading.Lock()
+        # Set when the template could not be built; sessions then start cold
+        self.failed = False
+
+    def ensure(self, build, timeout=300):
+        """
+        Build the template unless it exists or another process is building it
+        :param build: callable(directory) launching a browser on the empty
+            profile directory, warming it up and quitting it
+        """
+        if self.failed:
+            raise RuntimeError(f"The {self.browser} profile template could not be built")
+        if os.path.isdir(self.path):
+            return
+        os.makedirs(self.root, exist_ok=True)
+        lock_file = f'{self.path}.lock'
+        try:
+            lock = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                self._wait_for_build(lock_file, timeout)
+            except RuntimeError:
+                self.failed = True
+                raise
+            return
+        try:
+            build_dir = f'{self.path}.build'
+            shutil.rmtree(build_dir, ignore_errors=True)
+            os.makedirs(build_dir)
+            start = time.perf_counter()
+            build(build_dir)
+            self.stats.build_time = time.perf_counter() - start
+            os.rename(build_dir, self.path)
+        except Exception:
+            self.failed = True
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
+        finally:
+            os.close(lock)
+            os.remove(lock_file)
+
+    def _wait_for_build(self, lock_file, timeout):
+        deadline = time.monotonic() + timeout
+        while not os.path.isdir(self.path):
+            if not os.path.exists(lock_file) and not os.path.isdir(self.path):
+                raise RuntimeError(f"Building the {self.browser} profile template failed in another process")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Timed out waiting for the {self.browser} profile template")
+            time.sleep(0.2)
+
+    def _copy(self, source, target):
+        """
+        Copy one file copy-on-write if the filesystem can, otherwise byte by byte
+        :return: True if it was reflinked
+        """
+        if self._reflink:
+            try:
+                source_fd = os.open(source, os.O_RDONLY)
+                try:
+                    target_fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                    try:
+                        fcntl.ioctl(target_fd, FICLONE, source_fd)
+                        return True
+                    finally:
+                        os.close(target_fd)
+                finally:
+                    os.close(source_fd)
+            except OSError:
+                # Not supported here (or across filesystems); stop trying
+                self._reflink = False
+        shutil.copy2(source, target)
+        return False
+
+    def clone(self):
+        """
+        Copy the template into a new session profile directory
+        :return: path of the clone
+        """
+        clones_dir = os.path.join(self.root, 'clones')
+        os.makedirs(clones_dir, exist_ok=True)
+        target_root = tempfile.mkdtemp(prefix=f'{self.browser}-{worker_id()}-', dir=clones_dir)
+        start = time.perf_counter()
+        reflinked = copied = size = 0
+        for directory, _, files in os.walk(self.path):
+            relative_dir = os.path.relpath(directory, self.path)
+            target_dir = os.path.normpath(os.path.join(target_root, relative_dir))
+            os.makedirs(target_dir, exist_ok=True)
+            for name in files:
+                source = os.path.join(directory, name)
+                if name in LOCK_FILES or os.path.islink(source):
+                    continue
+                target = os.path.join(target_dir, name)
+                size += os.path.getsize(source)
+                if self._copy(source, target):
+                    reflinked += 1
+                else:
+                    copied += 1
+        with self._lock:
+            self.stats.clones += 1
+            self.stats.clone_time += time.perf_counter() - start
+            self.stats.reflinked += reflinked
+            self.stats.copied += copied
+            self.stats.bytes += size
+        return target_root
+
+
+def remove_with(driver, clone):
+    """
+    Remove a clone once its driver is gone (garbage collected, or at exit)
+    """
+    weakref.finalize(driver, shutil.rmtree, clone, True)
+
+
+def profiles_root(temp_dir=''):
+    """
+    Directory holding the templates and clones of this run
+    """
+    return os.path.join(temp_dir or tempfile.gettempdir(), 'selenium-profiles', run_id())
+
+
+def remove_profiles(temp_dir=''):
+    """
+    Remove this run's templates and clones, and those of runs that did not
+    clean up after themselves
+    """
+    shutil.rmtree(profiles_root(temp_dir), ignore_errors=True)
+    parent = os.path.dirname(profiles_root(temp_dir))
+    if not os.path.isdir(parent):
+        return
+    now = time.time()
+    for entry in os.scandir(parent):
+        try:
+            stale = now - entry.stat().st_mtime > STALE_AGE
+        except OSError:
+            continue
+        if stale:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_profile_template(browser, temp_dir=''):
+    """
+    Profile template of a browser for this run, shared by the process
+    """
+    with _templates_lock:
+        if browser not in _templates:
+            _templates[browser] = ProfileTemplate(browser, profiles_root(temp_dir))
+        return _templates[browser]
+
+
+def profile_template_stats():
+    """
+    Clone stats of every template this process used
+    """
+    with _templates_lock:
+        return {browser: template.stats for browser, template in _templates.items() if template.stats.clones}
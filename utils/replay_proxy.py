@@ -0,0 +1,452 @@
+import fnmatch
+import hashlib
+import http.client
+import json
+import os
+import select
+import shutil
+import socket
+import sqlite3
+import ssl
+import subprocess
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from selenium.webdriver.common.proxy import Proxy, ProxyType
+from utils.settings import get_settings
+
+MODES = ('off', 'record', 'replay')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bodies (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    method TEXT NOT NULL,
+    url TEXT NOT NULL,
+    body_hash TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    content TEXT NOT NULL REFERENCES bodies (hash),
+    recorded_at REAL NOT NULL
+);
+"""
+
+# Headers that only apply to one connection; never forwarded or recorded
+HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-connection', 'proxy-authenticate', 'proxy-authorization',
+              'te', 'trailer', 'transfer-encoding', 'upgrade'}
+
+
+def _hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+class ReplayStore:
+    """
+    Recorded responses in SQLite, matched by method, URL and a hash of the
+    request body. Bodies are zlib-compressed and stored once per content,
+    so the same script or stylesheet served under several URLs costs nothing
+    extra. A request recorded again replaces its earlier response.
+    """
+    def __init__(self, path, ignore_params=()):
+        """
+        :param ignore_params: query parameters left out of the match, e.g. cache busters
+        """
+        self.path = path
+        self.ignore_params = set(ignore_params)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def match_url(self, url):
+        parts = urlsplit(url)
+        query = parts.query
+        if self.ignore_params and query:
+            query = urlencode([(name, value) for name, value in parse_qsl(query, keep_blank_values=True)
+                               if name not in self.ignore_params])
+        return urlunsplit((parts.scheme, parts.netloc, parts.path or '/', query, ''))
+
+    def key(self, method, url, body):
+        return _hash(f'{method} {self.match_url(url)} {_hash(body)}'.encode())
+
+    def get(self, method, url, body):
+        """
+        :return: (status, headers, content) recorded for a request, or None
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT status, headers, data FROM responses JOIN bodies ON bodies.hash = responses.content "
+                "WHERE key = ?", (self.key(method, url, body),)).fetchone()
+        if row is None:
+            return None
+        status, headers, data = row
+        return status, [tuple(header) for header in json.loads(headers)], zlib.decompress(data)
+
+    def put(self, method, url, body, status, headers, content):
+        content_hash = _hash(content)
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR IGNORE INTO bodies VALUES (?, ?)",
+                                     (content_hash, zlib.compress(content)))
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.key(method, url, body), method, self.match_url(url), _hash(body), status,
+                 json.dumps(headers), content_hash, time.time()))
+
+    def stats(self):
+        with self._lock:
+            urls = [url for url, in self._connection.execute("SELECT url FROM responses")]
+            bodies, size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length(data)), 0) FROM bodies").fetchone()
+        return {'responses': len(urls), 'hosts': len({urlsplit(url).netloc for url in urls}),
+                'bodies': bodies, 'size_kb': round(size / 1024, 1)}
+
+    def clear(self):
+        """
+        Forget every recording, e.g. before recording the application again
+        """
+        with self._lock:
+            with self._connection:
+                self._connection.execute("DELETE FROM responses")
+                self._connection.execute("DELETE FROM bodies")
+            self._connection.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def ensure_certificate(cert_dir):
+    """
+    Self-signed certificate the proxy presents for every HTTPS host. Browsers
+    routed through the proxy accept it because they are launched with
+    acceptInsecureCerts, so a single certificate covers every host name.
+    :return: (certificate file, key file)
+    """
+    cert_file = os.path.join(cert_dir, 'proxy-cert.pem')
+    key_file = os.path.join(cert_dir, 'proxy-key.pem')
+    if os.path.exists(cert_file) and os.path.exists(key_file):
+        return cert_file, key_file
+    openssl = shutil.which('openssl')
+    if openssl is None:
+        raise RuntimeError("Recording or replaying HTTPS needs the openssl command to create the proxy certificate")
+    os.makedirs(cert_dir, exist_ok=True)
+    # Parallel workers may race here; each writes its own files and the key goes first
+    temp_cert, temp_key = f'{cert_file}.{os.getpid()}.tmp', f'{key_file}.{os.getpid()}.tmp'
+    subprocess.run([openssl, 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-keyout', temp_key, '-out', temp_cert,
+                    '-days', '3650', '-subj', '/CN=selenium-replay-proxy'], check=True, capture_output=True)
+    os.replace(temp_key, key_file)
+    os.replace(temp_cert, cert_file)
+    return cert_file, key_file
+
+
+class ReplayProxy:
+    """
+    Local HTTP(S) proxy the browsers of a process are routed through.
+
+    Only the application's hosts are recorded and replayed:
+    record: every request goes to the network and its response is stored.
+    replay: recorded responses are served from the store without touching the
+        network; unrecorded requests are fetched and recorded, or, when strict,
+        answered with 502 and reported as misses so the test fails.
+
+    Other hosts (the browser's own update, safe browsing or sync services,
+    third parties) are passed through untouched while recording, and refused
+    while replaying, without counting as misses.
+
+    HTTPS of the application's hosts is intercepted with a self-signed
+    certificate (see ensure_certificate).
+    """
+    def __init__(self, store, hosts, mode='replay', strict=False, cert_file=None, key_file=None, timeout=30):
+        """
+        :param hosts: host names (glob patterns allowed) recorded and replayed
+        """
+        if mode not in MODES[1:]:
+            raise ValueError(f"Unknown replay mode: {mode} (expected record or replay)")
+        self.store = store
+        self.hosts = tuple(host.lower() for host in hosts)
+        self.mode = mode
+        self.strict = strict
+        self.timeout = timeout
+        self.tls_context = None
+        if cert_file is not None:
+            self.tls_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self.tls_context.load_cert_chain(cert_file, key_file)
+            # The handler speaks HTTP/1.1 only
+            self.tls_context.set_alpn_protocols(['http/1.1'])
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.recorded = 0
+        self.errors = 0
+        self.passed_through = 0
+        self.refused = 0
+        self.misses = []
+        self.upstream_time = 0.0
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), _ProxyHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.proxy = self
+        self._thread = None
+
+    @property
+    def address(self):
+        host, port = self._httpd.server_address[:2]
+        return f'{host}:{port}'
+
+    def selenium_proxy(self):
+        """
+        Proxy capability routing a browser's HTTP and HTTPS traffic through this proxy
+        """
+        return Proxy({'proxyType': ProxyType.MANUAL, 'httpProxy': self.address, 'sslProxy': self.address})
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='replay-proxy', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+        self.store.close()
+
+    def miss_count(self):
+        with self.lock:
+            return len(self.misses)
+
+    def misses_since(self, count):
+        with self.lock:
+            return self.misses[count:]
+
+    def in_scope(self, host):
+        """
+        Whether requests to a host are recorded and replayed
+        """
+        host = (host or '').lower()
+        return any(fnmatch.fnmatchcase(host, pattern) for pattern in self.hosts)
+
+    def count_outside(self):
+        """
+        Count a request to another host
+        :return: True if it may go to the network (record mode), False if it is refused
+        """
+        with self.lock:
+            if self.mode == 'record':
+                self.passed_through += 1
+                return True
+            self.refused += 1
+            return False
+
+    def respond(self, method, url, headers, body):
+        """
+        :return: (status, headers, content) for a request the browser sent
+        """
+        if not self.in_scope(urlsplit(url).hostname):
+            if not self.count_outside():
+                return 403, [('Content-Type', 'text/plain')], f'Not replayed: {method} {url}'.encode()
+            try:
+                return self._fetch(method, url, headers, body)
+            except (OSError, http.client.HTTPException) as e:
+                return 502, [('Content-Type', 'text/plain')], f'Upstream request failed: {str(e)}'.encode()
+        if self.mode == 'replay':
+            recorded = self.store.get(method, url, body)
+            if recorded is not None:
+                with self.lock:
+                    self.hits += 1
+                return recorded
+            with self.lock:
+                self.misses.append(f'{method} {url}')
+            if self.strict:
+                return 502, [('Content-Type', 'text/plain')], f'Not recorded: {method} {url}'.encode()
+        try:
+            status, response_headers, content = self._fetch(method, url, headers, body)
+        except (OSError, http.client.HTTPException) as e:
+            with self.lock:
+                self.errors += 1
+            return 502, [('Content-Type', 'text/plain')], f'Upstream request failed: {str(e)}'.encode()
+        self.store.put(method, url, body, status, response_headers, content)
+        with self.lock:
+            self.recorded += 1
+        return status, response_headers, content
+
+    def _fetch(self, method, url, headers, body):
+        parts = urlsplit(url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        connection = connection_class(parts.hostname, parts.port, timeout=self.timeout)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        start = time.perf_counter()
+        try:
+            connection.request(method, path, body=body or None,
+                               headers={name: value for name, value in headers.items() if name.lower() not in HOP_BY_HOP})
+            response = connection.getresponse()
+            # Content stays as sent (e.g. gzip); only the chunked framing is removed
+            content = response.read()
+        finally:
+            connection.close()
+            with self.lock:
+                self.upstream_time += time.perf_counter() - start
+        response_headers = [(name, value) for name, value in response.getheaders()
+                            if name.lower() not in HOP_BY_HOP and name.lower() != 'content-length']
+        return response.status, response_headers, content
+
+    def stats(self):
+        return (f"{self.mode}: {self.hits} replayed, {self.recorded} recorded, {len(self.misses)} not recorded, "
+                f"{self.errors} upstream errors, {self.upstream_time:.2f}s waiting for the network; other hosts: "
+                f"{self.passed_through} requests passed through, {self.refused} refused")
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # scheme://host[:port] of an intercepted CONNECT tunnel
+    origin = None
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def proxy(self):
+        return self.server.proxy
+
+    def do_CONNECT(self):
+        host, _, port = self.path.rpartition(':')
+        if not self.proxy.in_scope(host):
+            if self.proxy.count_outside():
+                self._tunnel(host, int(port))
+            else:
+                self.send_error(403, 'Not replayed')
+            return
+        if self.proxy.tls_context is None:
+            self.send_error(501, 'HTTPS is not intercepted')
+            return
+        self.send_response_only(200, 'Connection Established')
+        self.end_headers()
+        try:
+            connection = self.proxy.tls_context.wrap_socket(self.connection, server_side=True)
+        except (ssl.SSLError, OSError):
+            self.close_connection = True
+            return
+        # Keep handling requests, now on the decrypted stream of the tunnel
+        self.connection = connection
+        self.rfile = connection.makefile('rb', self.rbufsize)
+        self.wfile = connection.makefile('wb')
+        self.origin = f'https://{host}' + ('' if port == '443' else f':{port}')
+        self.close_connection = False
+
+    def _tunnel(self, host, port):
+        """
+        Relay an encrypted connection to a host that is not recorded
+        """
+        try:
+            upstream = socket.create_connection((host, port), timeout=self.proxy.timeout)
+        except OSError:
+            self.send_error(502, 'Upstream connection failed')
+            return
+        self.send_response_only(200, 'Connection Established')
+        self.end_headers()
+        self.close_connection = True
+        sockets = [self.connection, upstream]
+        try:
+            while True:
+                readable, _, failed = select.select(sockets, [], sockets, self.proxy.timeout)
+                if failed or not readable:
+                    return
+                for source in readable:
+                    data = source.recv(65536)
+                    if not data:
+                        return
+                    (upstream if source is self.connection else self.connection).sendall(data)
+        except OSError:
+            pass
+        finally:
+            upstream.close()
+
+    def _forward(self):
+        url = self.origin + self.path if self.origin else self.path
+        if not url.startswith(('http://', 'https://')):
+            self.send_error(400, 'Expected a proxy request')
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status, headers, content = self.proxy.respond(self.command, url, self.headers, body)
+        # Recorded Date and Server headers are replayed as they were
+        self.send_response_only(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(content)
+
+    do_GET = do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = _forward
+
+    def finish(self):
+        super().finish()
+        if self.origin is not None:
+            self.connection.close()
+
+
+_proxy = None
+_lock = threading.Lock()
+
+
+def get_replay_proxy():
+    """
+    Record/replay proxy of this process, started on first use; None when
+    [REPLAY] mode is off
+    """
+    global _proxy
+    settings = get_settings()
+    replay = settings.replay
+    if replay.mode == 'off':
+        return None
+    with _lock:
+        if _proxy is None:
+            cert_file, key_file = ensure_certificate(settings.path(replay.cert_dir))
+            store = ReplayStore(settings.path(replay.store), replay.ignore_params_list)
+            # The application's own host, plus any API or asset hosts it is configured with
+            hosts = (urlsplit(settings.environment.base_url).hostname or '',) + replay.host_list
+            _proxy = ReplayProxy(store, hosts, replay.mode, replay.strict, cert_file, key_file,
+                                 replay.upstream_timeout).start()
+    return _proxy
+
+
+def replay_proxy():
+    """
+    The running proxy of this process, or None
+    """
+    return _proxy
+
+
+def close_replay_proxy():
+    """
+    Stop the proxy
+    :return: the stopped proxy (for its stats), or None if none was started
+    """
+    global _proxy
+    with _lock:
+        proxy, _proxy = _proxy, None
+    if proxy is not None:
+        proxy.stop()
+    return proxy
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Inspect the record/replay store ([REPLAY] in config.ini)')
+    parser.add_argument('command', choices=('stats', 'clear'))
+    args = parser.parse_args()
+    settings = get_settings()
+    store = ReplayStore(settings.path(settings.replay.store))
+    try:
+        if args.command == 'clear':
+            store.clear()
+        print(', '.join(f"{name}={value}" for name, value in store.stats().items()))
+    finally:
+        store.close()
@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+from utils.logger import Logger
+from utils.test_context import worker_id
+
+# Longest failure text kept per test; the full traceback is in the worker's log
+MAX_LONGREPR = 20000
+
+
+def run_dir(report_path, run):
+    return os.path.join(report_path, 'runs', run)
+
+
+def fragment_dir(report_path, run):
+    return os.path.join(run_dir(report_path, run), 'fragments')
+
+
+def test_outcome(phases):
+    """
+    Overall outcome of a test from its per-phase reports
+    """
+    call = phases.get('call')
+    for when in ('setup', 'call', 'teardown'):
+        report = phases.get(when)
+        if report is None:
+            continue
+        if hasattr(report, 'wasxfail'):
+            return 'xfailed' if report.skipped else 'xpassed'
+        if report.failed:
+            return 'failed' if when == 'call' else 'error'
+        if report.skipped:
+            return 'skipped'
+    return 'passed' if call is not None else 'error'
+
+
+class FragmentWriter:
+    """
+    Appends one JSON line per finished test to this process's fragment file,
+    so results are on disk as the run goes instead of being held until the end
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, 'a', buffering=1)
+            self._file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class ReportFragmentPlugin:
+    """
+    Streams test results of the tests run by this process to
+    reports/runs/<run id>/fragments/<worker>.jsonl. The controller of an xdist
+    run writes nothing itself; it merges the workers' fragments at the end.
+    """
+    def __init__(self, report_path, run, merge=None, ingest=None):
+        """
+        :param merge: callable(run) rendering the report, called at session end
+            by the controlling process (None to skip)
+        :param ingest: callable(run) adding the run to the results history, called after merge
+        """
+        self.writer = FragmentWriter(os.path.join(fragment_dir(report_path, run), f'{worker_id()}.jsonl'))
+        self.run = run
+        self.merge = merge
+        self.ingest = ingest
+        self._phases = {}
+
+    def pytest_runtest_logreport(self, report):
+        if report.outcome == 'rerun':
+            return  # an attempt of pytest-rerunfailures; the final attempt is recorded
+        if hasattr(report, 'node'):
+            return  # reported by an xdist worker, which writes its own fragment
+        phases = self._phases.setdefault(report.nodeid, {})
+        phases[report.when] = report
+        if report.when == 'teardown':
+            self.writer.write(self.record(report.nodeid, self._phases.pop(report.nodeid)))
+
+    def record(self, nodeid, phases):
+        first = next(phases[when] for when in ('setup', 'call', 'teardown') if when in phases)
+        failed = next((phases[when] for when in ('setup', 'call', 'teardown')
+                       if when in phases and phases[when].failed), None)
+        longrepr = ''
+        if failed is not None:
+            longrepr = failed.longreprtext
+        elif first.skipped:
+            longrepr = str(first.longrepr[-1]) if isinstance(first.longrepr, tuple) else first.longreprtext
+        return {
+            'nodeid': nodeid,
+            'outcome': test_outcome(phases),
+            'worker_id': worker_id(),
+            'start': first.start,
+            'stop': phases[max(phases, key=lambda when: phases[when].stop)].stop,
+            'durations': {when: report.duration for when, report in phases.items()},
+            # Set by pytest-rerunfailures: attempts before the final one
+            'reruns': max(getattr(report, 'rerun', 0) for report in phases.values()),
+            'longrepr': longrepr[-MAX_LONGREPR:],
+            # Page performance samples, see BasePage.record_performance
+            'perf': [sample for report in phases.values()
+                     for name, value in report.user_properties if name == 'perf' for sample in value],
+            # Network capture of the test, see NetworkCaptureWriter.record
+            'network': next((value for report in phases.values()
+                             for name, value in report.user_properties if name == 'network'), None),
+            # Requests blocked by the test's resource profile, see summarize_requests
+            'resources': next((value for report in phases.values()
+                               for name, value in report.user_properties if name == 'resources'), None),
+        }
+
+    def pytest_sessionfinish(self, session):
+        self.writer.close()
+        if session.config.getoption('collectonly'):
+            return
+        if self.merge is not None:
+            try:
+                index = self.merge(self.run)
+                if index is not None:
+                    Logger().info(f"Report: {index}")
+            except Exception as e:
+                Logger().error(f"Failed to render the report: {str(e)}")
+        if self.ingest is not None:
+            try:
+                self.ingest(self.run)
+            except Exception as e:
+                Logger().error(f"Failed to add the run to the results history: {str(e)}")
@@ -0,0 +1,238 @@
+import argparse
+import glob
+import heapq
+import html
+import json
+import os
+import time
+from datetime import datetime
+from utils.report_fragments import fragment_dir, run_dir
+
+OUTCOMES = ('failed', 'error', 'xpassed', 'passed', 'skipped', 'xfailed')
+
+STYLE = """
+body { font-family: Helvetica, Arial, sans-serif; font-size: 13px; margin: 20px; }
+table { border-collapse: collapse; width: 100%; }
+th, td { border: 1px solid #e6e6e6; padding: 4px 8px; text-align: left; vertical-align: top; }
+pre { white-space: pre-wrap; background: #f6f6f6; padding: 8px; max-height: 400px; overflow: auto; }
+.passed { color: green; } .failed, .error, .xpassed { color: red; } .skipped, .xfailed { color: #c60; }
+.screenshots img { width: 320px; margin: 4px; border: 1px solid #ccc; }
+nav a { margin-right: 8px; }
+table.perf { width: auto; margin: 4px 0; } table.perf td { font-size: 12px; }
+"""
+
+
+def read_fragment(path):
+    """
+    Records of one worker's fragment, in the order the worker ran them.
+    A line cut short by a crashed worker is skipped.
+    """
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def _page_name(number):
+    return f'page_{number:04d}.html'
+
+
+def _document(title, body):
+    return (f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"/><title>{html.escape(title)}</title>'
+            f'<style>{STYLE}</style></head><body>\n{body}\n</body></html>\n')
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class PageWriter:
+    """
+    Writes test rows into numbered pages of page_size tests each, holding
+    only the current page in memory
+    """
+    def __init__(self, report_dir, title, page_size, store=None):
+        self.report_dir = report_dir
+        self.title = title
+        self.page_size = page_size
+        self.store = store
+        self.pages = []
+        self._rows = []
+        self._number = 0
+
+    def add(self, record):
+        self._number += 1
+        if len(self._rows) == self.page_size:
+            self._flush(last=False)
+        self._rows.append(self._row(self._number, record))
+        return _page_name(len(self.pages) + 1), f't{self._number}'
+
+    def _screenshots(self, nodeid):
+        if self.store is None:
+            return ''
+        images = [
+            f'<a href="{html.escape(src)}"><img loading="lazy" src="{html.escape(src)}" title="{html.escape(name)}" alt="{html.escape(name)}"/></a>'
+            for name, path in self.store.paths_for(nodeid)
+            for src in [os.path.relpath(path, self.report_dir).replace(os.sep, '/')]
+        ]
+        return f'<div class="screenshots">{"".join(images)}</div>' if images else ''
+
+    @staticmethod
+    def _performance(samples):
+        if not samples:
+            return ''
+        rows = ''.join(
+            f'<tr><td>{html.escape(sample["name"])}</td>'
+            f'<td>{html.escape(", ".join(f"{metric}={value:g}" for metric, value in sample["metrics"].items()))}'
+            + ''.join(f'<br/><span class="failed">{html.escape(violation)}</span>' for violation in sample['violations'])
+            + '</td><td>' + '<br/>'.join(f'{duration}ms {html.escape(kind)} {html.escape(url[-100:])}'
+                                          for url, kind, duration in sample['slowest']) + '</td></tr>'
+            for sample in samples)
+        return f'<table class="perf"><tr><th>Page / action</th><th>Metrics</th><th>Slowest resources</th></tr>{rows}</table>'
+
+    @staticmethod
+    def _network(capture):
+        if not capture:
+            return ''
+        # Captures live next to the report directory, in the run's network/
+        return (f'<p><a href="../{html.escape(capture["path"])}">Network capture</a>: {capture["requests"]} requests, '
+                f'{capture["pending"]} still pending, {capture["failed"]} failed '
+                f'(recording took {capture["overhead_ms"]:g}ms)</p>')
+
+    @staticmethod
+    def _resources(summary):
+        if not summary or not (summary['blocked'] or summary['profile'] != 'full'):
+            return ''
+        unknown = f', {summary["unknown_size"]} of unknown size' if summary['unknown_size'] else ''
+        return (f'<p>Resource profile {html.escape(summary["profile"])}: {summary["blocked"]} requests blocked, '
+                f'about {summary["saved_kb"]:g} KB saved{unknown}; {summary["loaded"]} requests loaded '
+                f'({summary["loaded_kb"]:g} KB)</p>')
+
+    def _row(self, number, record):
+        outcome = record['outcome']
+        duration = sum(record['durations'].values())
+        details = ''
+        if record['longrepr']:
+            details += f'<pre>{html.escape(record["longrepr"])}</pre>'
+        details += self._performance(record.get('perf'))
+        details += self._network(record.get('network'))
+        details += self._resources(record.get('resources'))
+        details += self._screenshots(record['nodeid'])
+        if details:
+            details = f'<details{" open" if outcome in ("failed", "error") else ""}><summary>details</summary>{details}</details>'
+        return (f'<tr id="t{number}"><td>{number}</td><td>{html.escape(record["nodeid"])}{details}</td>'
+                f'<td class="{outcome}">{outcome}</td><td>{duration:.2f}s</td>'
+                f'<td>{html.escape(record["worker_id"])}</td><td>{_format_time(record["start"])}</td></tr>')
+
+    def _flush(self, last):
+        number = len(self.pages) + 1
+        nav = '<nav><a href="index.html">Summary</a>'
+        if number > 1:
+            nav += f'<a href="{_page_name(number - 1)}">&laquo; Previous</a>'
+        if not last:
+            nav += f'<a href="{_page_name(number + 1)}">Next &raquo;</a>'
+        nav += '</nav>'
+        body = (f'<h1>{html.escape(self.title)} &mdash; page {number}</h1>{nav}'
+                '<table><tr><th>#</th><th>Test</th><th>Outcome</th><th>Duration</th><th>Worker</th><th>Started</th></tr>\n'
+                + '\n'.join(self._rows) + f'\n</table>{nav}')
+        with open(os.path.join(self.report_dir, _page_name(number)), 'w') as f:
+            f.write(_document(f'{self.title} - page {number}', body))
+        self.pages.append((self._number - len(self._rows) + 1, self._number))
+        self._rows = []
+
+    def close(self):
+        if self._rows or not self.pages:
+            self._flush(last=True)
+
+
+def merge_report(report_path, run, page_size=100, store=None, max_failures=500):
+    """
+    Render the report of a run from its fragments: an index page with the
+    summary and failures, plus pages of page_size tests each
+    :param store: ScreenshotStore of the run; screenshots are linked, never inlined
+    :return: path of the index page, or None if the run has no fragments
+    """
+    fragments = sorted(glob.glob(os.path.join(fragment_dir(report_path, run), '*.jsonl')))
+    if not fragments:
+        return None
+    started = time.perf_counter()
+    report_dir = os.path.join(run_dir(report_path, run), 'report')
+    os.makedirs(report_dir, exist_ok=True)
+    title = f'Test Report {run}'
+
+    counts = dict.fromkeys(OUTCOMES, 0)
+    failures = []
+    total_duration, first_start, last_stop = 0.0, None, None
+    pages = PageWriter(report_dir, title, page_size, store)
+    # Each fragment is in start order already, so a k-way merge keeps memory flat
+    for record in heapq.merge(*(read_fragment(path) for path in fragments), key=lambda record: record['start']):
+        page, anchor = pages.add(record)
+        counts[record['outcome']] = counts.get(record['outcome'], 0) + 1
+        total_duration += sum(record['durations'].values())
+        first_start = record['start'] if first_start is None else min(first_start, record['start'])
+        last_stop = record['stop'] if last_stop is None else max(last_stop, record['stop'])
+        if record['outcome'] in ('failed', 'error', 'xpassed') and len(failures) < max_failures:
+            failures.append((page, anchor, record))
+    pages.close()
+
+    total = sum(counts.values())
+    summary = ''.join(f'<li class="{outcome}">{count} {outcome}</li>' for outcome, count in counts.items() if count)
+    body = (f'<h1>{html.escape(title)}</h1>'
+            f'<p>{total} tests from {len(fragments)} worker(s), '
+            f'{_format_time(first_start) if first_start else "-"} to {_format_time(last_stop) if last_stop else "-"}; '
+            f'wall time {(last_stop - first_start) if first_start else 0:.1f}s, test time {total_duration:.1f}s</p>'
+            f'<ul>{summary}</ul>')
+    if failures:
+        body += '<h2>Failures</h2><ul>' + ''.join(
+            f'<li><a href="{page}#{anchor}">{html.escape(record["nodeid"])}</a> '
+            f'<span class="{record["outcome"]}">{record["outcome"]}</span></li>'
+            for page, anchor, record in failures) + '</ul>'
+        if counts['failed'] + counts['error'] + counts['xpassed'] > len(failures):
+            body += f'<p>Only the first {len(failures)} failures are listed.</p>'
+    body += '<h2>Pages</h2><ul>' + ''.join(
+        f'<li><a href="{_page_name(number)}">Tests {first}&ndash;{last}</a></li>'
+        for number, (first, last) in enumerate(pages.pages, 1)) + '</ul>'
+    body += f'<p>Rendered in {time.perf_counter() - started:.2f}s.</p>'
+
+    index = os.path.join(report_dir, 'index.html')
+    with open(index, 'w') as f:
+        f.write(_document(title, body))
+    return index
+
+
+def merge_run(run):
+    """
+    Render the report of a run with the configured page size and screenshot store
+    """
+    from utils.screenshot_writer import open_screenshot_store
+    from utils.settings import get_settings
+
+    settings = get_settings()
+    return merge_report(settings.path(settings.reports.report_path), run,
+                        settings.reports.page_size, open_screenshot_store(run))
+
+
+def main():
+    from utils.settings import get_settings
+
+    parser = argparse.ArgumentParser(description='Render the HTML report of a run from its result fragments')
+    parser.add_argument('run', nargs='?', help='run id (default: the latest run)')
+    args = parser.parse_args()
+
+    run = args.run
+    if run is None:
+        settings = get_settings()
+        runs = glob.glob(os.path.join(settings.path(settings.reports.report_path), 'runs', '*', 'fragments'))
+        if not runs:
+            parser.error('no runs with result fragments found')
+        run = os.path.basename(os.path.dirname(max(runs, key=os.path.getmtime)))
+    index = merge_run(run)
+    if index is None:
+        parser.error(f'run {run} has no result fragments')
+    print(f"Report: {index}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+import json
+import os
+import threading
+import weakref
+from functools import lru_cache
+from urllib.parse import urlsplit
+from utils.logger import Logger
+from utils.settings import get_settings
+
+# Profile that blocks nothing, always available
+FULL_PROFILE = 'full'
+
+# URL patterns (DevTools wildcards) blocked by each category a profile can list
+CATEGORIES = {
+    'images': ('*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.avif*', '*.svg*', '*.ico*', '*.bmp*'),
+    'fonts': ('*.woff*', '*.ttf*', '*.otf*', '*.eot*', '*fonts.googleapis.com*', '*fonts.gstatic.com*',
+              '*use.typekit.net*'),
+    'media': ('*.mp4*', '*.webm*', '*.ogg*', '*.mp3*', '*.wav*', '*.m3u8*'),
+    'analytics': ('*google-analytics.com*', '*googletagmanager.com*', '*analytics.google.com*', '*hotjar.com*',
+                  '*segment.io*', '*cdn.segment.com*', '*mixpanel.com*', '*amplitude.com*', '*clarity.ms*',
+                  '*newrelic.com*', '*nr-data.net*', '*sentry.io*'),
+    'trackers': ('*doubleclick.net*', '*googlesyndication.com*', '*adservice.google.com*', '*facebook.net*',
+                 '*connect.facebook.com*', '*ads-twitter.com*', '*analytics.twitter.com*', '*bat.bing.com*',
+                 '*px.ads.linkedin.com*', '*snap.licdn.com*', '*intercomcdn.com*'),
+}
+
+# Firefox has no runtime URL blocking through WebDriver; these content settings
+# are the closest launch-time equivalent of each category
+FIREFOX_PREFERENCES = {
+    'images': {'permissions.default.image': 2},
+    'fonts': {'browser.display.use_document_fonts': 0},
+    'media': {'media.autoplay.default': 5},
+    'analytics': {'privacy.trackingprotection.enabled': True},
+    'trackers': {'privacy.trackingprotection.enabled': True},
+}
+
+# Reason Chromium logs for requests cancelled by Network.setBlockedURLs
+BLOCKED_ERROR = 'blocked: inspector'
+
+_applied = weakref.WeakKeyDictionary()
+_warned = set()
+_active = None
+
+
+@lru_cache(maxsize=8)
+def parse_profiles(text):
+    """
+    Profiles from '<name>: <category or URL pattern>, ...' lines, e.g.
+    'lean: images, fonts, analytics, *.cloudfront.net/media/*'
+    :return: dict of profile name -> tuple of URL patterns, including 'full'
+    """
+    profiles = {FULL_PROFILE: ()}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        name, separator, entries = line.partition(':')
+        if not separator or not name.strip():
+            raise ValueError(f"Invalid resource profile (expected <name>: <categories>): {line.strip()}")
+        patterns = []
+        for entry in (entry.strip() for entry in entries.split(',')):
+            if entry in CATEGORIES:
+                patterns.extend(CATEGORIES[entry])
+            elif '*' in entry or '.' in entry or '/' in entry:
+                patterns.append(entry)
+            elif entry:
+                raise ValueError(f"Unknown resource category in profile {name.strip()}: {entry}")
+        profiles[name.strip()] = tuple(dict.fromkeys(patterns))
+    return profiles
+
+
+@lru_cache(maxsize=8)
+def parse_suites(text):
+    """
+    Suite marker -> profile from '<suite>: <profile>' entries separated by
+    commas or newlines, e.g. 'smoke: lean'
+    """
+    suites = {}
+    for entry in text.replace('\n', ',').split(','):
+        if not entry.strip():
+            continue
+        suite, separator, profile = entry.partition(':')
+        if not separator:
+            raise ValueError(f"Invalid suite resource profile (expected <suite>: <profile>): {entry.strip()}")
+        suites[suite.strip()] = profile.strip()
+    return suites
+
+
+def profile_patterns(name):
+    profiles = parse_profiles(get_settings().resources.profiles)
+    if name not in profiles:
+        raise ValueError(f"Unknown resource profile: {name} (configured: {', '.join(profiles)})")
+    return profiles[name]
+
+
+def profile_categories(name):
+    """
+    Categories whose patterns are all blocked by a profile
+    """
+    patterns = set(profile_patterns(name))
+    return [category for category, category_patterns in CATEGORIES.items() if patterns.issuperset(category_patterns)]
+
+
+def resolve_profile(marker_profile=None, option_profile=None, suites=()):
+    """
+    Profile for a test: resource_profile marker, then --resource-profile, then
+    the first of its suite markers with a profile in [RESOURCES] suites, then
+    the configured default
+    """
+    if marker_profile:
+        return marker_profile
+    if option_profile:
+        return option_profile
+    settings = get_settings().resources
+    by_suite = parse_suites(settings.suites)
+    return next((by_suite[suite] for suite in suites if suite in by_suite), settings.profile)
+
+
+def set_resource_profile(name):
+    """
+    Profile the browsers of the running test should use
+    """
+    global _active
+    profile_patterns(name)
+    _active = name
+
+
+def active_profile():
+    return _active or get_settings().resources.profile
+
+
+def firefox_preferences(name):
+    """
+    Launch-time Firefox preferences approximating a profile; URL patterns
+    outside the categories cannot be blocked in Firefox
+    """
+    preferences = {}
+    for category in profile_categories(name):
+        preferences.update(FIREFOX_PREFERENCES[category])
+    return preferences
+
+
+def launched_with_profile(driver, name):
+    """
+    Record the profile a browser was launched with (Firefox preferences)
+    """
+    _applied[driver] = name
+
+
+def applied_profile(driver):
+    return _applied.get(driver, FULL_PROFILE)
+
+
+def apply_resource_profile(driver, name):
+    """
+    Block the URLs of a profile in a running browser. Chromium browsers switch
+    through DevTools at any time; Firefox keeps the profile it was launched with.
+    :return: True if the browser now uses the profile
+    """
+    if applied_profile(driver) == name:
+        return True
+    if not hasattr(driver, 'execute_cdp_cmd'):
+        if name not in _warned:
+            _warned.add(name)
+            Logger().warning(f"Resource profile {name} cannot be switched in {driver.name}; "
+                             f"it keeps the launch profile {applied_profile(driver)}")
+        return False
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(profile_patterns(name))})
+    _applied[driver] = name
+    return True
+
+
+def _resource_key(url):
+    parts = urlsplit(url)
+    return f'{parts.netloc}{parts.path}'
+
+
+class ResourceSizes:
+    """
+    Transfer sizes of resources seen loading in earlier tests and runs, keyed
+    by URL without its query string. A blocked request sends nothing, so the
+    bytes it saved can only be estimated from these.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self._changed = False
+        try:
+            with open(path, 'r') as f:
+                self._sizes = json.load(f)
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def learn(self, entries):
+        with self._lock:
+            for entry in entries:
+                size = entry['response']['bodySize']
+                if size and size > 0 and not entry['_fromCache'] and not entry['_error']:
+                    key = _resource_key(entry['request']['url'])
+                    if self._sizes.get(key) != size:
+                        self._sizes[key] = size
+                        self._changed = True
+
+    def estimate(self, url):
+        with self._lock:
+            return self._sizes.get(_resource_key(url))
+
+    def save(self):
+        with self._lock:
+            if not self._changed:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(self._sizes, f)
+            os.replace(temp_path, self.path)
+            self._changed = False
+
+
+class BlockingStats:
+    """
+    Requests blocked and bytes saved over the session, for the session log
+    """
+    def __init__(self):
+        self.tests = 0
+        self.blocked = 0
+        self.saved_kb = 0.0
+        self.loaded_kb = 0.0
+
+    def add(self, summary):
+        self.tests += 1
+        self.blocked += summary['blocked']
+        self.saved_kb += summary['saved_kb']
+        self.loaded_kb += summary['loaded_kb']
+
+    def __str__(self):
+        return (f"{self.blocked} requests blocked in {self.tests} tests, about {self.saved_kb:.0f} KB saved "
+                f"({self.loaded_kb:.0f} KB loaded)")
+
+
+_sizes = None
+blocking_stats = BlockingStats()
+
+
+def get_resource_sizes():
+    global _sizes
+    if _sizes is None:
+        _sizes = ResourceSizes(get_settings().path(get_settings().resources.size_cache))
+    return _sizes
+
+
+def save_resource_sizes():
+    if _sizes is not None:
+        _sizes.save()
+
+
+def summarize_requests(profile, entries):
+    """
+    Blocked and loaded requests of a test, drained from its NetworkRecorder
+    :return: summary for the test's report
+    """
+    sizes = get_resource_sizes()
+    loaded = [entry for entry in entries if entry['_error'] != BLOCKED_ERROR]
+    blocked = [entry for entry in entries if entry['_error'] == BLOCKED_ERROR]
+    sizes.learn(loaded)
+    estimates = [sizes.estimate(entry['request']['url']) for entry in blocked]
+    summary = {
+        'profile': profile,
+        'blocked': len(blocked),
+        'saved_kb': round(sum(size for size in estimates if size) / 1024, 1),
+        'unknown_size': sum(1 for size in estimates if not size),
+        'loaded': len(loaded),
+        'loaded_kb': round(sum(max(entry['response']['bodySize'] or 0, 0) for entry in loaded) / 1024, 1),
+    }
+    blocking_stats.add(summary)
+    return summary
@@ -0,0 +1,375 @@
+import argparse
+import glob
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+from utils.report_fragments import fragment_dir
+from utils.report_merge import read_fragment
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at REAL,
+    finished_at REAL,
+    tests INTEGER,
+    failed INTEGER,
+    workers INTEGER,
+    ingested_at REAL
+);
+CREATE TABLE IF NOT EXISTS tests (
+    id INTEGER PRIMARY KEY,
+    nodeid TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS signatures (
+    id TEXT PRIMARY KEY,
+    message TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id TEXT NOT NULL,
+    test_id INTEGER NOT NULL REFERENCES tests (id),
+    outcome TEXT NOT NULL,
+    failed INTEGER NOT NULL,
+    flipped INTEGER NOT NULL DEFAULT 0,
+    started_at REAL NOT NULL,
+    day TEXT NOT NULL,
+    duration REAL NOT NULL,
+    setup REAL,
+    call REAL,
+    teardown REAL,
+    reruns INTEGER NOT NULL DEFAULT 0,
+    signature TEXT REFERENCES signatures (id),
+    worker_id TEXT,
+    PRIMARY KEY (run_id, test_id)
+);
+CREATE INDEX IF NOT EXISTS results_test_time ON results (test_id, started_at);
+CREATE INDEX IF NOT EXISTS results_test_day ON results (test_id, day);
+CREATE INDEX IF NOT EXISTS results_failures ON results (test_id, started_at) WHERE failed = 1;
+CREATE TABLE IF NOT EXISTS daily (
+    test_id INTEGER NOT NULL REFERENCES tests (id),
+    day TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    rerun_passes INTEGER NOT NULL,
+    flips INTEGER NOT NULL,
+    total_duration REAL NOT NULL,
+    max_duration REAL NOT NULL,
+    PRIMARY KEY (day, test_id)
+);
+CREATE INDEX IF NOT EXISTS tests_name ON tests (name);
+"""
+
+FAILED_OUTCOMES = ('failed', 'error', 'xpassed')
+# Outcomes that say nothing about whether a test works
+IGNORED_OUTCOMES = ('skipped', 'xfailed')
+
+_VOLATILE = [
+    (re.compile(r'0x[0-9a-fA-F]+'), '<addr>'),
+    (re.compile(r'\b[0-9a-f]{16,}\b'), '<id>'),
+    (re.compile(r'\d+(\.\d+)?'), 'N'),
+]
+
+
+def failure_signature(longrepr):
+    """
+    (signature id, message) identifying a failure across runs: the final
+    error line of the traceback with numbers, addresses and session ids masked
+    """
+    lines = [line for line in longrepr.splitlines() if line.strip()]
+    if not lines:
+        return None, None
+    errors = [line for line in lines if line.startswith('E ')]
+    # Only pytest's 'E ' marker is stripped, never a leading E of the message itself
+    message = (errors[0][1:] if errors else lines[-1]).strip()[:500]
+    for pattern, replacement in _VOLATILE:
+        message = pattern.sub(replacement, message)
+    return hashlib.sha1(message.encode('utf-8')).hexdigest()[:16], message
+
+
+def _day(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
+
+
+class ResultsHistory:
+    """
+    Indexed SQLite history of test results across runs, built by ingesting
+    each run's result fragments.
+
+    Next to one row per test and run, ingest maintains a per-test, per-day
+    rollup (runs, failures, passes after rerun, pass/fail flips, durations),
+    so the flakiness and duration queries read a few rows per test and day
+    no matter how many runs the history holds.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def connect(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+        return connection
+
+    def ingest(self, run, records):
+        """
+        Store the results of a run, replacing what was ingested for it before
+        :param records: fragment records, see ReportFragmentPlugin.record
+        :return: number of results stored
+        """
+        connection = self.connect()
+        try:
+            with connection:
+                # Rollups of a re-ingested run are rebuilt below
+                replaced = connection.execute(
+                    'SELECT test_id, day, started_at FROM results WHERE run_id = ?', (run,)).fetchall()
+                affected = {(test_id, day) for test_id, day, _ in replaced}
+                connection.execute('DELETE FROM results WHERE run_id = ?', (run,))
+                tests = failed = 0
+                started = finished = None
+                workers = set()
+                for record in records:
+                    test_id = self._test_id(connection, record['nodeid'])
+                    is_failed = record['outcome'] in FAILED_OUTCOMES
+                    signature = None
+                    if is_failed and record.get('longrepr'):
+                        signature, message = failure_signature(record['longrepr'])
+                        if signature is not None:
+                            connection.execute('INSERT OR IGNORE INTO signatures VALUES (?, ?)', (signature, message))
+                    flipped = 0
+                    if record['outcome'] not in IGNORED_OUTCOMES:
+                        previous = self._previous_failed(connection, test_id, record['start'])
+                        flipped = int(previous is not None and previous != int(is_failed))
+                    durations = record['durations']
+                    day = _day(record['start'])
+                    connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+                        run, test_id, record['outcome'], int(is_failed), flipped, record['start'], day,
+                        sum(durations.values()), durations.get('setup'), durations.get('call'), durations.get('teardown'),
+                        record.get('reruns', 0), signature, record.get('worker_id'),
+                    ))
+                    affected.add((test_id, day))
+                    affected.update(self._reflip_next(connection, test_id, record['start']))
+                    tests += 1
+                    failed += int(is_failed)
+                    started = record['start'] if started is None else min(started, record['start'])
+                    finished = record['stop'] if finished is None else max(finished, record['stop'])
+                    workers.add(record.get('worker_id'))
+                # Results that followed a replaced result the run no longer has
+                for test_id, _, started_at in replaced:
+                    affected.update(self._reflip_next(connection, test_id, started_at))
+                for test_id, day in affected:
+                    self._rollup(connection, test_id, day)
+                connection.execute('INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                   (run, started, finished, tests, failed, len(workers), time.time()))
+            return tests
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _test_id(connection, nodeid):
+        row = connection.execute('SELECT id FROM tests WHERE nodeid = ?', (nodeid,)).fetchone()
+        if row is not None:
+            return row[0]
+        name = nodeid.rsplit('::', 1)[-1].split('[')[0]
+        return connection.execute('INSERT INTO tests (nodeid, name) VALUES (?, ?)', (nodeid, name)).lastrowid
+
+    @staticmethod
+    def _previous_failed(connection, test_id, started_at):
+        """
+        failed of the test's last counted result before started_at, or None
+        """
+        row = connection.execute(f"""
+            SELECT failed FROM results WHERE test_id = ? AND started_at < ?
+            AND outcome NOT IN {IGNORED_OUTCOMES} ORDER BY started_at DESC LIMIT 1
+        """, (test_id, started_at)).fetchone()
+        return None if row is None else row[0]
+
+    @classmethod
+    def _reflip_next(cls, connection, test_id, started_at):
+        """
+        Recompute flipped of the test's first counted result after started_at,
+        which changes when a run is ingested out of order
+        :return: the (test_id, day) whose rollup must be rebuilt, if any
+        """
+        row = connection.execute(f"""
+            SELECT rowid, failed, started_at, day FROM results WHERE test_id = ? AND started_at > ?
+            AND outcome NOT IN {IGNORED_OUTCOMES} ORDER BY started_at LIMIT 1
+        """, (test_id, started_at)).fetchone()
+        if row is None:
+            return []
+        rowid, failed, next_start, day = row
+        previous = cls._previous_failed(connection, test_id, next_start)
+        flipped = int(previous is not None and previous != failed)
+        connection.execute('UPDATE results SET flipped = ? WHERE rowid = ?', (flipped, rowid))
+        return [(test_id, day)]
+
+    @staticmethod
+    def _rollup(connection, test_id, day):
+        connection.execute('DELETE FROM daily WHERE test_id = ? AND day = ?', (test_id, day))
+        connection.execute(f"""
+            INSERT INTO daily
+            SELECT test_id, day, COUNT(*), SUM(failed), SUM(reruns > 0 AND failed = 0), SUM(flipped),
+                   SUM(duration), MAX(duration)
+            FROM results WHERE test_id = ? AND day = ? AND outcome NOT IN {IGNORED_OUTCOMES}
+            GROUP BY test_id, day
+        """, (test_id, day))
+
+    def ingest_run(self, report_path, run):
+        """
+        Ingest a run from its fragments under report_path
+        """
+        records = (record for path in sorted(glob.glob(os.path.join(fragment_dir(report_path, run), '*.jsonl')))
+                   for record in read_fragment(path))
+        return self.ingest(run, records)
+
+    def query(self, sql, params=()):
+        connection = self.connect()
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def flaky(self, since_day, min_runs=3, limit=20):
+        """
+        Tests by flakiness: the share of runs where the test passed only after
+        a rerun, or where its pass/fail result flipped from the previous run
+        :param since_day: first day to include, 'YYYY-MM-DD'
+        :return: rows of (nodeid, runs, failures, passed after rerun, flips, flakiness)
+        """
+        return self.query("""
+            SELECT tests.nodeid, SUM(runs) AS total_runs, SUM(failures), SUM(rerun_passes), SUM(flips),
+                   (SUM(rerun_passes) + SUM(flips)) * 1.0 / SUM(runs) AS flakiness
+            FROM daily JOIN tests ON tests.id = daily.test_id
+            WHERE day >= ?
+            GROUP BY test_id HAVING total_runs >= ? AND flakiness > 0
+            ORDER BY flakiness DESC, total_runs DESC LIMIT ?
+        """, (since_day, min_runs, limit))
+
+    def slowest(self, since_day, limit=20):
+        """
+        :return: rows of (nodeid, runs, average seconds, max seconds, latest seconds)
+        """
+        return self.query("""
+            SELECT tests.nodeid, SUM(runs), SUM(total_duration) / SUM(runs), MAX(max_duration),
+                   (SELECT duration FROM results WHERE results.test_id = daily.test_id
+                    ORDER BY started_at DESC LIMIT 1)
+            FROM daily JOIN tests ON tests.id = daily.test_id
+            WHERE day >= ?
+            GROUP BY test_id ORDER BY SUM(total_duration) / SUM(runs) DESC LIMIT ?
+        """, (since_day, limit))
+
+    def trend(self, pattern, since_day, bucket='day'):
+        """
+        Duration and failures of the tests matching pattern per day (or per run)
+        :return: rows of (bucket, runs, average seconds, max seconds, failures)
+        """
+        matching = 'SELECT id FROM tests WHERE name = ? OR nodeid LIKE ?'
+        if bucket == 'day':
+            return self.query(f"""
+                SELECT day, SUM(runs), SUM(total_duration) / SUM(runs), MAX(max_duration), SUM(failures)
+                FROM daily WHERE day >= ? AND test_id IN ({matching})
+                GROUP BY day ORDER BY day
+            """, (since_day, pattern, f'%{pattern}%'))
+        return self.query(f"""
+            SELECT run_id, COUNT(*), AVG(duration), MAX(duration), SUM(failed)
+            FROM results WHERE day >= ? AND test_id IN ({matching}) AND outcome NOT IN {IGNORED_OUTCOMES}
+            GROUP BY run_id ORDER BY MIN(started_at)
+        """, (since_day, pattern, f'%{pattern}%'))
+
+    def failures(self, pattern, since_day):
+        """
+        Failures of the tests matching pattern, grouped by failure signature
+        :return: rows of (nodeid, runs, failures, signature message, count, last seen)
+        """
+        return self.query("""
+            WITH matching AS (SELECT id, nodeid FROM tests WHERE name = ? OR nodeid LIKE ?),
+                 totals AS (
+                    SELECT test_id, SUM(runs) AS runs, SUM(failures) AS failures FROM daily
+                    WHERE day >= ? AND test_id IN (SELECT id FROM matching) GROUP BY test_id
+                 )
+            SELECT matching.nodeid, totals.runs, totals.failures, signatures.message,
+                   COUNT(results.test_id), MAX(results.started_at)
+            FROM totals JOIN matching ON matching.id = totals.test_id
+            LEFT JOIN results ON results.test_id = totals.test_id AND results.failed = 1 AND results.day >= ?
+            LEFT JOIN signatures ON signatures.id = results.signature
+            GROUP BY totals.test_id, results.signature
+            ORDER BY totals.failures DESC, COUNT(results.test_id) DESC
+        """, (pattern, f'%{pattern}%', since_day, since_day))
+
+
+def add_run_to_history(run):
+    """
+    Ingest a run into the configured results history
+    """
+    from utils.settings import get_settings
+
+    settings = get_settings()
+    history = ResultsHistory(settings.path(settings.history.db_path))
+    return history.ingest_run(settings.path(settings.reports.report_path), run)
+
+
+def _since(days):
+    return _day(time.time() - days * 86400)
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M') if timestamp else '-'
+
+
+def main():
+    from utils.settings import get_settings
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description='Query the test results history')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = subparsers.add_parser('ingest', help='Add runs to the history from their result fragments')
+    ingest_parser.add_argument('runs', nargs='*', help='run ids (default: every run on disk)')
+    for name, help_text in (('flaky', 'Tests that fail intermittently'), ('slowest', 'Slowest tests on average')):
+        command_parser = subparsers.add_parser(name, help=help_text)
+        command_parser.add_argument('--days', type=float, default=30, help='look back this many days (default: 30)')
+        command_parser.add_argument('--limit', type=int, default=20, help='rows to show (default: 20)')
+        if name == 'flaky':
+            command_parser.add_argument('--min-runs', type=int, default=3, help='ignore tests with fewer runs (default: 3)')
+    for name, help_text in (('trend', 'Duration and failures of a test over time'),
+                            ('failures', 'How often a test failed, by failure signature')):
+        command_parser = subparsers.add_parser(name, help=help_text)
+        command_parser.add_argument('test', help='test name (e.g. test_valid_login) or part of its node id')
+        command_parser.add_argument('--days', type=float, default=30, help='look back this many days (default: 30)')
+        if name == 'trend':
+            command_parser.add_argument('--by', choices=('day', 'run'), default='day', help='bucket size (default: day)')
+    args = parser.parse_args()
+
+    history = ResultsHistory(settings.path(settings.history.db_path))
+    report_path = settings.path(settings.reports.report_path)
+    started = time.perf_counter()
+
+    if args.command == 'ingest':
+        runs = args.runs or sorted(os.path.basename(os.path.dirname(path))
+                                   for path in glob.glob(os.path.join(report_path, 'runs', '*', 'fragments')))
+        for run in runs:
+            print(f"Ingested {history.ingest_run(report_path, run)} results of run {run}")
+    elif args.command == 'flaky':
+        print(f"{'flakiness':>9} {'runs':>5} {'fails':>5} {'rerun':>5} {'flips':>5}  test")
+        for nodeid, runs, failures, rerun_passes, flips, flakiness in history.flaky(_since(args.days), args.min_runs, args.limit):
+            print(f"{flakiness:>9.1%} {runs:>5} {failures:>5} {rerun_passes:>5} {flips:>5}  {nodeid}")
+    elif args.command == 'slowest':
+        print(f"{'avg':>8} {'max':>8} {'latest':>8} {'runs':>5}  test")
+        for nodeid, runs, average, maximum, latest in history.slowest(_since(args.days), args.limit):
+            print(f"{average:>7.2f}s {maximum:>7.2f}s {latest:>7.2f}s {runs:>5}  {nodeid}")
+    elif args.command == 'trend':
+        print(f"{args.by:<22} {'runs':>5} {'avg':>8} {'max':>8} {'fails':>5}")
+        for bucket, runs, average, maximum, failures in history.trend(args.test, _since(args.days), args.by):
+            print(f"{bucket:<22} {runs:>5} {average:>7.2f}s {maximum:>7.2f}s {failures:>5}")
+    else:
+        for nodeid, runs, failures, message, count, last_seen in history.failures(args.test, _since(args.days)):
+            if message is None:
+                print(f"{nodeid}: failed {failures} of {runs} runs")
+            else:
+                print(f"{nodeid}: failed {failures} of {runs} runs; {count}x (last {_format_time(last_seen)}): {message}")
+    print(f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it only exact duplicates are detected
+    Image = None
+
+from utils.test_context import safe_name
+
+
+def perceptual_hash(png):
+    """
+    Perceptual fingerprint of an image as (dhash, colours): a 64-bit difference
+    hash, where near-identical frames differ in only a few bits, plus a coarse
+    4x4 colour signature, since the difference hash alone ignores colour changes
+    """
+    image = Image.open(io.BytesIO(png))
+    pixels = list(image.convert('L').resize((9, 8)).getdata())
+    dhash = 0
+    for row in range(8):
+        for col in range(8):
+            dhash = (dhash << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    colours = bytes(channel >> 5 for pixel in image.convert('RGB').resize((4, 4)).getdata() for channel in pixel).hex()
+    return dhash, colours
+
+
+def is_near_duplicate(first, second, threshold):
+    """
+    Compare two perceptual_hash results
+    """
+    return first[1] == second[1] and bin(first[0] ^ second[0]).count('1') <= threshold
+
+
+class ScreenshotStore:
+    """
+    Content-addressed screenshot storage.
+
+    Each distinct image is stored once as blobs/<hash[:2]>/<hash>.<ext>, named
+    by the SHA-256 of its PNG bytes. A JSON-lines index per test maps the
+    logical screenshot names to blobs, so identical frames are never stored
+    twice and no capture can overwrite another.
+    """
+    def __init__(self, blob_dir, index_dir, perceptual_threshold=None):
+        """
+        :param blob_dir: directory holding the image blobs (shared by all runs)
+        :param index_dir: directory holding this run's per-test index files
+        :param perceptual_threshold: when set (and Pillow is available), a frame
+            whose perceptual hash is within this many bits of the previous frame
+            of the same test reuses that frame's blob
+        """
+        self.blob_dir = blob_dir
+        self.index_dir = index_dir
+        self.perceptual_threshold = perceptual_threshold if Image is not None else None
+        self._last_frame = {}
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest, extension):
+        return os.path.join(self.blob_dir, digest[:2], f'{digest}.{extension}')
+
+    def index_path(self, test_id):
+        return os.path.join(self.index_dir, f'{safe_name(test_id)}.jsonl')
+
+    def add(self, png, test_id, name, extension, encode, captured_at=None):
+        """
+        Store a screenshot and record it in the test's index
+        :param png: raw PNG bytes from the driver
+        :param extension: file extension of the encoded blob
+        :param encode: callable turning the PNG bytes into the stored bytes
+        :return: path of the blob the screenshot resolves to
+        """
+        digest = hashlib.sha256(png).hexdigest()
+        phash = None
+        with self._lock:
+            previous = self._last_frame.get(test_id)
+        if self.perceptual_threshold is not None:
+            phash = perceptual_hash(png)
+            if previous and previous['phash'] is not None \
+                    and is_near_duplicate(previous['phash'], phash, self.perceptual_threshold):
+                digest, extension = previous['blob'], previous['extension']
+
+        path = self.blob_path(digest, extension)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(encode(png))
+            os.replace(tmp_path, path)
+
+        entry = {
+            'name': name,
+            'blob': digest,
+            'extension': extension,
+            'phash': phash,
+            'captured_at': captured_at or time.time(),
+        }
+        with self._lock:
+            self._last_frame[test_id] = entry
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(self.index_path(test_id), 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+        return path
+
+    def entries(self, test_id):
+        """
+        Index entries of a test, oldest first
+        """
+        try:
+            with open(self.index_path(test_id), 'r') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except OSError:
+            return []
+
+    def lookup(self, test_id, name):
+        """
+        Blob path of the latest screenshot called name for a test, or None
+        """
+        for entry in reversed(self.entries(test_id)):
+            if entry['name'] == name:
+                return self.blob_path(entry['blob'], entry['extension'])
+        return None
+
+    def paths_for(self, test_id):
+        """
+        (name, blob path) of every screenshot of a test, oldest first
+        """
+        return [(entry['name'], self.blob_path(entry['blob'], entry['extension'])) for entry in self.entries(test_id)]
+
+
+def referenced_blobs(index_root):
+    """
+    Blob hashes referenced by the per-test index files in any 'screenshots'
+    directory below index_root
+    """
+    referenced = set()
+    for root, _, files in os.walk(index_root):
+        if os.path.basename(root) != 'screenshots':
+            continue
+        for file in files:
+            if not file.endswith('.jsonl'):
+                continue
+            try:
+                with open(os.path.join(root, file), 'r') as f:
+                    referenced.update(json.loads(line)['blob'] for line in f if line.strip())
+            except (OSError, ValueError, KeyError):
+                continue
+    return referenced
@@ -0,0 +1,166 @@
+import atexit
+import io
+import os
+import queue
+import threading
+import time
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it screenshots stay PNG
+    Image = None
+
+from utils.screenshot_store import ScreenshotStore
+from utils.settings import get_settings
+from utils.test_context import current_test, run_id
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+_EXTENSIONS = {'png': 'png', 'jpeg': 'jpg', 'webp': 'webp'}
+
+
+class ScreenshotWriter:
+    """
+    Encodes and stores screenshots on a background thread so the test thread
+    only pays for grabbing the PNG bytes from the driver.
+
+    The queue is bounded: when the writer falls behind, capture blocks
+    instead of holding an unbounded number of screenshots in memory.
+    """
+    def __init__(self, store, image_format='png', quality=80, queue_size=32):
+        """
+        :param store: ScreenshotStore the screenshots are written to
+        :param image_format: png, jpeg or webp (jpeg/webp need Pillow)
+        :param quality: 1-100 quality for jpeg/webp
+        :param queue_size: screenshots allowed to wait for the writer thread
+        """
+        image_format = image_format.lower()
+        if image_format not in _EXTENSIONS:
+            raise ValueError(f"Unsupported screenshot format: {image_format}")
+        self.store = store
+        self.image_format = image_format if Image is not None else 'png'
+        self.quality = quality
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.errors = []
+
+    @property
+    def extension(self):
+        return _EXTENSIONS[self.image_format]
+
+    def capture(self, driver, name, test_id=None):
+        """
+        Grab a screenshot and queue it for storing under the current test
+        :param name: logical screenshot name, e.g. 'login_attempt'
+        :return: test id the screenshot is indexed under
+        """
+        png = driver.get_screenshot_as_png()
+        test_id = test_id or current_test() or 'session'
+        self.submit(png, test_id, name)
+        return test_id
+
+    def submit(self, png, test_id, name):
+        """
+        Queue raw PNG bytes to be encoded and stored
+        """
+        self._ensure_started()
+        self._queue.put((png, test_id, name, time.time()))
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='screenshot-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                png, test_id, name, captured_at = item
+                self.store.add(png, test_id, name, self.extension, self.encode, captured_at)
+            except Exception as e:
+                self.errors.append(f"{item[1]} {item[2]}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def encode(self, png):
+        """
+        Re-encode PNG bytes to the configured format
+        """
+        if Image is None:
+            return png
+        image = Image.open(io.BytesIO(png))
+        output = io.BytesIO()
+        if self.image_format == 'png':
+            image.save(output, 'PNG', optimize=True)
+        elif self.image_format == 'jpeg':
+            image.convert('RGB').save(output, 'JPEG', quality=self.quality, optimize=True)
+        else:
+            image.save(output, 'WEBP', quality=self.quality)
+        return output.getvalue()
+
+    def flush(self):
+        """
+        Block until every queued screenshot has been written
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Flush and stop the writer thread
+        """
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(None)
+        thread.join()
+
+
+_writer = None
+
+
+def open_screenshot_store(run=None):
+    """
+    Screenshot store of a run (default: the current one), configured from [REPORTS] and [SCREENSHOTS]
+    """
+    settings = get_settings()
+    perceptual_threshold = settings.screenshots.perceptual_threshold
+    return ScreenshotStore(
+        os.path.join(BASE_DIR, settings.reports.screenshot_path, 'blobs'),
+        os.path.join(BASE_DIR, settings.reports.report_path, 'runs', run or run_id(), 'screenshots'),
+        perceptual_threshold if perceptual_threshold >= 0 else None
+    )
+
+
+def get_screenshot_writer():
+    """
+    Return the process-wide screenshot writer, configured from [SCREENSHOTS]
+    """
+    global _writer
+    if _writer is None:
+        settings = get_settings()
+        _writer = ScreenshotWriter(
+            open_screenshot_store(),
+            settings.screenshots.format,
+            settings.screenshots.quality,
+            settings.screenshots.queue_size
+        )
+        atexit.register(_writer.close)
+    return _writer
+
+
+def close_screenshot_writer():
+    """
+    Write out every pending screenshot and stop the writer; returns the
+    errors the writer ran into
+    """
+    global _writer
+    writer, _writer = _writer, None
+    if writer is None:
+        return []
+    writer.close()
+    return writer.errors
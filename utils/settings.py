@@ -0,0 +1,402 @@
+import json
+import os
+import threading
+from configparser import ConfigParser
+from dataclasses import asdict, dataclass, field, fields, replace
+from types import MappingProxyType
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+CONFIG_PATH = os.path.join(BASE_DIR, 'config', 'config.ini')
+
+# The resolved settings of the controlling process, exported so pytest-xdist
+# workers use exactly the same values instead of re-reading the files
+SETTINGS_ENV = 'SELENIUM_SETTINGS'
+
+# Settings that can be overridden from the environment (SELENIUM_<NAME>)
+# or the command line, mapped to (section, field)
+OVERRIDES = {
+    'browser': ('environment', 'browser'),
+    'headless': ('environment', 'headless'),
+    'base_url': ('environment', 'base_url'),
+    'explicit_wait': ('timeouts', 'explicit_wait'),
+    'page_load_timeout': ('timeouts', 'page_load_timeout'),
+    'script_timeout': ('timeouts', 'script_timeout'),
+    'network_capture': ('network', 'enabled'),
+    'resource_profile': ('resources', 'profile'),
+    'standin': ('standin', 'enabled'),
+    'replay': ('replay', 'mode'),
+    'replay_strict': ('replay', 'strict'),
+    'profile_template': ('profiles', 'template'),
+}
+
+
+@dataclass(frozen=True)
+class EnvironmentSettings:
+    base_url: str = ''
+    browser: str = 'chrome'
+    headless: bool = False
+
+
+@dataclass(frozen=True)
+class TimeoutSettings:
+    explicit_wait: float = 20
+    page_load_timeout: float = 30
+    script_timeout: float = 30
+    poll_initial: float = 0.005
+    poll_max: float = 0.25
+    slow_wait_threshold: float = 5
+    settle_quiet_ms: int = 300
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    enabled: bool = False
+    size: int = 1
+
+
+@dataclass(frozen=True)
+class ParallelSettings:
+    workers: str = 'auto'
+    dist: str = 'class'
+    memory_per_worker_mb: int = 768
+
+
+@dataclass(frozen=True)
+class DurationSettings:
+    enabled: bool = True
+    db_path: str = 'reports/history/durations.sqlite'
+    history: int = 5
+    keep_runs: int = 50
+
+
+@dataclass(frozen=True)
+class ImpactSettings:
+    map_path: str = 'reports/history/impact_map.json'
+    full_suite: str = '*conftest.py, utils/*, config/*, requirements.txt'
+
+    @property
+    def full_suite_patterns(self):
+        return tuple(pattern.strip() for pattern in self.full_suite.split(',') if pattern.strip())
+
+
+@dataclass(frozen=True)
+class HistorySettings:
+    db_path: str = 'reports/history/results.sqlite'
+    auto_ingest: bool = True
+
+
+@dataclass(frozen=True)
+class AuthSettings:
+    state_dir: str = 'reports/.auth'
+    storage_state_ttl: int = 1800
+
+
+@dataclass(frozen=True)
+class DriverSettings:
+    cache_dir: str = 'drivers'
+    manifest: str = 'drivers/manifest.json'
+    offline: bool = False
+
+
+@dataclass(frozen=True)
+class ReportSettings:
+    report_path: str = 'reports/'
+    screenshot_path: str = 'reports/screenshots/'
+    page_size: int = 100
+
+
+@dataclass(frozen=True)
+class PerformanceSettings:
+    enabled: bool = True
+    slowest_resources: int = 5
+    budgets: str = ''
+    fail_on_budget: bool = True
+
+
+@dataclass(frozen=True)
+class NetworkSettings:
+    enabled: bool = False
+    failures_only: bool = True
+    queue_size: int = 64
+
+
+@dataclass(frozen=True)
+class StandinSettings:
+    enabled: bool = False
+    host: str = '127.0.0.1'
+    port: int = 0
+    latency_ms: float = 0
+    jitter_ms: float = 0
+    route_latency: str = ''
+    failure_rate: float = 0.0
+    failure_routes: str = '/api/*'
+    failure_status: int = 503
+    seed: int = 0
+
+
+@dataclass(frozen=True)
+class ProfileSettings:
+    template: bool = False
+    warm_urls: str = '/login'
+    temp_dir: str = ''
+
+    @property
+    def warm_url_list(self):
+        return tuple(url.strip() for url in self.warm_urls.split(',') if url.strip())
+
+
+@dataclass(frozen=True)
+class ReplaySettings:
+    mode: str = 'off'
+    strict: bool = False
+    store: str = 'reports/history/replay.sqlite'
+    hosts: str = ''
+    ignore_params: str = ''
+    upstream_timeout: float = 30
+    cert_dir: str = 'reports/.replay'
+
+    @property
+    def host_list(self):
+        return tuple(host.strip() for host in self.hosts.split(',') if host.strip())
+
+    @property
+    def ignore_params_list(self):
+        return tuple(name.strip() for name in self.ignore_params.split(',') if name.strip())
+
+
+@dataclass(frozen=True)
+class ResourceSettings:
+    profile: str = 'full'
+    profiles: str = ''
+    suites: str = ''
+    report_blocked: bool = False
+    size_cache: str = 'reports/history/resource_sizes.json'
+
+
+@dataclass(frozen=True)
+class RetentionSettings:
+    max_age_days: float = 7
+    keep_runs: int = 5
+    max_size_mb: int = 0
+    keep_failures: bool = True
+    failure_max_age_days: float = 30
+    archive: bool = False
+    archive_dir: str = 'reports/archive'
+    archive_max_age_days: float = 90
+    workers: int = 8
+    batch_size: int = 500
+
+
+@dataclass(frozen=True)
+class ScreenshotSettings:
+    format: str = 'png'
+    quality: int = 80
+    queue_size: int = 32
+    perceptual_threshold: int = -1
+
+
+@dataclass(frozen=True)
+class LoggingSettings:
+    mode: str = 'verbose'
+    buffer_size: int = 2000
+
+
+@dataclass(frozen=True)
+class DataSourceSettings:
+    data_file: str = 'test_data.json'
+
+
+# config.ini section for each Settings attribute
+SECTIONS = {
+    'environment': ('ENVIRONMENT', EnvironmentSettings),
+    'timeouts': ('TIMEOUTS', TimeoutSettings),
+    'pool': ('POOL', PoolSettings),
+    'profiles': ('PROFILES', ProfileSettings),
+    'parallel': ('PARALLEL', ParallelSettings),
+    'durations': ('DURATIONS', DurationSettings),
+    'impact': ('IMPACT', ImpactSettings),
+    'history': ('HISTORY', HistorySettings),
+    'auth': ('AUTH', AuthSettings),
+    'drivers': ('DRIVERS', DriverSettings),
+    'reports': ('REPORTS', ReportSettings),
+    'retention': ('RETENTION', RetentionSettings),
+    'performance': ('PERFORMANCE', PerformanceSettings),
+    'network': ('NETWORK', NetworkSettings),
+    'resources': ('RESOURCES', ResourceSettings),
+    'standin': ('STANDIN', StandinSettings),
+    'replay': ('REPLAY', ReplaySettings),
+    'screenshots': ('SCREENSHOTS', ScreenshotSettings),
+    'logging': ('LOGGING', LoggingSettings),
+    'data_source': ('TEST_DATA', DataSourceSettings),
+}
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Framework configuration, parsed once per process from config.ini and
+    test_data.json. Immutable, so every page object and fixture of a run sees
+    the same values even if the files change while it runs.
+    """
+    environment: EnvironmentSettings = field(default_factory=EnvironmentSettings)
+    timeouts: TimeoutSettings = field(default_factory=TimeoutSettings)
+    pool: PoolSettings = field(default_factory=PoolSettings)
+    profiles: ProfileSettings = field(default_factory=ProfileSettings)
+    parallel: ParallelSettings = field(default_factory=ParallelSettings)
+    durations: DurationSettings = field(default_factory=DurationSettings)
+    impact: ImpactSettings = field(default_factory=ImpactSettings)
+    history: HistorySettings = field(default_factory=HistorySettings)
+    auth: AuthSettings = field(default_factory=AuthSettings)
+    drivers: DriverSettings = field(default_factory=DriverSettings)
+    reports: ReportSettings = field(default_factory=ReportSettings)
+    retention: RetentionSettings = field(default_factory=RetentionSettings)
+    performance: PerformanceSettings = field(default_factory=PerformanceSettings)
+    network: NetworkSettings = field(default_factory=NetworkSettings)
+    resources: ResourceSettings = field(default_factory=ResourceSettings)
+    standin: StandinSettings = field(default_factory=StandinSettings)
+    replay: ReplaySettings = field(default_factory=ReplaySettings)
+    screenshots: ScreenshotSettings = field(default_factory=ScreenshotSettings)
+    logging: LoggingSettings = field(default_factory=LoggingSettings)
+    data_source: DataSourceSettings = field(default_factory=DataSourceSettings)
+    test_data: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+
+    @property
+    def login_url(self):
+        return self.environment.base_url + '/login'
+
+    @staticmethod
+    def path(relative):
+        """
+        Absolute path of a configured path, relative to the project root
+        """
+        return os.path.join(BASE_DIR, relative)
+
+    def as_dict(self):
+        data = {name: asdict(getattr(self, name)) for name in SECTIONS}
+        data['test_data'] = _thaw(self.test_data)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        sections = {name: section_cls(**data.get(name, {})) for name, (_, section_cls) in SECTIONS.items()}
+        return cls(test_data=_freeze(data.get('test_data', {})), **sections)
+
+
+def _freeze(value):
+    """
+    Read-only copy of parsed JSON: dicts become mapping proxies, lists tuples
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, MappingProxyType):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+def _convert(value, kind):
+    if not isinstance(value, str):
+        return kind(value)
+    if kind is bool:
+        if value.strip().lower() not in ConfigParser.BOOLEAN_STATES:
+            raise ValueError(f"Not a boolean: {value}")
+        return ConfigParser.BOOLEAN_STATES[value.strip().lower()]
+    return kind(value.strip())
+
+
+def _read_section(parser, section, section_cls):
+    values = {}
+    for setting in fields(section_cls):
+        raw = parser.get(section, setting.name, fallback=None)
+        if raw is not None:
+            values[setting.name] = _convert(raw, setting.type)
+    return section_cls(**values)
+
+
+def _apply_override(settings, name, value):
+    section_name, field_name = OVERRIDES[name]
+    section = getattr(settings, section_name)
+    kind = next(setting.type for setting in fields(section) if setting.name == field_name)
+    return replace(settings, **{section_name: replace(section, **{field_name: _convert(value, kind)})})
+
+
+def load_settings(config_path=CONFIG_PATH, environ=None, overrides=None):
+    """
+    Parse config.ini and the test data file into a Settings object
+    :param environ: environment to read SELENIUM_<NAME> overrides from (default: os.environ)
+    :param overrides: dict of OVERRIDES name -> value, e.g. from the command line;
+        these win over the environment, None values are ignored
+    """
+    environ = os.environ if environ is None else environ
+    parser = ConfigParser()
+    parser.read(config_path)
+    sections = {name: _read_section(parser, section, section_cls) for name, (section, section_cls) in SECTIONS.items()}
+
+    data_path = os.path.join(os.path.dirname(config_path), sections['data_source'].data_file)
+    try:
+        with open(data_path, 'r') as f:
+            test_data = json.load(f)
+    except FileNotFoundError:
+        test_data = {}
+    settings = Settings(test_data=_freeze(test_data), **sections)
+
+    for name in OVERRIDES:
+        value = environ.get(f'SELENIUM_{name.upper()}')
+        if value is not None:
+            settings = _apply_override(settings, name, value)
+    for name, value in (overrides or {}).items():
+        if name not in OVERRIDES:
+            raise ValueError(f"Unknown setting override: {name}")
+        if value is not None:
+            settings = _apply_override(settings, name, value)
+
+    if settings.environment.browser.lower() != settings.environment.browser:
+        settings = replace(settings, environment=replace(settings.environment, browser=settings.environment.browser.lower()))
+    return settings
+
+
+_settings = None
+_lock = threading.Lock()
+
+
+def get_settings():
+    """
+    Settings of this process, parsed on first use. Workers started by a
+    process that called configure_settings reuse its exported values.
+    """
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                snapshot = os.environ.get(SETTINGS_ENV)
+                _settings = Settings.from_dict(json.loads(snapshot)) if snapshot else load_settings()
+    return _settings
+
+
+def configure_settings(**overrides):
+    """
+    Re-parse the settings with command-line overrides applied and export them
+    to child processes (pytest-xdist workers)
+    """
+    global _settings
+    with _lock:
+        _settings = load_settings(overrides=overrides)
+        os.environ[SETTINGS_ENV] = json.dumps(_settings.as_dict())
+    return _settings
+
+
+def reset_settings():
+    """
+    Forget the parsed settings so the next get_settings() reads the files again
+    """
+    global _settings
+    with _lock:
+        _settings = None
+        os.environ.pop(SETTINGS_ENV, None)
@@ -0,0 +1,362 @@
+import fnmatch
+import json
+import random
+import secrets
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+# Markup mirrors what LoginPageLocators expects from the live application.
+# Error messages are added to the DOM only when they apply, because the page
+# objects wait for their presence, not their visibility.
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Login</title></head>
+<body>
+<form id="login-form" novalidate>
+  <div><input type="email" name="email" placeholder="Email" autocomplete="off"></div>
+  <div><input type="password" name="password" placeholder="Password"></div>
+  <button type="submit">Login</button>
+</form>
+<script>
+const form = document.getElementById('login-form');
+function clearErrors() {
+  for (const element of document.querySelectorAll('.error, .alert')) { element.remove(); }
+}
+function showError(input, message) {
+  const span = document.createElement('span');
+  span.className = 'error d-block';
+  span.textContent = message;
+  input.parentElement.appendChild(span);
+}
+form.addEventListener('submit', async (event) => {
+  event.preventDefault();
+  clearErrors();
+  const email = form.email.value.trim(), password = form.password.value;
+  if (!email) { showError(form.email, 'Email is required'); }
+  if (!password) { showError(form.password, 'Password is required'); }
+  if (!email || !password) { return; }
+  const response = await fetch('/api/login', {
+    method: 'POST', headers: {'Content-Type': 'application/json'},
+    body: JSON.stringify({email: email, password: password}),
+  });
+  if (response.ok) { location.href = '/dashboard'; return; }
+  const alert = document.createElement('div');
+  alert.className = 'alert';
+  alert.textContent = response.status === 401
+    ? 'Given email or password does not match our records'
+    : 'Something went wrong (' + response.status + ')';
+  form.appendChild(alert);
+});
+</script>
+</body></html>
+"""
+
+DASHBOARD_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Dashboard</title></head>
+<body>
+<header><h6>Jordan - Wellness Advocate</h6></header>
+<nav><ul>{menus}</ul></nav>
+<main id="content"></main>
+<script>
+for (const item of document.querySelectorAll('nav li')) {{
+  item.addEventListener('click', async () => {{
+    const response = await fetch('/api/menu/' + item.id);
+    const content = document.getElementById('content');
+    content.textContent = '';
+    const heading = document.createElement('h5');
+    heading.textContent = response.ok ? (await response.json()).title : 'Failed to load (' + response.status + ')';
+    content.appendChild(heading);
+  }});
+}}
+</script>
+</body></html>
+"""
+
+# Dashboard menu li ids and labels of the live application
+MENUS = {
+    'schedule-master': 'Schedule Master',
+    'member-communication': 'Member Communication',
+    'member-summary': 'Member Summary',
+    'member-calls': 'Member Call',
+    'breathe-sound': 'Guide Sound',
+}
+
+SESSION_COOKIE = 'standin_session'
+
+
+def parse_route_latency(text):
+    """
+    Per-route latency from '<path pattern>: <ms>' entries separated by commas
+    or newlines, e.g. '/api/login: 400, /api/menu/*: 150'
+    :return: tuple of (path pattern, seconds)
+    """
+    routes = []
+    for entry in text.replace('\n', ',').split(','):
+        if not entry.strip():
+            continue
+        pattern, separator, latency = entry.rpartition(':')
+        if not separator or not pattern.strip():
+            raise ValueError(f"Invalid stand-in route latency (expected <path>: <ms>): {entry.strip()}")
+        routes.append((pattern.strip(), float(latency) / 1000))
+    return tuple(routes)
+
+
+class StandinServer:
+    """
+    Local stand-in for the login and dashboard application, so the suite can
+    run without network access against a target whose latency and failures
+    are fixed by configuration instead of by the CDN.
+
+    Serves on a random port of 127.0.0.1 from a background thread; every
+    request is handled on its own thread, so parallel workers can share it.
+    """
+    def __init__(self, username, password, latency_ms=0, jitter_ms=0, route_latency='',
+                 failure_rate=0.0, failure_routes='/api/*', failure_status=503, seed=0, host='127.0.0.1', port=0):
+        """
+        :param username, password: the only credentials /api/login accepts
+        :param latency_ms: delay added to every response
+        :param jitter_ms: random extra delay of up to this much
+        :param route_latency: '<path pattern>: <ms>' entries replacing latency_ms for matching paths
+        :param failure_rate: share (0-1) of failure_routes requests answered with failure_status
+        :param seed: seed of the jitter and failures, so runs see the same sequence
+        """
+        self.username = username
+        self.password = password
+        self.lock = threading.Lock()
+        self.sessions = set()
+        self.requests = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self.configure(latency_ms=latency_ms, jitter_ms=jitter_ms, route_latency=route_latency,
+                       failure_rate=failure_rate, failure_routes=failure_routes, failure_status=failure_status)
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.standin = self
+        self._thread = None
+
+    @classmethod
+    def from_settings(cls, settings, port=None):
+        """
+        Server configured by [STANDIN], accepting the valid login of the test data
+        """
+        standin = settings.standin
+        login = settings.test_data.get('login', {})
+        return cls(
+            login.get('valid_username', ''), login.get('valid_password', ''),
+            latency_ms=standin.latency_ms, jitter_ms=standin.jitter_ms, route_latency=standin.route_latency,
+            failure_rate=standin.failure_rate, failure_routes=standin.failure_routes,
+            failure_status=standin.failure_status, seed=standin.seed,
+            host=standin.host, port=standin.port if port is None else port,
+        )
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def configure(self, latency_ms=None, jitter_ms=None, route_latency=None, failure_rate=None,
+                  failure_routes=None, failure_status=None):
+        """
+        Change the simulated latency or failures while serving, e.g. from a test
+        """
+        with self.lock:
+            if latency_ms is not None:
+                self.latency = latency_ms / 1000
+            if jitter_ms is not None:
+                self.jitter = jitter_ms / 1000
+            if route_latency is not None:
+                self.route_latency = parse_route_latency(route_latency)
+            if failure_rate is not None:
+                self.failure_rate = failure_rate
+            if failure_routes is not None:
+                self.failure_routes = tuple(route.strip() for route in failure_routes.split(',') if route.strip())
+            if failure_status is not None:
+                self.failure_status = failure_status
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='standin-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def delay_for(self, path):
+        """
+        Simulated server time of a request, and whether it should fail
+        """
+        with self.lock:
+            self.requests += 1
+            latency = next((seconds for pattern, seconds in self.route_latency if fnmatch.fnmatchcase(path, pattern)),
+                           self.latency)
+            if self.jitter:
+                latency += self._random.uniform(0, self.jitter)
+            fail = (self.failure_rate > 0 and any(fnmatch.fnmatchcase(path, route) for route in self.failure_routes)
+                    and self._random.random() < self.failure_rate)
+            if fail:
+                self.failures += 1
+            return latency, fail
+
+    def login(self, email, password):
+        """
+        :return: a new session token, or None for wrong credentials
+        """
+        if email != self.username or password != self.password:
+            return None
+        token = secrets.token_hex(16)
+        with self.lock:
+            self.sessions.add(token)
+        return token
+
+    def is_logged_in(self, token):
+        with self.lock:
+            return token in self.sessions
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        # Requests are visible in the network capture; the test output stays clean
+        pass
+
+    @property
+    def standin(self):
+        return self.server.standin
+
+    def _respond(self, status, body=b'', content_type='text/html; charset=utf-8', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _json(self, status, data, headers=None):
+        self._respond(status, json.dumps(data).encode(), 'application/json', headers)
+
+    def _redirect(self, location):
+        self._respond(302, headers={'Location': location})
+
+    def _session(self):
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        return cookie[SESSION_COOKIE].value if SESSION_COOKIE in cookie else None
+
+    def _simulate(self, path):
+        """
+        Apply the configured latency; True if the request was answered with a failure
+        """
+        latency, fail = self.standin.delay_for(path)
+        if latency:
+            time.sleep(latency)
+        if fail:
+            self._json(self.standin.failure_status, {'error': 'simulated failure'})
+        return fail
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if self._simulate(path):
+            return
+        if path == '/':
+            self._redirect('/login')
+        elif path == '/login':
+            self._respond(200, LOGIN_PAGE.encode())
+        elif path == '/dashboard':
+            if not self.standin.is_logged_in(self._session()):
+                self._redirect('/login')
+                return
+            menus = ''.join(f'<li id="{menu_id}">{label}</li>' for menu_id, label in MENUS.items())
+            self._respond(200, DASHBOARD_PAGE.format(menus=menus).encode())
+        elif path.startswith('/api/menu/') and path[len('/api/menu/'):] in MENUS:
+            if not self.standin.is_logged_in(self._session()):
+                self._json(401, {'error': 'not logged in'})
+                return
+            self._json(200, {'title': MENUS[path[len('/api/menu/'):]]})
+        elif path == '/favicon.ico':
+            self._respond(204)
+        else:
+            self._respond(404, b'Not found', 'text/plain')
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self._simulate(path):
+            return
+        if path != '/api/login':
+            self._respond(404, b'Not found', 'text/plain')
+            return
+        try:
+            credentials = json.loads(body or b'{}')
+        except ValueError:
+            self._json(400, {'error': 'invalid JSON'})
+            return
+        token = self.standin.login(credentials.get('email'), credentials.get('password'))
+        if token is None:
+            self._json(401, {'error': 'Given email or password does not match our records'})
+            return
+        self._json(200, {'ok': True}, {'Set-Cookie': f'{SESSION_COOKIE}={token}; Path=/; SameSite=Lax'})
+
+
+_server = None
+
+
+def start_standin_server(settings):
+    """
+    Start the process-wide stand-in server
+    """
+    global _server
+    if _server is None:
+        _server = StandinServer.from_settings(settings).start()
+    return _server
+
+
+def standin_server():
+    """
+    The running stand-in server of this process, or None
+    """
+    return _server
+
+
+def stop_standin_server():
+    """
+    Stop the stand-in server
+    :return: the stopped server (for its request counts), or None if none was running
+    """
+    global _server
+    server, _server = _server, None
+    if server is not None:
+        server.stop()
+    return server
+
+
+if __name__ == '__main__':
+    import argparse
+    from utils.settings import get_settings
+
+    parser = argparse.ArgumentParser(description='Serve the stand-in login and dashboard app ([STANDIN] in config.ini)')
+    parser.add_argument('--port', type=int, default=None,
+                        help='port to listen on (default: [STANDIN] port, 0 for a random one)')
+    args = parser.parse_args()
+    server = StandinServer.from_settings(get_settings(), args.port)
+    print(f"Stand-in app on {server.url}/login (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
@@ -0,0 +1,46 @@
+import os
+import re
+import hashlib
+from datetime import datetime
+
+RUN_ID_ENV = 'SELENIUM_RUN_ID'
+
+_current_test = None
+
+
+def run_id():
+    """
+    Identifier shared by every process of a test run. The first process to
+    ask creates it and exports it so pytest-xdist workers inherit it.
+    """
+    if RUN_ID_ENV not in os.environ:
+        os.environ[RUN_ID_ENV] = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+    return os.environ[RUN_ID_ENV]
+
+
+def worker_id():
+    """
+    pytest-xdist worker id (gw0, gw1, ...) or 'main' outside xdist
+    """
+    return os.environ.get('PYTEST_XDIST_WORKER', 'main')
+
+
+def set_current_test(nodeid):
+    global _current_test
+    _current_test = nodeid
+
+
+def current_test():
+    """
+    Node id of the test being run by this process, or None between tests
+    """
+    return _current_test
+
+
+def safe_name(nodeid):
+    """
+    File-system safe, collision-free name for a test node id
+    """
+    readable = re.sub(r'[^\w.-]+', '_', nodeid)[-80:].strip('_')
+    digest = hashlib.sha1(nodeid.encode('utf-8')).hexdigest()[:8]
+    return f'{readable}_{digest}'
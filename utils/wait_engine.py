@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import deque
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException
+
+IGNORED_EXCEPTIONS = (NoSuchElementException, StaleElementReferenceException)
+
+
+class WaitRecorder:
+    """
+    Process-wide record of how long each wait took, used to find slow waits
+    """
+    def __init__(self, max_records=10000):
+        self.records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def record(self, description, elapsed, matched):
+        with self._lock:
+            self.records.append((description, elapsed, matched))
+
+    def slowest(self, count=10):
+        """
+        Return the `count` slowest waits as (description, elapsed, matched)
+        """
+        with self._lock:
+            return sorted(self.records, key=lambda record: record[1], reverse=True)[:count]
+
+    def total_time(self):
+        with self._lock:
+            return sum(record[1] for record in self.records)
+
+
+wait_recorder = WaitRecorder()
+
+
+class AdaptiveWait:
+    """
+    Drop-in replacement for WebDriverWait that polls quickly at first and
+    backs off, so conditions that are already true return in milliseconds
+    while long waits don't flood the driver with requests.
+
+    Meant to be used with implicit waits disabled, otherwise every failed
+    lookup inside a poll blocks for the implicit timeout.
+    """
+    def __init__(self, driver, timeout, initial_poll=0.005, max_poll=0.25, backoff=1.5, on_record=None):
+        """
+        :param driver: WebDriver instance
+        :param timeout: default timeout in seconds
+        :param initial_poll: first sleep between polls in seconds
+        :param max_poll: upper bound for the sleep between polls
+        :param backoff: factor the sleep grows by after every poll
+        :param on_record: optional callable(description, elapsed, matched) run after every wait
+        """
+        self.driver = driver
+        self.timeout = timeout
+        self.initial_poll = initial_poll
+        self.max_poll = max_poll
+        self.backoff = backoff
+        self.on_record = on_record
+
+    def until(self, method, message='', timeout=None, description=None):
+        """
+        Wait until method(driver) returns a truthy value and return it
+        """
+        return self._wait(method, True, message, timeout, description)
+
+    def until_not(self, method, message='', timeout=None, description=None):
+        """
+        Wait until method(driver) returns a falsy value
+        """
+        return self._wait(method, False, message, timeout, description)
+
+    def until_any(self, methods, message='', timeout=None, description=None):
+        """
+        Wait until any of several conditions is truthy. All conditions are
+        checked in the same polling pass, so the first one to become true wins
+        without waiting for the others to time out.
+        :param methods: dict of name -> callable(driver)
+        :return: (name, value) of the condition that matched
+        """
+        description = description or f"any of {', '.join(methods)}"
+
+        def first_match(driver):
+            for name, method in methods.items():
+                try:
+                    value = method(driver)
+                except IGNORED_EXCEPTIONS:
+                    continue
+                if value:
+                    return name, value
+            return None
+
+        return self.until(first_match, message, timeout, description)
+
+    def _wait(self, method, expected, message, timeout, description):
+        timeout = self.timeout if timeout is None else timeout
+        description = description or getattr(method, '__name__', repr(method))
+        start = time.perf_counter()
+        end = start + timeout
+        poll = self.initial_poll
+        while True:
+            try:
+                value = method(self.driver)
+                if bool(value) == expected:
+                    self._record(description, start, True)
+                    return value if expected else True
+            except IGNORED_EXCEPTIONS:
+                if not expected:
+                    self._record(description, start, True)
+                    return True
+            remaining = end - time.perf_counter()
+            if remaining <= 0:
+                break
+            time.sleep(min(poll, remaining))
+            poll = min(poll * self.backoff, self.max_poll)
+        self._record(description, start, False)
+        raise TimeoutException(message or f"Timed out after {timeout}s waiting for {description}")
+
+    def _record(self, description, start, matched):
+        elapsed = time.perf_counter() - start
+        wait_recorder.record(description, elapsed, matched)
+        if self.on_record is not None:
+            self.on_record(description, elapsed, matched)